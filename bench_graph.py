@@ -0,0 +1,227 @@
+"""
+社交圈分析相关算法的性能测试，使用随机生成的合成图，不需要Neo4j
+
+使用示例:
+    python bench_graph.py association --nodes 100000 --edges 1000000
+    python bench_graph.py merge --users 20000 --posts 50000 --edges 300000
+    python bench_graph.py memory --users 100000 --edges 1000000
+"""
+import random
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+import networkx as nx
+
+from net_utils import calculate_association_degree, project_user_graph, rank_association_degree
+from sparse_graph import SparseInteractionGraph
+
+LABEL_WEIGHTS = [("LIKED", 1), ("COMMENTS", 2), ("REPOST_OF", 3), ("FOLLOWS", 5)]
+
+
+def build_synthetic_graph(nodes, edges, seed=0):
+    """生成带 label/weight 属性的随机 MultiDiGraph"""
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph()
+    G.add_nodes_from(range(nodes))
+    for i in range(edges):
+        label, weight = rng.choice(LABEL_WEIGHTS)
+        G.add_edge(rng.randrange(nodes), rng.randrange(nodes), key=i, label=label, weight=weight)
+    return G
+
+
+def full_scan_association_degree(G, target_node):
+    """优化前的实现：遍历图中所有节点，双向查询边数据"""
+    association_degrees = {}
+    for node in G.nodes():
+        if node != target_node:
+            incoming_edges = G.get_edge_data(node, target_node, default={})
+            incoming_weight = sum(edge_data['weight'] for edge_data in incoming_edges.values())
+            outgoing_edges = G.get_edge_data(target_node, node, default={})
+            outgoing_weight = sum(edge_data['weight'] for edge_data in outgoing_edges.values())
+            association_degrees[node] = incoming_weight + outgoing_weight
+    return association_degrees
+
+
+def build_synthetic_content_graph(users, posts, edges, seed=0):
+    """生成用户-帖子-评论结构的随机图，节点编号：用户 [0, users)，帖子和评论从 users 开始"""
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph()
+    G.add_nodes_from(range(users), label="User")
+    key = 0
+    for post in range(users, users + posts):
+        G.add_node(post, label="Post")
+        G.add_edge(rng.randrange(users), post, key=key, label="POSTED", weight=0)
+        key += 1
+    next_node = users + posts
+    while key < edges:
+        post = rng.randrange(users, users + posts)
+        kind = rng.random()
+        if kind < 0.5:
+            G.add_edge(rng.randrange(users), post, key=key, label="LIKED", weight=1)
+        elif kind < 0.8:
+            comment = next_node
+            next_node += 1
+            G.add_node(comment, label="Comment")
+            G.add_edge(rng.randrange(users), comment, key=key, label="COMMENTED", weight=0)
+            key += 1
+            G.add_edge(comment, post, key=key, label="COMMENTS", weight=2)
+        else:
+            repost = next_node
+            next_node += 1
+            G.add_node(repost, label="Post")
+            G.add_edge(rng.randrange(users), repost, key=key, label="POSTED", weight=0)
+            key += 1
+            G.add_edge(repost, post, key=key, label="REPOST_OF", weight=3)
+        key += 1
+    return G
+
+
+def inplace_merge_user_and_post(G):
+    """优化前的实现：逐条边原地改写 MultiDiGraph"""
+    nodes_to_remove = []
+    for u, v, key, data in list(G.edges(data=True, keys=True)):
+        if data.get('label') in {'POSTED', 'REPOSTED', 'COMMENTED'}:
+            for pred in list(G.predecessors(v)):
+                if pred != u:
+                    for k, edge_data in G.get_edge_data(pred, v).items():
+                        G.add_edge(pred, u, key=k, **edge_data)
+                G.remove_edge(pred, v)
+            for succ in list(G.successors(v)):
+                if succ != u:
+                    for k, edge_data in G.get_edge_data(v, succ).items():
+                        G.add_edge(u, succ, key=k, **edge_data)
+                G.remove_edge(v, succ)
+            nodes_to_remove.append(v)
+    for node in set(nodes_to_remove):
+        G.remove_node(node)
+    return G
+
+
+def sorted_edges(G):
+    """按 (u, v, key, data) 排序的边列表，用于比较两个 MultiDiGraph"""
+    return sorted((u, v, key, sorted(data.items())) for u, v, key, data in G.edges(keys=True, data=True))
+
+
+def timed(func, *args, repeat=3):
+    """返回最快一次的耗时（秒）和函数结果"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_association(args):
+    start = time.perf_counter()
+    G = build_synthetic_graph(args.nodes, args.edges)
+    print(f"生成合成图：{G.number_of_nodes()} 个节点，{G.number_of_edges()} 条边，耗时 {time.perf_counter() - start:.2f}s")
+
+    target = max(G.nodes, key=G.degree)  # 选度数最大的节点作为目标
+    old_time, old_result = timed(full_scan_association_degree, G, target)
+    new_time, new_result = timed(calculate_association_degree, G, target)
+    rank_time, top = timed(rank_association_degree, new_result, args.top_k)
+
+    nonzero_old = {node: degree for node, degree in old_result.items() if degree}
+    nonzero_new = {node: degree for node, degree in new_result.items() if degree}
+    assert nonzero_old == nonzero_new, "两种实现的结果不一致"
+
+    print(f"目标节点 {target}，度数 {G.degree(target)}")
+    print(f"全图遍历：{old_time * 1000:.1f}ms")
+    print(f"邻接遍历：{new_time * 1000:.3f}ms（{old_time / new_time:.0f}倍）")
+    print(f"Top-{args.top_k} 排序：{rank_time * 1000:.3f}ms，最高关联度 {top[0] if top else None}")
+
+
+def bench_merge(args):
+    G = build_synthetic_content_graph(args.users, args.posts, args.edges)
+    print(f"生成合成图：{G.number_of_nodes()} 个节点，{G.number_of_edges()} 条边")
+
+    start = time.perf_counter()
+    merged = inplace_merge_user_and_post(G.copy())
+    old_time = time.perf_counter() - start
+    new_time, projected = timed(project_user_graph, G, repeat=1)
+    compact_time, compact = timed(project_user_graph, G, True, repeat=1)
+    assert sorted_edges(merged) == sorted_edges(projected), "两种实现的结果不一致"
+
+    print(f"原地合并：{old_time:.2f}s")
+    print(f"一次投影：{new_time:.2f}s（{old_time / new_time:.1f}倍），{projected.number_of_edges()} 条边")
+    print(f"投影为 DiGraph：{compact_time:.2f}s，{compact.number_of_edges()} 条边")
+
+
+def measure_allocation(func, *args):
+    """返回函数执行后新增的 Python 内存分配量（字节）和函数结果"""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = func(*args)
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return after - before, result
+
+
+def bench_memory(args):
+    rng = random.Random(0)
+    edges = []
+    for _ in range(args.edges):
+        label, weight = rng.choice(LABEL_WEIGHTS)
+        edges.append((rng.randrange(args.users), rng.randrange(args.users), label, weight))
+    text = "这是一条用于模拟 text_raw 和 description 的较长文本。" * 4
+
+    def build_networkx():
+        # 与 convert_to_nx_graph 相同，每个节点保存完整属性，每条边保存 label/properties/weight
+        G = nx.MultiDiGraph()
+        for user in range(args.users):
+            G.add_node(user, label=None, properties={
+                "id": user, "screen_name": f"user{user}", "description": text, "location": "北京",
+                "followers_count": user, "friends_count": user, "gender": "m",
+            })
+        for key, (u, v, label, weight) in enumerate(edges):
+            G.add_edge(u, v, key=f"5:{key}", label=label, properties={}, weight=weight)
+        return G
+
+    def build_sparse():
+        return SparseInteractionGraph.from_edges(iter(edges))
+
+    nx_bytes, G = measure_allocation(build_networkx)
+    sparse_bytes, graph = measure_allocation(build_sparse)
+
+    target = max(range(args.users), key=G.degree)
+    nx_time, nx_result = timed(calculate_association_degree, G, target)
+    sparse_time, sparse_result = timed(graph.association_degree, target)
+    assert nx_result == sparse_result, "两种实现的关联度不一致"
+
+    print(f"{args.users} 个用户，{args.edges} 条边")
+    print(f"NetworkX：{nx_bytes / 1024 / 1024:.1f} MB，关联度 {nx_time * 1000:.3f}ms")
+    print(f"CSR：{sparse_bytes / 1024 / 1024:.1f} MB（矩阵 {graph.nbytes / 1024 / 1024:.1f} MB），"
+          f"关联度 {sparse_time * 1000:.3f}ms，内存为 NetworkX 的 {sparse_bytes / nx_bytes:.1%}")
+
+
+def main():
+    parser = ArgumentParser(description="社交圈分析算法性能测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    association = subparsers.add_parser("association", help="关联度计算")
+    association.add_argument("--nodes", type=int, default=100000)
+    association.add_argument("--edges", type=int, default=1000000)
+    association.add_argument("--top-k", type=int, default=20)
+    association.set_defaults(func=bench_association)
+
+    merge = subparsers.add_parser("merge", help="用户与内容节点合并")
+    merge.add_argument("--users", type=int, default=20000)
+    merge.add_argument("--posts", type=int, default=50000)
+    merge.add_argument("--edges", type=int, default=300000)
+    merge.set_defaults(func=bench_merge)
+
+    memory = subparsers.add_parser("memory", help="NetworkX 与 CSR 表示的内存占用")
+    memory.add_argument("--users", type=int, default=100000)
+    memory.add_argument("--edges", type=int, default=1000000)
+    memory.set_defaults(func=bench_memory)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
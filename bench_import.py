@@ -0,0 +1,80 @@
+"""
+启动时间测试：用 python -X importtime 统计导入模块的耗时
+
+每个模块在新的解释器中导入 repeat 次，取总耗时的中位数，并列出自身耗时最多的依赖。
+tampermonkey 下的模块在该目录中导入，与 gunicorn/flask 启动时的路径一致。
+使用示例:
+    python bench_import.py
+    python bench_import.py net_gui tampermonkey/app --repeat 10 --top 15
+"""
+import os
+import statistics
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TARGETS = ["net_utils", "net_gui", "tampermonkey/app"]
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 的输出
+
+    :return: [(模块名, 自身耗时us, 累计耗时us)]
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(target):
+    """在新的解释器中导入 target 一次，返回 (总耗时us, 解析后的 importtime 输出)"""
+    directory, module = os.path.split(target)
+    cwd = os.path.join(ROOT, directory)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    rows = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+        raise RuntimeError(f"导入 {target} 失败：{error}")
+    total = next(cumulative for name, _, cumulative in rows if name == module)
+    return total, rows
+
+
+def run_benchmark(target, repeat=5, top=10):
+    totals = []
+    rows = []
+    for _ in range(repeat):
+        total, rows = measure(target)
+        totals.append(total)
+    print(f"{target}: 中位数 {statistics.median(totals) / 1000:.1f} ms，"
+          f"最小 {min(totals) / 1000:.1f} ms（{repeat} 次）")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: -row[1])[:top]:
+        print(f"    {self_us / 1000:8.1f} ms 自身 {cumulative_us / 1000:8.1f} ms 累计  {name}")
+    return totals
+
+
+def main():
+    parser = ArgumentParser(description="统计模块的导入耗时")
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS,
+                        help="模块路径（相对项目根目录，不带 .py）")
+    parser.add_argument("--repeat", type=int, default=5, help="每个模块导入的次数")
+    parser.add_argument("--top", type=int, default=10, help="列出自身耗时最多的前几个依赖")
+    args = parser.parse_args()
+
+    for target in args.targets:
+        try:
+            run_benchmark(target, args.repeat, args.top)
+        except RuntimeError as e:
+            print(e)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+爬虫断点
+
+Checkpoint 把爬取进度保存为一个JSON文件：先写入临时文件并 fsync，再用 os.replace 替换，
+进程在任何时刻崩溃，磁盘上都只会是上一次或这一次完整的进度。爬取正常结束后调用 clear() 删除。
+"""
+import json
+import os
+import threading
+
+from settings import get_setting
+
+
+class Checkpoint:
+    def __init__(self, name, directory=None):
+        """
+        :param name: 断点名称，同一名称对应同一个文件
+        :param directory: 断点文件目录，默认为 CHECKPOINT_DIR（可在 .env 中设置，默认 ./checkpoints）
+        """
+        self.directory = directory or get_setting("CHECKPOINT_DIR", "./checkpoints")
+        self.path = os.path.join(self.directory, f"{name}.json")
+
+    def load(self):
+        """读取断点，不存在或损坏时返回 None"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, state):
+        """原子地写入断点，state 为可JSON序列化的字典"""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """爬取完成后删除断点"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,160 @@
+"""
+多账号cookie轮换
+
+cookies.json 可以是单个cookie字典，也可以是多个cookie字典组成的列表。每次请求从 CookiePool
+中取一组cookie：round_robin 依次轮换，least_throttled 优先使用最久没有被限流的cookie。
+每组cookie在每个接口上有独立的自适应限速器，总吞吐量随账号数增加；连续失败（被限流、
+跳转登录页等）达到 max_failures 次的cookie会被停用。
+"""
+import json
+import threading
+import time
+
+from rate_limit import RETRY_STATUS, THROTTLE_STATUS, get_limiter, rate_setting
+from settings import get_setting
+
+# 以下参数可在 .env 中设置，在创建 CookiePool 时读取
+# COOKIES_PATH：cookie文件路径，默认 cookies.json
+# COOKIE_STRATEGY：round_robin 或 least_throttled（默认）
+# COOKIE_MAX_FAILURES：连续失败多少次后停用，默认5
+
+
+class CookieSlot:
+    """一组cookie及其使用统计"""
+
+    def __init__(self, name, cookies):
+        self.name = name
+        self.cookies = cookies
+        self.requests = 0
+        self.throttled = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_used = 0.0
+        self.last_throttled = 0.0
+        self.retired = False
+
+    def limiter(self, endpoint):
+        """这组cookie在接口上的限速器"""
+        return get_limiter(f"{endpoint}@{self.name}")
+
+
+class CookiePool:
+    def __init__(self, cookies_list, strategy=None, max_failures=None):
+        """
+        :param cookies_list: cookie字典的列表
+        :param strategy: round_robin 或 least_throttled，默认为 COOKIE_STRATEGY
+        :param max_failures: 连续失败多少次后停用该cookie，默认为 COOKIE_MAX_FAILURES
+        """
+        if strategy is None:
+            strategy = get_setting("COOKIE_STRATEGY", "least_throttled")
+        if max_failures is None:
+            max_failures = get_setting("COOKIE_MAX_FAILURES", "5", int)
+        if strategy not in ("round_robin", "least_throttled"):
+            raise ValueError(f"未知的cookie分配方式：{strategy}")
+        self.slots = [CookieSlot(f"cookie{i}", cookies) for i, cookies in enumerate(cookies_list)]
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=None, **kwargs):
+        """从JSON文件读取，文件内容为单个cookie字典或cookie字典的列表，默认路径为 COOKIES_PATH"""
+        if path is None:
+            path = get_setting("COOKIES_PATH", "cookies.json")
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(data if isinstance(data, list) else [data], **kwargs)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def acquire(self):
+        """取一组可用的cookie，全部停用时抛出 RuntimeError"""
+        with self._lock:
+            active = [slot for slot in self.slots if not slot.retired]
+            if not active:
+                raise RuntimeError("没有可用的cookie，请更新cookies.json")
+            if self.strategy == "round_robin":
+                slot = active[self._next % len(active)]
+                self._next += 1
+            else:
+                slot = min(active, key=lambda s: (s.last_throttled, s.last_used))
+            slot.last_used = time.monotonic()
+            return slot
+
+    def record(self, slot, throttled=False, failed=False):
+        """
+        记录一次请求的结果
+
+        :param throttled: 被限流（418/429、空数据等）
+        :param failed: 其他失败（网络错误、跳转登录页等）
+        """
+        with self._lock:
+            slot.requests += 1
+            if throttled:
+                slot.throttled += 1
+                slot.last_throttled = time.monotonic()
+            if throttled or failed:
+                slot.failures += 1
+                slot.consecutive_failures += 1
+                if slot.consecutive_failures >= self.max_failures and not slot.retired:
+                    slot.retired = True
+                    print(f"{slot.name} 连续失败 {slot.consecutive_failures} 次，已停用")
+            else:
+                slot.consecutive_failures = 0
+
+    def stats(self):
+        """每组cookie的请求数、限流次数、失败次数和是否停用"""
+        with self._lock:
+            return [
+                {
+                    "name": slot.name,
+                    "requests": slot.requests,
+                    "throttled": slot.throttled,
+                    "failures": slot.failures,
+                    "retired": slot.retired,
+                }
+                for slot in self.slots
+            ]
+
+
+def as_pool(cookie):
+    """把单个cookie字典包装为只有一组cookie的 CookiePool，已是 CookiePool 时原样返回"""
+    return cookie if isinstance(cookie, CookiePool) else CookiePool([cookie])
+
+
+def pooled_request(session, pool, endpoint, url, limiter=None, max_retries=None, **kwargs):
+    """
+    用池中的cookie发出GET请求，每次尝试重新取一组cookie，被限流或失败后换下一组重试；
+    只有 418/429 计入cookie的失败次数
+
+    :param session: requests.Session 或 requests 模块
+    :param limiter: 可选，所有cookie共用的限速器，默认每组cookie在该接口上各有一个
+    :param max_retries: 重试次数，默认为 RATE_MAX_RETRIES
+    :return: requests.Response，重试次数用完后抛出 requests.RequestException
+    """
+    import requests
+
+    if max_retries is None:
+        max_retries = rate_setting("RATE_MAX_RETRIES")
+
+    for attempt in range(max_retries + 1):
+        slot = pool.acquire()
+        slot_limiter = limiter or slot.limiter(endpoint)
+        slot_limiter.acquire()
+        start = time.monotonic()
+        try:
+            response = session.get(url, cookies=slot.cookies, **kwargs)
+            if response.status_code in RETRY_STATUS:
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+        except requests.RequestException as e:
+            slot_limiter.record(throttled=True)
+            if e.response is not None and e.response.status_code in THROTTLE_STATUS:
+                pool.record(slot, throttled=True)  # 网络错误和5xx与cookie无关，不计入
+            if attempt == max_retries:
+                raise
+            continue
+        slot_limiter.record(latency=time.monotonic() - start)
+        pool.record(slot)
+        return response
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+多跳关注关系爬虫
+
+从种子用户出发按广度优先逐层爬取关注列表：同一层内按与已有互动数据的关联程度（INTERACTS
+权重）从高到低展开，每个用户最多保留 fan_out 个关注，已访问的用户不会重复爬取。
+关注关系攒够一批后用一条 UNWIND 语句写入Neo4j，新发现的用户同时提交到线程池中爬取微博。
+使用示例:
+    python follow_crawler.py 1765809461 --depth 2 --fan-out 30 --scrape
+"""
+import heapq
+import os
+import traceback
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+from cookie_pool import CookiePool
+from weibo import Weibo
+from weibo_follow import FOLLOW_WORKERS, Follow, create_session
+
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "4"))  # 同时爬取微博的用户数
+
+# 批量写入关注关系，关注对象的昵称只在缺失时补上
+FOLLOWS_UPSERT = """
+UNWIND $rows AS row
+MERGE (a:User {id: row.source})
+MERGE (b:User {id: row.target})
+SET b.screen_name = COALESCE(b.screen_name, row.name)
+MERGE (a)-[:FOLLOWS]->(b)
+"""
+
+# 每个用户所有 INTERACTS 关系（双向）的权重之和
+INTERACTION_WEIGHT_QUERY = """
+UNWIND $ids AS id
+MATCH (u:User {id: id})
+OPTIONAL MATCH (u)-[i:INTERACTS]-(:User)
+RETURN id, sum(COALESCE(i.weight, 0)) AS weight
+"""
+
+
+def make_interaction_weights(driver):
+    """返回按 INTERACTS 权重批量查询用户优先级的函数，传入用户ID列表，返回 {用户ID: 权重}"""
+    def weights(user_ids):
+        with driver.session() as session:
+            records = session.run(INTERACTION_WEIGHT_QUERY, ids=list(user_ids))
+            return {record["id"]: record["weight"] for record in records}
+    return weights
+
+
+def scrape_timeline(user_id, filter=1, since_date='2018-01-01'):
+    """
+    用独立的 Weibo 实例爬取一个用户的微博
+
+    不经过只打印异常的 Weibo.start，爬取出错或有页面重试后仍然失败时抛出异常，
+    由 FollowGraphCrawler 记入 scrape_failures
+    """
+    wb = Weibo(filter, since_date, 0, 0, 0, 0)
+    wb.scrape_user(str(user_id))
+    if wb.failed_pages:
+        raise RuntimeError(u'第%s页爬取失败' % ','.join(str(page) for page in wb.failed_pages))
+
+
+class FollowGraphCrawler(object):
+    def __init__(self, cookie, driver=None, depth=2, fan_out=50, max_users=1000, weights=None,
+                 scrape=None, scrape_workers=SCRAPE_WORKERS, batch_size=500):
+        """
+        :param cookie: weibo.cn 的 cookie 或 CookiePool，与 Follow 相同
+        :param driver: 可选，Neo4j 同步驱动，为 None 时不写入数据库
+        :param depth: 最多爬取几跳关注关系，1 表示只爬种子用户的关注列表
+        :param fan_out: 每个用户最多保留的关注数
+        :param max_users: 最多发现的用户数（含种子用户）
+        :param weights: 可选，传入用户ID列表、返回 {用户ID: 权重} 的函数，权重高的用户优先展开和保留；
+                        默认在有 driver 时按 INTERACTS 权重，否则按关注列表中的顺序
+        :param scrape: 可选，传入用户ID爬取其微博的函数，新发现的用户会提交到线程池中执行
+        :param batch_size: 关注关系攒够多少条写入一次数据库
+        """
+        self.cookie = cookie
+        self.driver = driver
+        self.depth = depth
+        self.fan_out = fan_out
+        self.max_users = max_users
+        if weights is None and driver is not None:
+            weights = make_interaction_weights(driver)
+        self.weights = weights
+        self.scrape = scrape
+        self.scrape_workers = scrape_workers
+        self.batch_size = batch_size
+
+        # 所有 Follow 共用一个连接池，每组cookie的限速器按接口在进程内共用
+        self.session = create_session(FOLLOW_WORKERS)
+
+        self.visited = set()  # 已发现的用户ID
+        self.names = {}  # 用户ID -> 昵称
+        self.edges = []  # 所有已爬取的关注关系 (关注者, 被关注者)
+        self._pending = []  # 尚未写入数据库的关注关系
+        self.scrape_failures = {}  # 爬取微博失败的用户ID -> 异常
+
+    def get_weights(self, user_ids):
+        if self.weights is None or not user_ids:
+            return {}
+        return self.weights([int(user_id) for user_id in user_ids])
+
+    def get_follows(self, user_id):
+        """爬取一个用户的关注列表，返回 [(关注用户ID, 昵称)]，已去掉用户自己"""
+        fw = Follow(int(user_id), self.cookie, session=self.session)
+        fw.get_follow_list()
+        pairs = list(zip(fw.follow_list, fw.follow_name_list))
+        if pairs:
+            self.names.setdefault(user_id, pairs[0][1])  # 第一项是用户自己
+        return [(follow_id, name) for follow_id, name in pairs[1:] if follow_id != user_id]
+
+    def select_follows(self, follows):
+        """按权重从高到低保留 fan_out 个关注，权重相同时保持关注列表中的顺序"""
+        weights = self.get_weights([follow_id for follow_id, _ in follows])
+        ranked = sorted(follows, key=lambda item: -weights.get(int(item[0]), 0))
+        return ranked[:self.fan_out], weights
+
+    def flush(self):
+        """把攒下的关注关系一次性写入数据库"""
+        if not self._pending or self.driver is None:
+            self._pending = []
+            return
+        rows = [
+            {"source": int(source), "target": int(target), "name": self.names.get(target)}
+            for source, target in self._pending
+        ]
+        with self.driver.session() as session:
+            session.execute_write(lambda tx: tx.run(FOLLOWS_UPSERT, rows=rows).consume())
+        print(u'写入%d条关注关系' % len(rows))
+        self._pending = []
+
+    def _submit_scrape(self, executor, futures, user_id):
+        if executor is not None:
+            futures[executor.submit(self.scrape, user_id)] = user_id
+
+    def crawl(self, seed_id):
+        """
+        从 seed_id 开始爬取关注图
+
+        :return: 所有关注关系 [(关注者ID, 被关注者ID)]
+        """
+        seed_id = str(seed_id)
+        self.visited.add(seed_id)
+        heap = [(0, 0, 0, seed_id)]  # (跳数, -权重, 发现顺序, 用户ID)
+        order = 1
+        executor = ThreadPoolExecutor(max_workers=self.scrape_workers) if self.scrape else None
+        futures = {}
+        try:
+            self._submit_scrape(executor, futures, seed_id)
+            while heap:
+                hop, _, _, user_id = heapq.heappop(heap)
+                print(u'第%d跳：爬取用户%s的关注列表' % (hop + 1, user_id))
+                try:
+                    follows = self.get_follows(user_id)
+                except Exception as e:
+                    print('Error: ', e)
+                    traceback.print_exc()
+                    continue
+
+                selected, weights = self.select_follows(follows)
+                for follow_id, name in selected:
+                    self.names.setdefault(follow_id, name)
+                    self.edges.append((user_id, follow_id))
+                    self._pending.append((user_id, follow_id))
+                    if follow_id in self.visited or len(self.visited) >= self.max_users:
+                        continue
+                    self.visited.add(follow_id)
+                    self._submit_scrape(executor, futures, follow_id)
+                    if hop + 1 < self.depth:
+                        heapq.heappush(heap, (hop + 1, -weights.get(int(follow_id), 0), order, follow_id))
+                        order += 1
+
+                if len(self._pending) >= self.batch_size:
+                    self.flush()
+            self.flush()
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+                for future, user_id in futures.items():
+                    if future.exception() is not None:
+                        self.scrape_failures[user_id] = future.exception()
+
+        print(u'共发现%d个用户，%d条关注关系' % (len(self.visited), len(self.edges)))
+        if self.scrape_failures:
+            print(u'以下用户微博爬取失败：' + ', '.join(self.scrape_failures))
+        return self.edges
+
+
+def main():
+    parser = ArgumentParser(description="按广度优先爬取多跳关注关系并写入Neo4j")
+    parser.add_argument("user_id", type=int, help="种子用户ID")
+    parser.add_argument("--depth", type=int, default=2, help="最多爬取几跳关注关系")
+    parser.add_argument("--fan-out", type=int, default=50, help="每个用户最多保留的关注数")
+    parser.add_argument("--max-users", type=int, default=1000, help="最多发现的用户数")
+    parser.add_argument("--scrape", action="store_true", help="同时爬取新发现用户的微博")
+    args = parser.parse_args()
+
+    load_dotenv()
+    cookies = CookiePool.load()
+
+    driver = GraphDatabase.driver(os.getenv("NEO4J_URI"), auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD")))
+    try:
+        crawler = FollowGraphCrawler(cookies, driver, depth=args.depth, fan_out=args.fan_out,
+                                     max_users=args.max_users, scrape=scrape_timeline if args.scrape else None)
+        crawler.crawl(args.user_id)
+    finally:
+        driver.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,81 @@
+from collections import Counter
+
 from neo4j import AsyncGraphDatabase
 
 from model import Comment, Post, User
 
+# INTERACTS 关系上各类互动的计数字段和权重，与 net_utils.RELATION_WEIGHTS 一致
+INTERACTION_FIELDS = {"liked": 1, "commented": 2, "reposted": 3}
+
+# 批量写入语句，每种节点或关系一条 UNWIND 语句，单条写入也通过 write_batch
+USERS_UPSERT = (
+    "UNWIND $rows AS row "
+    "MERGE (u:User {id: row.id}) "
+    "SET u.location = COALESCE(row.location, u.location), u.screen_name = COALESCE(row.screen_name, u.screen_name), "
+    "u.followers_count = COALESCE(row.followers_count, u.followers_count), u.friends_count = COALESCE(row.friends_count, u.friends_count), "
+    "u.description = COALESCE(row.description, u.description), u.gender = COALESCE(row.gender, u.gender)"
+)
+
+POSTS_UPSERT = (
+    "UNWIND $rows AS row "
+    "MERGE (p:Post {id: row.id}) "
+    "SET p.text_raw = COALESCE(row.text_raw, p.text_raw), p.created_at = COALESCE(row.created_at, p.created_at) "
+    "WITH p, row "
+    "MATCH (u:User {id: row.user_id}) "
+    "MERGE (u)-[:POSTED]->(p)"
+)
+
+# 关系语句返回每行的互动双方和关系是否新建，新建的关系再批量累加到 INTERACTS
+COMMENTS_UPSERT = (
+    "UNWIND $rows AS row "
+    "MERGE (c:Comment {id: row.id}) "
+    "SET c.text_raw = COALESCE(row.text_raw, c.text_raw), c.source = COALESCE(row.source, c.source), c.created_at = COALESCE(row.created_at, c.created_at) "
+    "WITH c, row "
+    "MATCH (u:User {id: row.user_id}), (p:Post {id: row.post_id}) "
+    "OPTIONAL MATCH (c)-[existing:COMMENTS]->(p) "
+    "MERGE (u)-[:COMMENTED]->(c) "
+    "MERGE (c)-[:COMMENTS]->(p) "
+    "RETURN row.user_id AS actor_id, row.post_id AS post_id, existing IS NULL AS created"
+)
+
+REPLIES_LINK = (
+    "UNWIND $rows AS row "
+    "MATCH (c:Comment {id: row.id}), (r:Comment {id: row.root_id}) "
+    "MERGE (c)-[:REPLY_TO]->(r)"
+)
+
+LIKES_UPSERT = (
+    "UNWIND $rows AS row "
+    "MATCH (u:User {id: row.user_id}), (p:Post {id: row.post_id}) "
+    "OPTIONAL MATCH (u)-[existing:LIKED]->(p) "
+    "MERGE (u)-[:LIKED]->(p) "
+    "RETURN row.user_id AS actor_id, row.post_id AS post_id, existing IS NULL AS created"
+)
+
+REPOSTS_UPSERT = (
+    "UNWIND $rows AS row "
+    "MATCH (u:User {id: row.user_id}), (p:Post {id: row.post_id}), (op:Post {id: row.original_post_id}) "
+    "OPTIONAL MATCH (p)-[existing:REPOST_OF]->(op) "
+    "MERGE (u)-[:REPOSTED]->(p) "
+    "MERGE (p)-[:REPOST_OF]->(op) "
+    "RETURN row.user_id AS actor_id, row.original_post_id AS post_id, existing IS NULL AS created"
+)
+
+# 把新建的互动累加到 INTERACTS 关系上，row.n 为同一对用户、同一帖子在本批中新建的互动数
+INTERACTS_BATCH_UPDATE = (
+    "UNWIND $rows AS row "
+    "MATCH (actor:User {{id: row.actor_id}}), (author:User)-[:POSTED]->(:Post {{id: row.post_id}}) "
+    "WHERE actor <> author "
+    "MERGE (actor)-[i:INTERACTS]->(author) "
+    "ON CREATE SET i.liked = 0, i.commented = 0, i.reposted = 0, i.weight = 0 "
+    "SET i.{field} = i.{field} + row.n, i.weight = i.weight + row.n * $weight"
+)
+
+
+def _unique(rows, key):
+    """按 key 去重，保留最后一次出现的行，同一批中重复的行不会被当作两次新建"""
+    return list({key(row): row for row in rows}.values())
+
 
 class WeiboGraph:
     def __init__(self, uri: str, user: str, password: str):
@@ -10,81 +84,107 @@ class WeiboGraph:
     async def close(self):
         await self.driver.close()
 
-    async def create_user(self, user: User):
-        query = (
-            "MERGE (u:User {id: $id}) "
-            "SET u.location = COALESCE($location, u.location), u.screen_name = COALESCE($screen_name, u.screen_name), "
-            "u.followers_count = COALESCE($followers_count, u.followers_count), u.friends_count = COALESCE($friends_count, u.friends_count), "
-            "u.description = COALESCE($description, u.description), u.gender = COALESCE($gender, u.gender)"
-        )
-        parameters = {
-            "id": user.id,
-            "location": user.location,
-            "screen_name": user.screen_name,
-            "followers_count": user.followers_count,
-            "friends_count": user.friends_count,
-            "description": user.description,
-            "gender": user.gender,
-        }
+    async def create_indexes(self):
+        """为各类节点的id建立索引，MERGE和按id查找节点时不再需要全表扫描"""
         async with self.driver.session() as session:
-            await session.run(query, parameters)
+            for label in ("User", "Post", "Comment"):
+                await session.run(
+                    f"CREATE INDEX {label.lower()}_id IF NOT EXISTS FOR (n:{label}) ON (n.id)"
+                )
+
+    async def create_user(self, user: User):
+        await self.write_batch(users=[user])
 
     async def create_post(self, post: Post, user_id):
-        query = (
-            "MERGE (p:Post {id: $id}) "
-            "SET p.text_raw = COALESCE($text_raw, p.text_raw), p.created_at = COALESCE($created_at, p.created_at) "
-            "WITH p "
-            "MATCH (u:User {id: $user_id}) "
-            "MERGE (u)-[:POSTED]->(p)"
-        )
-        parameters = {
-            "id": post.id,
-            "text_raw": post.text_raw,
-            "created_at": post.created_at,
-            "user_id": user_id,
-        }
-        async with self.driver.session() as session:
-            await session.run(query, parameters)
+        await self.write_batch(posts=[(post, user_id)])
 
     async def create_comment(self, comment: Comment, user_id, post_id):
-        query = (
-            "MERGE (c:Comment {id: $id}) "
-            "SET c.text_raw = COALESCE($text_raw, c.text_raw), c.source = COALESCE($source, c.source), c.created_at = COALESCE($created_at, c.created_at) "
-            "WITH c "
-            "MATCH (u:User {id: $user_id}), (p:Post {id: $post_id}) "
-            "MERGE (u)-[:COMMENTED]->(c) "
-            "MERGE (c)-[:COMMENTS]->(p)"
-        )
-        parameters = {
-            "id": comment.id,
-            "text_raw": comment.text_raw,
-            "source": comment.source,
-            "created_at": comment.created_at,
-            "user_id": user_id,
-            "post_id": post_id,
-        }
-        async with self.driver.session() as session:
-            await session.run(query, parameters)
+        await self.write_batch(comments=[(comment, user_id, post_id)])
 
     async def create_like_relationship(self, user_id, post_id):
-        query = (
-            "MATCH (u:User {id: $user_id}), (p:Post {id: $post_id}) "
-            "MERGE (u)-[:LIKED]->(p)"
-        )
-        parameters = {"user_id": user_id, "post_id": post_id}
-        async with self.driver.session() as session:
-            await session.run(query, parameters)
+        await self.write_batch(likes=[(user_id, post_id)])
 
     async def create_repost_relationship(self, user_id, post_id, original_post_id):
-        query = (
-            "MATCH (u:User {id: $user_id}), (p:Post {id: $post_id}), (op:Post {id: $original_post_id}) "
-            "MERGE (u)-[:REPOSTED]->(p) "
-            "MERGE (p)-[:REPOST_OF]->(op)"
-        )
-        parameters = {
-            "user_id": user_id,
-            "post_id": post_id,
-            "original_post_id": original_post_id,
-        }
+        await self.write_batch(reposts=[(user_id, post_id, original_post_id)])
+
+    async def write_batch(self, users=(), posts=(), comments=(), likes=(), reposts=()):
+        """
+        在一个事务中批量写入，依次写入用户、帖子、评论、点赞和转发，后面的关系可以引用同一批中的节点
+
+        :param users: [User]
+        :param posts: [(Post, 作者ID)]
+        :param comments: [(Comment, 评论者ID, 帖子ID)]，Comment.root_id 不为空时连到根评论
+        :param likes: [(用户ID, 帖子ID)]
+        :param reposts: [(转发者ID, 转发帖子ID, 原帖ID)]
+        """
+        async with self.driver.session() as session:
+            await session.execute_write(self._write_batch, users, posts, comments, likes, reposts)
+
+    @staticmethod
+    async def _write_batch(tx, users, posts, comments, likes, reposts):
+        if users:
+            rows = _unique((user.model_dump() for user in users), lambda row: row["id"])
+            await tx.run(USERS_UPSERT, rows=rows)
+        if posts:
+            rows = _unique(({**post.model_dump(), "user_id": user_id} for post, user_id in posts),
+                           lambda row: row["id"])
+            await tx.run(POSTS_UPSERT, rows=rows)
+
+        comment_rows = _unique(({**comment.model_dump(), "user_id": user_id, "post_id": post_id}
+                                for comment, user_id, post_id in comments), lambda row: row["id"])
+        like_rows = _unique(({"user_id": user_id, "post_id": post_id} for user_id, post_id in likes),
+                            lambda row: (row["user_id"], row["post_id"]))
+        repost_rows = _unique(({"user_id": user_id, "post_id": post_id, "original_post_id": original_post_id}
+                               for user_id, post_id, original_post_id in reposts), lambda row: row["post_id"])
+        for query, rows, field in ((COMMENTS_UPSERT, comment_rows, "commented"),
+                                   (LIKES_UPSERT, like_rows, "liked"),
+                                   (REPOSTS_UPSERT, repost_rows, "reposted")):
+            if not rows:
+                continue
+            result = await tx.run(query, rows=rows)
+            created = Counter((record["actor_id"], record["post_id"]) for record in await result.data()
+                              if record["created"])
+            if field == "commented":
+                replies = [row for row in rows if row["root_id"] is not None]
+                if replies:
+                    await tx.run(REPLIES_LINK, rows=replies)
+            if created:
+                await tx.run(
+                    INTERACTS_BATCH_UPDATE.format(field=field),
+                    rows=[{"actor_id": actor_id, "post_id": post_id, "n": n}
+                          for (actor_id, post_id), n in created.items()],
+                    weight=INTERACTION_FIELDS[field],
+                )
+
+    async def rebuild_interactions(self):
+        """
+        根据已有的点赞、评论、转发关系重新计算所有 INTERACTS 关系，
+        用于为引入 INTERACTS 之前写入的数据补建聚合
+        """
+        queries = [
+            "MATCH ()-[i:INTERACTS]->() DELETE i",
+            (
+                "MATCH (actor:User)-[:LIKED]->(:Post)<-[:POSTED]-(author:User) WHERE actor <> author "
+                "WITH actor, author, count(*) AS n "
+                "MERGE (actor)-[i:INTERACTS]->(author) "
+                "ON CREATE SET i.liked = 0, i.commented = 0, i.reposted = 0, i.weight = 0 "
+                "SET i.liked = i.liked + n, i.weight = i.weight + n * $liked"
+            ),
+            (
+                "MATCH (actor:User)-[:COMMENTED]->(:Comment)-[:COMMENTS]->(:Post)<-[:POSTED]-(author:User) WHERE actor <> author "
+                "WITH actor, author, count(*) AS n "
+                "MERGE (actor)-[i:INTERACTS]->(author) "
+                "ON CREATE SET i.liked = 0, i.commented = 0, i.reposted = 0, i.weight = 0 "
+                "SET i.commented = i.commented + n, i.weight = i.weight + n * $commented"
+            ),
+            (
+                "MATCH (actor:User)-[:REPOSTED]->(:Post)-[:REPOST_OF]->(:Post)<-[:POSTED]-(author:User) WHERE actor <> author "
+                "WITH actor, author, count(*) AS n "
+                "MERGE (actor)-[i:INTERACTS]->(author) "
+                "ON CREATE SET i.liked = 0, i.commented = 0, i.reposted = 0, i.weight = 0 "
+                "SET i.reposted = i.reposted + n, i.weight = i.weight + n * $reposted"
+            ),
+        ]
         async with self.driver.session() as session:
-            await session.run(query, parameters)
+            for query in queries:
+                await session.run(query, INTERACTION_FIELDS)
@@ -3,11 +3,11 @@ from typing import Literal
 
 class User(BaseModel):
     id: int = Field(description='微博用户ID')
-    location: str = Field(description="所在地")
+    location: str | None = Field(default=None, description="所在地，转发列表等接口中可能缺失")
     screen_name: str = Field(description="微博用户名称")
     followers_count: int = Field(description="粉丝数量")
     friends_count: int = Field(description="关注数量")
-    description: str = Field(description="个人描述")
+    description: str | None = Field(default=None, description="个人描述，转发列表等接口中可能缺失")
     gender: Literal["m", "f"] = Field(description="性别")
 
 class Post(BaseModel):
@@ -20,3 +20,19 @@ class Comment(BaseModel):
     text_raw: str = Field(description="评论内容")
     source: str = Field(description="发帖人位置")
     created_at: str = Field(description="发布时间")
+    root_id: int | None = Field(default=None, description="楼中楼回复所属的根评论ID，根评论为空")
+
+class ProgressEvent(BaseModel):
+    kind: Literal["queued", "reposts", "attitudes", "comments", "written", "post_done", "done"] = Field(description="事件类型")
+    user_id: str = Field(description="目标用户ID")
+    post_id: str | None = Field(default=None, description="事件对应的微博ID")
+    count: int = Field(default=0, description="本次事件涉及的条数")
+    posts_queued: int = Field(description="累计加入队列的微博数")
+    posts_done: int = Field(description="已处理的微博数")
+    fetched: dict[str, int] = Field(description="累计获取的转发、点赞、评论数")
+    nodes_written: int = Field(description="累计写入图数据库的节点数")
+    requests: int = Field(description="累计发出的HTTP请求数")
+    elapsed: float = Field(description="已用时间（秒）")
+    requests_per_second: float = Field(description="平均每秒请求数")
+    eta: float | None = Field(default=None, description="按已处理微博的平均耗时估计的剩余时间（秒）")
+    message: str | None = Field(default=None, description="结束时的结果说明")
@@ -1,9 +1,50 @@
 import tkinter as tk
 from tkinter import messagebox
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from model import ProgressEvent
 from net_utils import get_social_network, process_user
 import asyncio
+import os
+import queue
+import threading
+from functools import partial
+
+POLL_INTERVAL = 100  # 界面检查后台任务进度的间隔（毫秒）
+SOCIAL_NETWORK_BACKEND = os.getenv("SOCIAL_NETWORK_BACKEND", "interacts")  # 社交圈的计算方式，见 get_social_network
+
+
+class BackgroundLoop:
+    """
+    在后台线程中常驻的事件循环，所有提交的任务共用同一个循环，爬取过程不会阻塞Tk主线程
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="crawler-loop", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """提交协程，返回 concurrent.futures.Future，可在任意线程中查询结果或取消"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def _cancel_all(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self, timeout=5):
+        """取消未完成的任务（让其 finally 中的清理代码执行完毕）后停止事件循环"""
+        try:
+            self.submit(self._cancel_all()).result(timeout)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+
 
 class SocialNetworkApp:
     def __init__(self, root):
@@ -12,52 +53,134 @@ class SocialNetworkApp:
 
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.root.title("Social Network Visualizer")
-        
+
         self.user_id_label = tk.Label(root, text="Enter User ID:")
         self.user_id_label.pack(pady=10)
-        
+
         self.user_id_entry = tk.Entry(root)
         self.user_id_entry.pack(pady=5)
-        
-        self.submit_button = tk.Button(root, text="Submit", command=self.display_info)
-        self.submit_button.pack(pady=10)
-        
+
+        self.button_frame = tk.Frame(root)
+        self.button_frame.pack(pady=10)
+
+        self.submit_button = tk.Button(self.button_frame, text="Submit", command=self.display_info)
+        self.submit_button.pack(side=tk.LEFT, padx=5)
+
+        self.cancel_button = tk.Button(self.button_frame, text="Cancel", command=self.cancel, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+
+        self.status = tk.StringVar()
+        self.status_label = tk.Label(root, textvariable=self.status)
+        self.status_label.pack()
+
         self.info_text = tk.Text(root, height=5, width=50)
         self.info_text.pack(pady=10)
-        
+
         self.canvas_frame = tk.Frame(root)
         self.canvas_frame.pack(pady=10)
-    
+        self.canvas = None
+
+        # 爬取和绘图在后台事件循环中运行，进度通过队列交给主线程显示
+        self.worker = BackgroundLoop()
+        self.events = queue.Queue()
+        self.job = None
+
     def display_info(self):
+        if self.job is not None:
+            return  # 上一次提交还没有结束
+
         user_input = self.user_id_entry.get()
         try:
             user_id = int(user_input)
         except ValueError:
             messagebox.showwarning("Input Error", "Please enter a valid integer User ID.")
             return
-        
+
         # 显示“爬取中”
+        self.status.set("")
         self.info_text.delete(1.0, tk.END)
         self.info_text.insert(tk.END, "爬取中...")
-        
-        # 更新界面以显示“爬取中”
-        self.root.update_idletasks()
-        
-        info_message = asyncio.run(process_user(user_id))
-        self.info_text.delete(1.0, tk.END)
-        self.info_text.insert(tk.END, info_message)
-        
-        fig = get_social_network(user_id)
-        self.update_plot(fig)
+
+        self.submit_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.job = self.worker.submit(self.analyze(user_id))
+        self.root.after(POLL_INTERVAL, self.poll)
+
+    async def analyze(self, user_id):
+        """
+        在后台事件循环中运行：爬取互动关系，再在线程池中构建并绘制社交圈，
+        社交圈直接读取入库时维护的 INTERACTS 关系
+        """
+        await process_user(user_id, progress=self.report)
+        self.report("正在绘制社交圈...")
+        draw = partial(get_social_network, user_id, backend=SOCIAL_NETWORK_BACKEND)
+        return await asyncio.get_running_loop().run_in_executor(None, draw)
+
+    def report(self, message):
+        """可在任意线程中调用，message 为文字或 ProgressEvent，由主线程在 poll 中取出显示"""
+        self.events.put(message)
+
+    @staticmethod
+    def format_status(event):
+        status = (f"微博 {event.posts_done}/{event.posts_queued}，写入节点 {event.nodes_written}，"
+                  f"{event.requests_per_second:.1f} 请求/秒")
+        if event.eta is not None and event.kind != "done":
+            status += f"，预计剩余 {event.eta / 60:.1f} 分钟"
+        return status
+
+    def poll(self):
+        while True:
+            try:
+                message = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(message, ProgressEvent):
+                # 吞吐量和剩余时间显示在状态栏，只有结束时的结果写入文本框
+                self.status.set(self.format_status(message))
+                if message.kind != "done":
+                    continue
+                message = message.message
+            self.info_text.insert(tk.END, f"\n{message}")
+            self.info_text.see(tk.END)
+
+        if not self.job.done():
+            self.root.after(POLL_INTERVAL, self.poll)
+            return
+
+        job, self.job = self.job, None
+        self.submit_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        if job.cancelled():
+            self.info_text.insert(tk.END, "\n已取消")
+            self.info_text.see(tk.END)
+        elif job.exception() is not None:
+            messagebox.showerror("Error", str(job.exception()))
+        else:
+            self.update_plot(job.result())
+
+    def cancel(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.report("正在取消...")
 
     def update_plot(self, fig):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        # 销毁上一次的画布，避免多次提交后画布和 Figure 不断累积
+        if self.canvas is not None:
+            self.canvas.get_tk_widget().destroy()
+            self.canvas.figure.clear()
         canvas = FigureCanvasTkAgg(fig, master=self.canvas_frame)
+        self.canvas = canvas
         canvas.draw()
         canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
         canvas._tkcanvas.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
     def on_closing(self):
         # 确保关闭窗口时程序完全终止
+        if self.job is not None:
+            self.job.cancel()
+        self.worker.stop()
         self.root.destroy()
         exit()  # 显式退出程序
 
@@ -65,6 +188,3 @@ if __name__ == "__main__":
     root = tk.Tk()
     app = SocialNetworkApp(root)
     root.mainloop()
-
-
-
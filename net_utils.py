@@ -1,66 +1,70 @@
+"""
+爬取微博互动关系并写入Neo4j，读取社交圈并绘图
+
+导入本模块不读取文件、不连接数据库：.env、日志配置和 cookies.json 在第一次用到时才加载
+（configure()、get_cookie_pool()），aiohttp、neo4j、networkx、matplotlib 等较重的依赖
+也在用到它们的函数中才导入，界面和测试启动时不必为用不到的部分付出时间。
+"""
+from __future__ import annotations
+
 import logging
 from argparse import ArgumentParser
-from asyncio import Queue, Runner, sleep
+from asyncio import FIRST_COMPLETED, Queue, Runner, create_task, gather, get_running_loop, wait
 from asyncstdlib.functools import cache
 from os import getenv
+from typing import TYPE_CHECKING
 
-from aiohttp import ClientSession
-from dotenv import load_dotenv
-
-from graph import WeiboGraph
-from model import Comment, Post, User
-import json
-
-import requests
-from lxml import etree
-
-from neo4j import GraphDatabase
-import networkx as nx
-from os import getenv
-import matplotlib.pyplot as plt
-import matplotlib
-from dotenv import load_dotenv
-import numpy as np
-from weibo_follow import Follow
-import json
+from model import Comment, Post, ProgressEvent, User
 import uuid
+import heapq
+import time
+import threading
+from collections import OrderedDict
+from checkpoint import Checkpoint
+from settings import load_env
+from rate_limit import RETRY_STATUS, THROTTLE_STATUS, limiter_stats, rate_setting
+from cookie_pool import CookiePool, as_pool, pooled_request
+
+if TYPE_CHECKING:
+    from aiohttp import ClientSession, TraceConfig
+    from graph import WeiboGraph
 
 class WeiboIDScraper:
     def __init__(self, user_id, cookie):
         """
         初始化
         :param user_id: 目标用户的微博用户 ID
-        :param cookie: 登录后的微博 Cookie
+        :param cookie: 登录后的微博 Cookie，或 CookiePool
         """
         self.user_id = user_id
         self.cookie = cookie
+        self.pool = as_pool(cookie)
         self.weibo_id_list = []  # 存储爬取到的微博 ID
 
     def get_page_count(self):
         """
         获取微博总页数
         """
+        import requests
+        from lxml import etree
+
         url = f"https://weibo.cn/u/{self.user_id}?filter=0&page=1"
-        response = requests.get(url, cookies=self.cookie)
-        selector = etree.HTML(response.content)
-        if selector.xpath("//input[@name='mp']"):
-            return int(selector.xpath("//input[@name='mp']")[0].attrib['value'])
-        return 1
+        response = pooled_request(requests, self.pool, "weibo.cn/u", url)
+        return parse_page_count(etree.HTML(response.content))
 
     def get_weibo_ids_from_page(self, page):
         """
         从单页中提取微博 ID
         :param page: 页面编号
         """
+        import requests
+        from lxml import etree
+
         url = f"https://weibo.cn/u/{self.user_id}?filter=0&page={page}"
-        response = requests.get(url, cookies=self.cookie)
-        selector = etree.HTML(response.content)
-        link_list = selector.xpath("//div[@class='c']/div/a/@href")
-        for link in link_list:
-            if "comment" in link:
-                weibo_id = link.split("/")[-1].split("?")[0]
-                if weibo_id not in self.weibo_id_list:
-                    self.weibo_id_list.append(weibo_id)
+        response = pooled_request(requests, self.pool, "weibo.cn/u", url)
+        for weibo_id in parse_weibo_ids(etree.HTML(response.content)):
+            if weibo_id not in self.weibo_id_list:
+                self.weibo_id_list.append(weibo_id)
 
     def get_all_weibo_ids(self):
         """
@@ -68,25 +72,142 @@ class WeiboIDScraper:
         """
         page_count = self.get_page_count()
         print(f"微博总页数：{page_count}")
-        for page in range(1, 2):#page_count + 1):
+        for page in range(1, page_count + 1):
             print(f"正在爬取第 {page} 页")
             self.get_weibo_ids_from_page(page)
         print(f"共获取到 {len(self.weibo_id_list)} 条微博 ID")
         return self.weibo_id_list
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+_configured = False
+_cookie_pool = None
+_setup_lock = threading.Lock()
+
+
+def configure():
+    """读取 .env 并配置日志，第一次调用时执行，之后直接返回"""
+    global _configured
+    with _setup_lock:
+        if _configured:
+            return
+        load_env()
+        logging.basicConfig(
+            level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+        )
+        _configured = True
+
+
+def get_neo4j_config():
+    """Neo4j 连接参数 (uri, user, password)"""
+    configure()
+    return getenv("NEO4J_URI"), getenv("NEO4J_USER"), getenv("NEO4J_PASSWORD")
+
+
+# 可在 .env 中设置的参数：名称 -> (默认值, 类型转换)，由 get_setting 在读取 .env 后取值
+SETTINGS = {
+    "ID_PAGE_WORKERS": ("4", int),  # 同时请求的微博列表页数
+    "ID_MAX_PAGES": ("0", int),  # 最多爬取的微博列表页数，0表示全部
+    "COMMENT_PAGE_SIZE": ("20", int),  # 每页评论数，接口最多返回20条
+    "COMMENT_REPLIES": ("0", lambda value: value == "1"),  # 是否爬取楼中楼回复
+    "COMMENT_REPLY_WORKERS": ("4", int),  # 同时爬取回复的根评论数
+    "WRITE_BATCH_SIZE": ("200", int),  # 每个写入事务最多包含的节点和关系数
+    "WRITE_QUEUE_SIZE": ("1000", int),  # 等待写入的条数上限，队列满时爬取等待写入
+    "LAYOUT_CACHE_SIZE": ("32", int),  # 最多缓存多少个目标用户的布局
+    "LAYOUT_LARGE_GRAPH": ("300", int),  # 节点数超过该值时 auto 改用谱布局
+}
+
+
+def get_setting(name):
+    """SETTINGS 中参数的值，先读取 .env，环境变量优先"""
+    configure()
+    default, convert = SETTINGS[name]
+    return convert(getenv(name, default))
 
 
-# Load env
-load_dotenv()
-NEO4J_URI = getenv("NEO4J_URI")
-NEO4J_USER = getenv("NEO4J_USER")
-NEO4J_PASSWORD = getenv("NEO4J_PASSWORD")
+def get_cookie_pool():
+    """获取进程内共享的 CookiePool，首次调用时读取 cookies.json"""
+    global _cookie_pool
+    if _cookie_pool is None:
+        configure()
+        with _setup_lock:
+            if _cookie_pool is None:
+                _cookie_pool = CookiePool.load()
+    return _cookie_pool
 
-with open("cookies.json", "r") as f:
-    cookies = json.load(f)
+
+def parse_page_count(selector) -> int:
+    """weibo.cn 微博列表的总页数，只有一页时页面上没有 mp"""
+    mp = selector.xpath("//input[@name='mp']")
+    return int(mp[0].attrib['value']) if mp else 1
+
+
+def parse_weibo_ids(selector) -> list[str]:
+    """weibo.cn 微博列表页中的微博ID，按页面顺序"""
+    ids = []
+    for link in selector.xpath("//div[@class='c']/div/a/@href"):
+        if "comment" in link:
+            weibo_id = link.split("/")[-1].split("?")[0]
+            if weibo_id not in ids:
+                ids.append(weibo_id)
+    return ids
+
+
+async def stream_weibo_ids(session: ClientSession, user_id, max_pages=None, workers=None):
+    """
+    用共享的 aiohttp 会话获取用户的微博ID：先请求第1页得到总页数并立即产出其中的ID，
+    其余各页并发请求（同时至多 workers 页，速率由 weibo.cn/u 接口的限速器控制），按完成顺序产出
+
+    单页重试后仍然失败时记录日志并跳过，第1页失败时抛出异常。
+
+    :param max_pages: 最多请求的页数，0表示全部，默认为 ID_MAX_PAGES
+    :param workers: 同时请求的页数，默认为 ID_PAGE_WORKERS
+    :return: 异步生成器，每页产出本页新出现的微博ID列表
+    """
+    from asyncio import Semaphore, as_completed
+
+    if max_pages is None:
+        max_pages = get_setting("ID_MAX_PAGES")
+    if workers is None:
+        workers = get_setting("ID_PAGE_WORKERS")
+
+    def page_url(page):
+        return f"https://weibo.cn/u/{user_id}?filter=0&page={page}"
+
+    seen = set()
+
+    def new_ids(selector):
+        ids = [weibo_id for weibo_id in parse_weibo_ids(selector) if weibo_id not in seen]
+        seen.update(ids)
+        return ids
+
+    first = await fetch_json(session, "weibo.cn/u", page_url(1), read=read_html)
+    page_count = parse_page_count(first)
+    if max_pages:
+        page_count = min(page_count, max_pages)
+    logging.info(f"User {user_id} has {page_count} pages of posts")
+    yield new_ids(first)
+
+    semaphore = Semaphore(max(1, workers))
+
+    async def fetch_page(page):
+        async with semaphore:
+            try:
+                return await fetch_json(session, "weibo.cn/u", page_url(page), read=read_html)
+            except Exception as e:
+                logging.error(f"Failed to fetch page {page} of user {user_id}: {e}")
+                return None
+
+    # 显式创建任务，发现过程被取消或调用方提前关闭生成器时取消尚未完成的请求，不再占用限速额度
+    tasks = [create_task(fetch_page(page)) for page in range(2, page_count + 1)]
+    try:
+        for future in as_completed(tasks):
+            selector = await future
+            if selector is not None:
+                yield new_ids(selector)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await gather(*tasks, return_exceptions=True)
 
 
 def extract_user(data) -> User:
@@ -103,56 +224,165 @@ def extract_user(data) -> User:
     return user
 
 
-def extract_comment(data) -> Comment:
+def extract_timeline_user(data) -> User | None:
+    """
+    从转发列表等接口内嵌的用户数据构建 User，所在地和简介可能缺失（写入时保留已有的值），
+    缺少其他必需字段时返回 None
+    """
+    try:
+        return User(
+            id=data["id"],
+            location=data.get("location"),
+            screen_name=data["screen_name"],
+            followers_count=data["followers_count"],
+            friends_count=data["friends_count"],
+            gender=data["gender"],
+            description=data.get("description"),
+        )
+    except (KeyError, ValueError):
+        return None
+
+
+def extract_comment(data, root_id=None) -> Comment:
     comment = Comment(
         id=data["id"],
         text_raw=data["text_raw"],
         source=data.get("source", "未知"),
         created_at=data["created_at"],
+        root_id=root_id,
     )
 
     return comment
 
 
-async def get_reposts(session: ClientSession, id: str) -> list[tuple[str, User, Post]]:
+async def read_json(resp):
+    return await resp.json()
+
+
+async def read_html(resp):
+    """解析 weibo.cn 页面，被重定向到登录页或内容为空时抛出 ValueError，按cookie失效处理"""
+    from lxml import etree
+
+    if "passport" in str(resp.url):
+        resp.release()
+        raise ValueError(f"Redirected to login page: {resp.url}")
+    selector = etree.HTML(await resp.read())
+    if selector is None:
+        raise ValueError("Empty page")
+    return selector
+
+
+async def fetch_json(session: ClientSession, endpoint: str, url: str, throttled=None, pool: CookiePool = None,
+                     read=read_json):
+    """
+    用cookie池中的cookie，通过该cookie在接口上的自适应限速器请求JSON
+
+    418/429/5xx、非JSON响应（如跳转到登录页）和网络错误时降速并换一组cookie重试，
+    重试次数用完后抛出异常。
+
+    :param throttled: 可选，传入响应数据、返回是否被限流的函数（如还没取完却返回空数据），
+                      被限流时同样换一组cookie重试，重试次数用完后返回最后一次的数据
+    :param pool: 使用的 CookiePool，默认为 get_cookie_pool()
+    :param read: 读取响应的协程函数，默认解析JSON，请求 weibo.cn 页面时用 read_html
+    """
+    from aiohttp import ClientError, ClientResponseError, ContentTypeError
+
+    pool = pool or get_cookie_pool()
+    max_retries = rate_setting("RATE_MAX_RETRIES")
+    for attempt in range(max_retries + 1):
+        slot = pool.acquire()
+        limiter = slot.limiter(endpoint)
+        await limiter.acquire_async()
+        start = time.monotonic()
+        try:
+            resp = await session.get(url, cookies=slot.cookies)
+            if resp.status in RETRY_STATUS:
+                resp.release()
+                raise ClientResponseError(resp.request_info, resp.history, status=resp.status)
+            data = await read(resp)
+        except (ClientError, TimeoutError, ValueError) as e:
+            limiter.record(throttled=True)
+            if isinstance(e, (ContentTypeError, ValueError)):
+                pool.record(slot, failed=True)  # 跳转登录页等无法解析的响应，通常是cookie失效
+            elif getattr(e, "status", None) in THROTTLE_STATUS:
+                pool.record(slot, throttled=True)
+            if attempt == max_retries:
+                raise
+            logging.warning(f"Request to {endpoint} with {slot.name} failed, retrying at a lower rate: {e}")
+            continue
+        if throttled is not None and throttled(data):
+            limiter.record(throttled=True)
+            pool.record(slot, throttled=True)
+            if attempt < max_retries:
+                logging.warning(f"Empty page from {endpoint} with {slot.name}, retrying")
+                continue
+            return data
+        limiter.record(latency=time.monotonic() - start)
+        pool.record(slot)
+        return data
+
+
+def page_truncated(count: int, total):
+    """分页接口还没取完（count < total）却返回空数据时视为被限流，返回判断函数"""
+    return lambda data: not data.get("data") and total is not None and count < total
+
+
+async def stream_reposts(session: ClientSession, id: str):
+    """
+    逐页产出一条微博的转发
+
+    :return: 异步生成器，每页产出 [(转发微博的 mblogid, User, Post)]
+    """
     page = 1
     count = 0
-    reposts = []
+    total = None
     logging.info(f"Fetching reposts for post ID: {id}")
     while True:
-        resp = await session.get(
-            f"https://weibo.com/ajax/statuses/repostTimeline?id={id}&page={page}&moduleID=feed&count=10"
+        data = await fetch_json(
+            session, "repostTimeline",
+            f"https://weibo.com/ajax/statuses/repostTimeline?id={id}&page={page}&moduleID=feed&count=10",
+            page_truncated(count, total),
         )
-        data = await resp.json()
 
         if len(data["data"]) == 0:
             break
 
         total = data["total_number"]
 
+        reposts = []
         for item in data["data"]:
             try:
-                post = await get_post(session, item["mblogid"])
-                reposts.append((item["mblogid"], *post))
+                reposts.append((item["mblogid"], *await parse_repost(session, item)))
             except Exception as e:
                 logging.error(e)
 
-            await sleep(1)
-
         count += len(data["data"])
 
         logging.info(
             f"Fetched {len(data['data'])} reposts on page {page} (total so far: {count}/{total})"
         )
+        yield reposts
 
         if count >= total:
             break
 
         page += 1
 
-        await sleep(1)
 
-    return reposts
+async def parse_repost(session: ClientSession, item: dict) -> tuple[User, Post]:
+    """
+    直接用转发列表中的数据构建转发者和转发微博，不再逐条请求；
+    只有正文被截断（isLongText）时才请求完整微博，内嵌用户数据不完整时才请求用户信息
+    """
+    if item.get("isLongText"):
+        return await get_post(session, item["mblogid"])
+    user = extract_timeline_user(item["user"]) or await get_user(session, item["user"]["id"])
+    post = Post(id=item["id"], text_raw=item["text_raw"], created_at=item["created_at"])
+    return user, post
+
+
+async def get_reposts(session: ClientSession, id: str) -> list[tuple[str, User, Post]]:
+    return [repost async for page in stream_reposts(session, id) for repost in page]
 
 
 async def get_user(session: ClientSession, id: str) -> User:
@@ -160,8 +390,7 @@ async def get_user(session: ClientSession, id: str) -> User:
 
     @cache
     async def _get_user(id: str):
-        resp = await session.get(f"https://weibo.com/ajax/profile/info?uid={id}")
-        data = await resp.json()
+        data = await fetch_json(session, "profile/info", f"https://weibo.com/ajax/profile/info?uid={id}")
 
         data = data["data"]["user"]
 
@@ -182,156 +411,610 @@ async def get_user(session: ClientSession, id: str) -> User:
 
 async def get_post(session: ClientSession, id: str) -> tuple[User, Post]:
     logging.info(f"Fetching post details for post ID: {id}")
-    resp = await session.get(
+    data = await fetch_json(
+        session, "statuses/show",
         f"https://weibo.com/ajax/statuses/show?id={id}&locale=zh-CN&isGetLongText=true"
     )
-    data = await resp.json()
 
-    await sleep(0.5)
     user = await get_user(session, data["user"]["id"])
     post = Post(id=data["id"], text_raw=data["text_raw"], created_at=data["created_at"])
 
     return user, post
 
 
-async def get_comments(session: ClientSession, id: str) -> list[tuple[User, Comment]]:
-    max_id = ""
-    count = 0
-    comments = []
-    logging.info(f"Fetching comments for post ID: {id}")
+def comments_url(id, max_id="", count=None, level=0, uid=None):
+    """
+    buildComments 接口地址
+
+    :param id: level 为0时是微博ID，为1时是根评论ID
+    :param count: 每页条数，默认为 COMMENT_PAGE_SIZE
+    :param level: 0 为根评论，1 为某条根评论下的楼中楼回复
+    :param uid: 可选，微博作者ID，爬取回复时携带
+    """
+    if count is None:
+        count = get_setting("COMMENT_PAGE_SIZE")
+    url = (f"https://weibo.com/ajax/statuses/buildComments?is_reload=1&id={id}&is_show_bulletin=2"
+           f"&is_mix={level}&count={count}&fetch_level={level}&locale=zh-CN&max_id={max_id}")
+    if uid is not None:
+        url += f"&uid={uid}"
+    return url
+
+
+async def get_replies(session: ClientSession, root: dict, count=None, uid=None) -> list[tuple[User, Comment]]:
+    """
+    获取一条根评论下的所有楼中楼回复
+
+    根评论自带的预览（comments 字段）已包含全部回复时直接使用，不再请求。
+
+    :param root: buildComments 返回的根评论数据
+    """
+    root_id = root["id"]
+    preview = root.get("comments") or []
+    total = root.get("total_number") or 0
+    if len(preview) >= total:
+        return [(extract_user(item["user"]), extract_comment(item, root_id)) for item in preview]
+
+    replies = []
+    max_id = 0
     while True:
+        data = await fetch_json(
+            session, "buildComments/replies", comments_url(root_id, max_id, count, level=1, uid=uid),
+            page_truncated(len(replies), total),
+        )
+        if len(data["data"]) == 0:
+            break
+        total = data.get("total_number", total)
+        replies.extend((extract_user(item["user"]), extract_comment(item, root_id)) for item in data["data"])
+        max_id = data.get("max_id")
+        if len(replies) >= total or not max_id:
+            break
+    return replies
+
+
+async def stream_comments(session: ClientSession, id: str, max_id="", count=None, replies=False,
+                          reply_workers=None, uid=None):
+    """
+    按 max_id 游标逐页产出一条微博的评论，不在内存中累积全部评论，适合评论数很多的微博
+    使用示例:
+        async for page, next_max_id in stream_comments(session, post_id, replies=True):
+            ...
+
+    :param max_id: 从该游标开始爬取，用于断点续爬
+    :param count: 每页评论数，默认为 COMMENT_PAGE_SIZE
+    :param replies: 为True时同时爬取每条根评论下的楼中楼回复，同一页的根评论并发爬取，
+                    回复紧跟在本页的根评论之后产出
+    :param reply_workers: 同时爬取回复的根评论数，总速率仍由限速器控制，默认为 COMMENT_REPLY_WORKERS
+    :param uid: 可选，微博作者ID，爬取回复时携带
+    :return: 异步生成器，产出 (本页评论 [(User, Comment)], 下一页的 max_id)，最后一页的游标为 None
+    """
+    from asyncio import Semaphore, gather
+
+    if reply_workers is None:
+        reply_workers = get_setting("COMMENT_REPLY_WORKERS")
+    fetched = 0
+    total = None
+    semaphore = Semaphore(max(1, reply_workers))
+
+    async def fetch_replies(root):
+        async with semaphore:
+            try:
+                return await get_replies(session, root, count, uid)
+            except Exception as e:
+                # 回复爬取失败不影响根评论和后续页面
+                logging.error(f"Failed to fetch replies of comment {root['id']}: {e}")
+                return []
 
-        resp = await session.get(
-            f"https://weibo.com/ajax/statuses/buildComments?is_reload=1&id={id}&is_show_bulletin=2&is_mix=0&count=10&fetch_level=0&locale=zh-CN&max_id={max_id}"
+    logging.info(f"Fetching comments for post ID: {id}")
+    while True:
+        data = await fetch_json(
+            session, "buildComments", comments_url(id, max_id, count), page_truncated(fetched, total),
         )
-        data = await resp.json()
 
         if len(data["data"]) == 0:
             break
 
         total = data["total_number"]
+        fetched += len(data["data"])
+        page = [(extract_user(item["user"]), extract_comment(item)) for item in data["data"]]
+        if replies:
+            roots = [item for item in data["data"] if item.get("total_number") or item.get("comments")]
+            for reply_page in await gather(*(fetch_replies(root) for root in roots)):
+                page.extend(reply_page)
 
-        for item in data["data"]:
-            comments.append((extract_user(item["user"]), extract_comment(item)))
+        logging.info(f"Fetched {len(page)} comments (total so far: {fetched}/{total})")
 
-        count += len(data["data"])
+        finished = fetched >= total or not data.get("max_id")
+        yield page, None if finished else data["max_id"]
 
-        logging.info(
-            f"Fetched {len(data['data'])} comments (total so far: {count}/{total})"
-        )
-
-        if count >= total:
+        if finished:
             break
 
         max_id = data["max_id"]
 
-        await sleep(1)
 
+async def get_comments(session: ClientSession, id: str, max_id="", on_page=None, **kwargs) -> list[tuple[User, Comment]]:
+    """
+    获取一条微博的全部评论，参数见 stream_comments
+
+    :param max_id: 从该游标开始爬取，用于断点续爬
+    :param on_page: 可选的协程函数，每页爬取后以 (本页评论, 下一页的 max_id) 调用，最后一页的游标为 None
+    """
+    comments = []
+    async for page, next_max_id in stream_comments(session, id, max_id, **kwargs):
+        comments.extend(page)
+        if on_page is not None:
+            await on_page(page, next_max_id)
     return comments
 
 
-async def get_attitudes(session: ClientSession, id: str) -> list[User]:
+async def stream_attitudes(session: ClientSession, id: str):
+    """
+    逐页产出一条微博的点赞用户
+
+    :return: 异步生成器，每页产出 [User]
+    """
     page = 1
     count = 0
-    users = []
+    total = None
     logging.info(f"Fetching attitudes for post ID: {id}")
     while True:
-        resp = await session.get(
-            f"https://weibo.com/ajax/statuses/likeShow?id={id}&attitude_type=0&attitude_enable=1&page={page}&count=10"
+        data = await fetch_json(
+            session, "likeShow",
+            f"https://weibo.com/ajax/statuses/likeShow?id={id}&attitude_type=0&attitude_enable=1&page={page}&count=10",
+            page_truncated(count, total),
         )
-        data = await resp.json()
 
         if len(data["data"]) == 0:
             break
 
         total = data["total_number"]
 
-        for item in data["data"]:
-            users.append(extract_user(item["user"]))
-
+        users = [extract_user(item["user"]) for item in data["data"]]
         count += len(data["data"])
 
         logging.info(
             f"Fetched {len(data['data'])} attitudes on page {page} (total so far: {count}/{total})"
         )
+        yield users
 
         if count >= total:
             break
 
         page += 1
 
-        await sleep(1)
 
-    return users
+async def get_attitudes(session: ClientSession, id: str) -> list[User]:
+    return [user async for page in stream_attitudes(session, id) for user in page]
+
+
+class GraphWriter:
+    """
+    在后台任务中批量写入图数据库，爬取和写入同时进行
+
+    爬取协程用 put() 把节点和关系放入有界队列，写入任务每次取出至多 batch_size 条，
+    通过 WeiboGraph.write_batch 在一个事务中写入。after() 放入的回调在它之前的数据写入后
+    才执行，用于保存断点。写入失败后，之后的 put()/after()/sync() 抛出同一个异常。
+    使用示例:
+        async with GraphWriter(graph) as writer:
+            await writer.put("users", user)
+            await writer.after(save)
+    """
+
+    KINDS = ("users", "posts", "comments", "likes", "reposts")
+
+    def __init__(self, graph: WeiboGraph, batch_size=None, queue_size=None):
+        """batch_size、queue_size 默认为 WRITE_BATCH_SIZE、WRITE_QUEUE_SIZE"""
+        if batch_size is None:
+            batch_size = get_setting("WRITE_BATCH_SIZE")
+        if queue_size is None:
+            queue_size = get_setting("WRITE_QUEUE_SIZE")
+        self.graph = graph
+        self.batch_size = max(1, batch_size)
+        self.queue = Queue(maxsize=queue_size)
+        self.task = None
+        self.error = None
+        self.batches = 0
+
+    async def __aenter__(self):
+        self.task = create_task(self._consume())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            # 爬取出错时也把已经取得的数据写完，断点停在最后写入的位置
+            if (exc_type is None or issubclass(exc_type, Exception)) and self.error is None:
+                await self.sync()
+        finally:
+            self.task.cancel()
+            await gather(self.task, return_exceptions=True)
+
+    def _check(self):
+        if self.error is not None:
+            raise self.error
+
+    async def put(self, kind, *args):
+        """放入一条待写入的数据，kind 和 args 见 WeiboGraph.write_batch 的参数"""
+        self._check()
+        await self.queue.put(("write", kind, args))
+
+    async def after(self, callback):
+        """callback 在此前放入的数据全部写入后，在写入任务中调用"""
+        self._check()
+        await self.queue.put(("callback", callback, None))
+
+    async def sync(self):
+        """等待此前放入的数据全部写入"""
+        future = get_running_loop().create_future()
+        self._check()
+        await self.queue.put(("sync", future, None))
+        await future
+
+    async def _consume(self):
+        while True:
+            batch = {kind: [] for kind in self.KINDS}
+            size = 0
+            item = await self.queue.get()
+            # 取出已经在队列中的数据凑成一批，遇到回调时先写入再调用
+            while item[0] == "write":
+                batch[item[1]].append(item[2])
+                size += 1
+                if size >= self.batch_size or self.queue.empty():
+                    item = None
+                    break
+                item = self.queue.get_nowait()
+
+            if size and self.error is None:
+                try:
+                    await self.graph.write_batch(**batch)
+                    self.batches += 1
+                except Exception as e:
+                    logging.error(f"Failed to write batch: {e}")
+                    self.error = e
+
+            if item is None:
+                continue
+            kind, target, _ = item
+            if kind == "sync":
+                if self.error is not None:
+                    target.set_exception(self.error)
+                elif not target.done():
+                    target.set_result(None)
+            elif self.error is None:
+                target()
+
+
+class CrawlProgress:
+    """
+    统计一次爬取的进度，每个阶段完成时通过回调发出 ProgressEvent
+
+    HTTP 请求数通过 aiohttp 的 TraceConfig 统计，创建 ClientSession 时传入 trace_config()。
+    """
+
+    def __init__(self, user_id, callback=None):
+        """
+        :param callback: 可选，接收 ProgressEvent 的函数，在运行事件循环的线程中调用
+        """
+        self.user_id = str(user_id)
+        self.callback = callback
+        self.started = time.monotonic()
+        self.posts_queued = 0
+        self.posts_done = 0
+        self.fetched = {"reposts": 0, "attitudes": 0, "comments": 0}
+        self.nodes_written = 0
+        self.requests = 0
+
+    def trace_config(self) -> TraceConfig:
+        from aiohttp import TraceConfig
+
+        config = TraceConfig()
+
+        async def on_request_done(session, context, params):
+            self.requests += 1
+
+        config.on_request_end.append(on_request_done)
+        config.on_request_exception.append(on_request_done)
+        return config
+
+    def emit(self, kind, post_id=None, count=0, message=None) -> ProgressEvent:
+        if kind == "queued":
+            self.posts_queued += count
+        elif kind in self.fetched:
+            self.fetched[kind] += count
+        elif kind == "written":
+            self.nodes_written += count
+        elif kind == "post_done":
+            self.posts_done += 1
+
+        elapsed = time.monotonic() - self.started
+        eta = None
+        if self.posts_done:
+            eta = elapsed / self.posts_done * max(self.posts_queued - self.posts_done, 0)
+        event = ProgressEvent(
+            kind=kind,
+            user_id=self.user_id,
+            post_id=None if post_id is None else str(post_id),
+            count=count,
+            posts_queued=self.posts_queued,
+            posts_done=self.posts_done,
+            fetched=dict(self.fetched),
+            nodes_written=self.nodes_written,
+            requests=self.requests,
+            elapsed=elapsed,
+            requests_per_second=self.requests / elapsed if elapsed > 0 else 0.0,
+            eta=eta,
+            message=message,
+        )
+        if self.callback is not None:
+            self.callback(event)
+        return event
+
 
+async def entry(session: ClientSession, graph: WeiboGraph, id: str, entriesq: Queue, tracker: CrawlProgress = None,
+                state: dict = None, save=None, writer: GraphWriter = None) -> int:
+    """
+    爬取一条微博的转发、点赞和评论并写入图数据库，每页数据交给 GraphWriter 在后台批量写入，
+    写入的同时继续爬取下一页
+
+    :param state: 可选，这条微博的爬取进度，各阶段写入完成后更新；从断点恢复时跳过已完成的阶段，
+                  评论从 comments_max_id 游标继续爬取
+    :param save: 可选，state 更新后调用，用于写入断点
+    :param writer: 可选，共用的 GraphWriter，默认为这条微博单独创建
+    :return: 写入的节点数
+    """
+    if writer is None:
+        async with GraphWriter(graph) as writer:
+            return await entry(session, graph, id, entriesq, tracker, state, save, writer)
+
+    tracker = tracker or CrawlProgress(id)
+    state = state if state is not None else {"id": id, "done": []}
+    save = save or (lambda: None)
+    written = 0
+
+    def finish(stage):
+        # 阶段的数据写入后才记录完成
+        def done():
+            state["done"].append(stage)
+            save()
+        return writer.after(done)
+
+    def save_cursor(max_id):
+        def done():
+            state["comments_max_id"] = max_id
+            save()
+        return writer.after(done)
 
-async def entry(session: ClientSession, graph: WeiboGraph, id: str, entriesq: Queue):
     logging.info(f"Processing entry ID: {id}")
 
     # Process the post self
-    user, post = await get_post(session, id)
-    await graph.create_user(user)
-    await graph.create_post(post, user.id)
+    if "post" not in state["done"]:
+        user, post = await get_post(session, id)
+        await writer.put("users", user)
+        await writer.put("posts", post, user.id)
+        state["post_id"] = post.id
+        state["post_user_id"] = user.id
+        written += 2
+        await finish("post")
+    post_id = state["post_id"]
 
     # Process the reposts
-    reports = await get_reposts(session, post.id)
-    for mblogid, user, report in reports:
-        await graph.create_user(user)
-        await graph.create_post(report, user.id)
-        await graph.create_repost_relationship(user.id, report.id, post.id)
-        await entriesq.put(mblogid)
+    if "reposts" not in state["done"]:
+        async for reports in stream_reposts(session, post_id):
+            tracker.emit("reposts", id, len(reports))
+            for mblogid, user, report in reports:
+                await writer.put("users", user)
+                await writer.put("posts", report, user.id)
+                await writer.put("reposts", user.id, report.id, post_id)
+                await entriesq.put(mblogid)
+            if reports:
+                tracker.emit("queued", id, len(reports))
+            written += 2 * len(reports)
+        await finish("reposts")  # 转发的微博已进入队列，和阶段一起保存
 
     # Process the attitudes
-    users = await get_attitudes(session, post.id)
-    for user in users:
-        await graph.create_user(user)
-        await graph.create_like_relationship(user.id, post.id)
-
-    # Process the comments
-    comments = await get_comments(session, post.id)
-    for user, comment in comments:
-        await graph.create_user(user)
-        await graph.create_comment(comment, user.id, post.id)
-
+    if "attitudes" not in state["done"]:
+        async for users in stream_attitudes(session, post_id):
+            tracker.emit("attitudes", id, len(users))
+            for user in users:
+                await writer.put("users", user)
+                await writer.put("likes", user.id, post_id)
+            written += len(users)
+        await finish("attitudes")
+
+    # Process the comments，每页写入后保存游标
+    if "comments" not in state["done"]:
+        comments = stream_comments(session, post_id, state.get("comments_max_id") or "",
+                                   replies=get_setting("COMMENT_REPLIES"), uid=state.get("post_user_id"))
+        async for page, next_max_id in comments:
+            for user, comment in page:
+                await writer.put("users", user)
+                await writer.put("comments", comment, user.id, post_id)
+            written += 2 * len(page)
+            await save_cursor(next_max_id)
+            tracker.emit("comments", id, len(page))
+        await finish("comments")
+
+    await writer.sync()
+    tracker.emit("written", id, written)
     logging.info(f"Finished processing entry ID: {id}")
+    return written
 
 
-async def run(session: ClientSession, graph: WeiboGraph, user_id: str):
-    scraper = WeiboIDScraper(user_id, cookies)
-    weibo_ids = scraper.get_all_weibo_ids()
-    entriesq = Queue()
-    for item in weibo_ids:
-        await entriesq.put(item)
+class EntryQueue(Queue):
+    """可以取出当前内容用于保存断点的队列"""
+
+    def snapshot(self):
+        return list(self._queue)
 
-    while not entriesq.empty():
-        id = await entriesq.get()
 
-        logging.info(f"Starting processing for entry ID: {id}")
-        await entry(session, graph, id, entriesq)
+async def run(session: ClientSession, graph: WeiboGraph, user_id: str, tracker: CrawlProgress = None,
+              checkpoint: Checkpoint = None, resume=False):
+    """
+    :param tracker: 可选的 CrawlProgress，用于发出进度事件
+    :param checkpoint: 可选的 Checkpoint，保存待爬取的微博队列和正在处理的微博的进度，
+                       每个阶段和每页评论完成后写入，全部完成后删除
+    :param resume: 为True且存在断点时，从断点继续爬取；断点保存时微博列表还没获取完的，重新获取并跳过
+                   已在队列中或已经爬取完成的微博
+    """
+    tracker = tracker or CrawlProgress(user_id)
+    entriesq = EntryQueue()
+    state = checkpoint.load() if checkpoint is not None and resume else None
+    if state:
+        current = state.get("current")
+        pending = ([current["id"]] if current else []) + state["pending"]
+        completed = state.get("completed", [])
+        logging.info(f"Resuming from checkpoint: {len(pending)} entries pending")
+    else:
+        current = None
+        pending = []
+        completed = []
+    for item in pending:
+        await entriesq.put(item)
+    if pending:
+        tracker.emit("queued", count=len(pending))
+
+    async def discover(skip):
+        # 微博ID边获取边放入队列，第1页解析完即可开始爬取
+        async for ids in stream_weibo_ids(session, user_id):
+            ids = [weibo_id for weibo_id in ids if weibo_id not in skip]
+            for weibo_id in ids:
+                await entriesq.put(weibo_id)
+            if ids:
+                tracker.emit("queued", count=len(ids))
+
+    discovery = None
+    if not state or not state.get("discovered", True):
+        discovery = create_task(discover(set(pending) | set(completed)))
+
+    def discovered():
+        return discovery is None or (discovery.done() and not discovery.cancelled() and discovery.exception() is None)
+
+    def save(current=None):
+        if checkpoint is not None:
+            done = discovered()
+            # 微博列表还没获取完时记录已完成的微博，恢复后重新获取列表时跳过
+            checkpoint.save({"user_id": str(user_id), "pending": entriesq.snapshot(), "current": current,
+                             "discovered": done, "completed": [] if done else completed})
+
+    async def next_entry():
+        """取下一条微博，队列为空且微博列表已获取完时返回 None"""
+        while entriesq.empty():
+            if discovery is None or discovery.done():
+                return None
+            getter = create_task(entriesq.get())
+            await wait({getter, discovery}, return_when=FIRST_COMPLETED)
+            if getter.done():
+                return getter.result()
+            getter.cancel()
+        return entriesq.get_nowait()
 
+    try:
+        async with GraphWriter(graph) as writer:
+            while (id := await next_entry()) is not None:
+                if current is None or current["id"] != id:
+                    current = {"id": id, "done": []}
+
+                logging.info(f"Starting processing for entry ID: {id}")
+                await entry(session, graph, id, entriesq, tracker, current, lambda: save(current), writer)
+                current = None
+                completed.append(id)
+                save()
+                tracker.emit("post_done", id)
+        if discovery is not None:
+            await discovery  # 第1页失败等错误在这里抛出
+    finally:
+        if discovery is not None and not discovery.done():
+            discovery.cancel()
+            await gather(discovery, return_exceptions=True)
+
+    if checkpoint is not None:
+        checkpoint.clear()
     logging.info("All tasks completed.")
 
 
-async def process_user(user_id: str) -> str:
+async def process_user(user_id: str, progress=None, resume=False) -> str:
     """
     封装的函数，以 user_id 作为输入参数，爬取互动关系并存入数据库。
     使用示例:
         result = asyncio.run(process_user(123456789))
+
+    :param progress: 可选的回调函数，爬取过程中接收 ProgressEvent，在运行事件循环的线程中调用；
+                     结束时发出 kind 为 done 的事件，message 与返回值相同
+    :param resume: 为True时从上次中断的位置继续爬取
     """
-    graph = WeiboGraph(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+    from aiohttp import ClientSession, DummyCookieJar
+    from graph import WeiboGraph
+
+    tracker = CrawlProgress(user_id, progress)
+    graph = WeiboGraph(*get_neo4j_config())
     try:
-        async with ClientSession(cookies=cookies) as session:
-            await run(session, graph, user_id)
-        return "成功爬取用户互动关系，可通过 http://localhost:7474 访问Neo4j Browser界面查看详细数据"
+        await graph.create_indexes()
+        # 每个请求单独携带cookie池分配的cookie，响应中的Set-Cookie不保存，避免不同账号的cookie混在一起
+        async with ClientSession(cookie_jar=DummyCookieJar(), trace_configs=[tracker.trace_config()]) as session:
+            await run(session, graph, user_id, tracker, Checkpoint(f"crawl_{user_id}"), resume)
+        for endpoint, stats in limiter_stats().items():
+            logging.info(f"{endpoint}: {stats['requests']} requests, {stats['throttled']} throttled, "
+                         f"rate {stats['rate']:.2f}/s")
+        for stats in get_cookie_pool().stats():
+            logging.info(f"{stats['name']}: {stats['requests']} requests, {stats['throttled']} throttled, "
+                         f"{stats['failures']} failures{', retired' if stats['retired'] else ''}")
+        message = "成功爬取用户互动关系，可通过 http://localhost:7474 访问Neo4j Browser界面查看详细数据"
     except Exception as e:
         logging.error(f"处理用户 {user_id} 时发生错误: {e}")
-        return f"失败: {str(e)}"
-    
+        message = f"失败: {str(e)}"
+    finally:
+        await graph.close()
+    tracker.emit("done", message=message)
+    return message
+
+
+async def stream_process_user(user_id: str):
+    """
+    process_user 的异步生成器版本，逐个产出进度事件，最后一个事件的 kind 为 done
+    使用示例:
+        async for event in stream_process_user(123456789):
+            print(event.posts_done, event.requests_per_second, event.eta)
+    """
+    events = Queue()
+    task = create_task(process_user(user_id, progress=events.put_nowait))
+    try:
+        while True:
+            getter = create_task(events.get())
+            await wait({getter, task}, return_when=FIRST_COMPLETED)
+            if not getter.done():
+                # process_user 提前结束（被取消或抛出异常），取出剩余事件后结束
+                getter.cancel()
+                while not events.empty():
+                    yield events.get_nowait()
+                await task
+                return
+            event = getter.result()
+            yield event
+            if event.kind == "done":
+                break
+        await task
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def rebuild_interactions():
+    """为已有数据重新计算 INTERACTS 聚合关系"""
+    from graph import WeiboGraph
+
+    graph = WeiboGraph(*get_neo4j_config())
+    try:
+        await graph.create_indexes()
+        await graph.rebuild_interactions()
+        logging.info("INTERACTS 关系已重新计算")
+    finally:
+        await graph.close()
 
 
 
 
 def follow_network(user_id, cookie):
+    from weibo_follow import Follow
+
     # 将爬取的关注列表写入network.txt
     fw = Follow(user_id, cookie)    # 调用Weibo类，创建微博实例wb
     fw.get_follow_list()            # 获取关注列表的uid和昵称
@@ -348,35 +1031,93 @@ def follow_network(user_id, cookie):
 
     return follow_relations, user_info
 
-def merge_user_and_post(G):
-    nodes_to_remove = []
-    edges_to_add = []
-    
-    for u, v, key, data in list(G.edges(data=True, keys=True)):
-        if data.get('label') in {'POSTED', 'REPOSTED', 'COMMENTED'}:
-            user_id = u
-            post_id = v
-
-            for pred in list(G.predecessors(v)):
-                if pred != u:
-                    for k, edge_data in G.get_edge_data(pred, v).items():
-                        G.add_edge(pred, user_id, key=k, **edge_data)
-                G.remove_edge(pred, v)
-
-            for succ in list(G.successors(v)):
-                if succ != u:
-                    for k, edge_data in G.get_edge_data(v, succ).items():
-                        G.add_edge(user_id, succ, key=k, **edge_data)
-                G.remove_edge(v, succ)
-            
-            nodes_to_remove.append(v)
-    
-    for node in set(nodes_to_remove):
-        G.remove_node(node)
+# 表示内容归属的关系，优先级从高到低，内容节点会被合并到其归属用户
+OWNER_LABELS = {'POSTED': 0, 'REPOSTED': 1, 'COMMENTED': 2}
 
+
+def get_content_owners(G):
+    """
+    获取内容节点（帖子、评论）到其归属用户的映射
+
+    同一内容有多条归属关系时，按 POSTED > REPOSTED > COMMENTED 的优先级选择。
+    """
+    owners = {}
+    for u, v, data in G.edges(data=True):
+        priority = OWNER_LABELS.get(data.get('label'))
+        if priority is not None and (v not in owners or priority < owners[v][0]):
+            owners[v] = (priority, u)
+    return {content: owner for content, (_, owner) in owners.items()}
+
+
+def project_user_graph(G, compact=False):
+    """
+    把用户-内容图投影为用户之间的互动图，一次遍历所有边，耗时与边数成正比
+
+    每条边的两端若是内容节点则替换为其归属用户，内容节点本身被移除；
+    用户与自己内容之间的边（如发帖关系）投影后成为自环，直接丢弃。
+
+    :param compact: 为True时返回 DiGraph，同一对用户之间的多条边合并为一条，
+                    weight 为权重之和，labels 记录各类关系的条数
+    :return: 新的 MultiDiGraph 或 DiGraph，原图不变
+    """
+    import networkx as nx
+
+    owners = get_content_owners(G)
+
+    H = nx.DiGraph() if compact else nx.MultiDiGraph()
+    H.add_nodes_from((node, data) for node, data in G.nodes(data=True) if node not in owners)
+
+    for u, v, key, data in G.edges(keys=True, data=True):
+        source = owners.get(u, u)
+        target = owners.get(v, v)
+        if source == target:
+            continue
+        if not compact:
+            H.add_edge(source, target, key=key, **data)
+            continue
+
+        label = data.get('label')
+        weight = data.get('weight', 0)
+        if H.has_edge(source, target):
+            edge_data = H[source][target]
+            edge_data['weight'] += weight
+            edge_data['labels'][label] = edge_data['labels'].get(label, 0) + 1
+        else:
+            H.add_edge(source, target, weight=weight, labels={label: 1})
+
+    return H
+
+
+def merge_user_and_post(G):
+    G = project_user_graph(G)
     print("用户和贴子节点已成功合并")
     return G
 
+# 关系类型对应的关联度权重
+RELATION_WEIGHTS = {"LIKED": 1, "COMMENTS": 2, "REPOST_OF": 3}
+
+# 自我中心网络每一跳中，每个起点节点每种关系最多展开的条数
+EGO_RELATION_LIMITS = {
+    "POSTED": 500,
+    "REPOSTED": 500,
+    "COMMENTED": 1000,
+    "LIKED": 1000,
+    "COMMENTS": 1000,
+    "REPOST_OF": 500,
+}
+
+
+def add_relationship(G, node1, relation, node2):
+    """把一条Neo4j关系及其两端节点加入NetworkX图，重复加入同一关系不会产生重复的边"""
+    node1_id = node1["id"]
+    node2_id = node2["id"]
+    G.add_node(node1_id, label=node1["label"], properties=node1._properties)
+    G.add_node(node2_id, label=node2["label"], properties=node2._properties)
+    # 根据关系类型赋予权重
+    weight = RELATION_WEIGHTS.get(relation.type, 0)
+    G.add_edge(node1_id, node2_id, key=relation.element_id, label=relation.type, properties=relation._properties, weight=weight)
+
+
 def get_data(tx):
     query = """
     MATCH (n)-[r]->(m)
@@ -390,52 +1131,272 @@ def convert_to_nx_graph(driver,G):
         records = session.execute_read(get_data)
 
         for record in records:
-            node1 = record["n"]
-            node2 = record["m"]
-            relation = record["r"]
-            node1_id = record["node1_id"]
-            node2_id = record["node2_id"]
-
-            G.add_node(node1_id, label=node1["label"], properties=node1._properties)
-            G.add_node(node2_id, label=node2["label"], properties=node2._properties)
-            # 根据关系类型赋予权重
-            weight = 0
-            if relation.type == "LIKED":
-                weight = 1
-            elif relation.type == "COMMENTS":
-                weight = 2
-            elif relation.type == "REPOST_OF":
-                weight = 3
-            
-            G.add_edge(node1_id, node2_id, key=relation.element_id, label=relation.type, properties=relation._properties, weight=weight)
+            add_relationship(G, record["n"], record["r"], record["m"])
 
     print("Neo4j数据已成功转换为NetworkX图")
 
+
+# 扩展自我中心网络时返回完整节点和关系，或只返回ID和关系类型
+EGO_RETURN_FULL = "startNode(r) AS s, r, endNode(r) AS e"
+EGO_RETURN_IDS = "startNode(r).id AS s_id, type(r) AS type, endNode(r).id AS e_id, elementId(r) AS rid"
+
+
+def expand_ego_hop(tx, frontier, limits, on_record, returns=EGO_RETURN_FULL):
+    """
+    从 frontier 中的节点向外扩展一跳，每读到一条记录就交给 on_record 处理
+
+    :param frontier: 本跳起点节点的 elementId 列表
+    :param limits: 关系类型到本跳每个起点最多展开条数的映射，在子查询中对每个起点分别限制，
+                   避免关系多的节点占满整个 frontier 的名额
+    :param on_record: 处理单条记录的函数
+    :param returns: 查询返回的字段，EGO_RETURN_FULL 或 EGO_RETURN_IDS
+    :return: 本跳新发现节点的 elementId 集合
+    """
+    discovered = set()
+    for rel_type, limit in limits.items():
+        if rel_type not in EGO_RELATION_LIMITS:
+            raise ValueError(f"不支持的关系类型: {rel_type}")
+        query = f"""
+        UNWIND $frontier AS frontier_id
+        MATCH (n) WHERE elementId(n) = frontier_id
+        CALL {{
+            WITH n
+            MATCH (n)-[r:{rel_type}]-(m)
+            RETURN r, m
+            LIMIT $limit
+        }}
+        RETURN {returns}, elementId(m) AS m_id
+        """
+        for record in tx.run(query, frontier=frontier, limit=limit):
+            on_record(record)
+            discovered.add(record["m_id"])
+    return discovered
+
+
+def walk_ego_network(driver, target_id, on_record, hops=3, limits=None, returns=EGO_RETURN_FULL):
+    """
+    从目标用户出发逐跳扩展 hops 跳，每条关系记录交给 on_record 处理
+
+    :return: 目标用户是否存在
+    """
+    limits = limits or EGO_RELATION_LIMITS
+    with driver.session() as session:
+        record = session.run("MATCH (u:User {id: $id}) RETURN elementId(u) AS element_id", id=target_id).single()
+        if record is None:
+            print(f"Neo4j中不存在用户 {target_id}")
+            return False
+
+        visited = {record["element_id"]}
+        frontier = [record["element_id"]]
+        for hop in range(hops):
+            if not frontier:
+                break
+            discovered = session.execute_read(expand_ego_hop, frontier, limits, on_record, returns)
+            frontier = list(discovered - visited)
+            visited.update(frontier)
+    return True
+
+
+def convert_ego_to_nx_graph(driver, G, target_id, hops=3, limits=None):
+    """
+    只读取目标用户 hops 跳以内的自我中心网络，耗时取决于邻域大小而不是整个数据库的大小
+
+    默认3跳可以覆盖 用户-帖子-评论-评论者、用户-帖子-转发帖-转发者 这类最长的互动路径。
+
+    :param target_id: 目标用户ID
+    :param hops: 扩展的跳数
+    :param limits: 关系类型到每个节点每跳最多展开条数的映射，默认为 EGO_RELATION_LIMITS
+    """
+    def on_record(record):
+        add_relationship(G, record["s"], record["r"], record["e"])
+
+    if walk_ego_network(driver, target_id, on_record, hops, limits):
+        print(f"已读取用户 {target_id} 的{hops}跳自我中心网络：{G.number_of_nodes()} 个节点，{G.number_of_edges()} 条边")
+
+
+def project_edges(edges):
+    """
+    project_user_graph 的边列表版本，输入输出均为 (起点ID, 终点ID, 关系类型, 权重)
+
+    :param edges: 边列表，会遍历两次
+    """
+    owners = {}
+    for source, target, label, _ in edges:
+        priority = OWNER_LABELS.get(label)
+        if priority is not None and (target not in owners or priority < owners[target][0]):
+            owners[target] = (priority, source)
+    owners = {content: owner for content, (_, owner) in owners.items()}
+
+    for source, target, label, weight in edges:
+        source = owners.get(source, source)
+        target = owners.get(target, target)
+        if source != target:
+            yield source, target, label, weight
+
+
+def make_user_property_loader(driver):
+    """返回按用户ID批量读取用户名的函数，供 SparseInteractionGraph 按需加载节点属性"""
+    def load(ids):
+        with driver.session() as session:
+            records = session.run(
+                "MATCH (u:User) WHERE u.id IN $ids RETURN u.id AS id, u.screen_name AS screen_name",
+                ids=list(ids),
+            )
+            return {record["id"]: {"screen_name": record["screen_name"]} for record in records}
+    return load
+
+
+def load_sparse_ego_graph(driver, target_id, hops=3, limits=None):
+    """
+    读取目标用户的自我中心网络并直接构建 SparseInteractionGraph
+
+    查询只返回节点ID和关系类型，不传输也不保存节点属性，用户名在绘图时按需加载。
+    扩展时不区分方向，相邻两跳之间的关系会从两端各返回一次，按关系的 elementId 去重。
+    """
+    edges = []
+    seen = set()
+
+    def on_record(record):
+        if record["rid"] in seen:
+            return
+        seen.add(record["rid"])
+        edges.append((record["s_id"], record["e_id"], record["type"], RELATION_WEIGHTS.get(record["type"], 0)))
+
+    from sparse_graph import SparseInteractionGraph
+
+    walk_ego_network(driver, target_id, on_record, hops, limits, returns=EGO_RETURN_IDS)
+    graph = SparseInteractionGraph.from_edges(project_edges(edges), make_user_property_loader(driver))
+    print(f"已读取用户 {target_id} 的{hops}跳自我中心网络：{len(graph)} 个用户，{len(edges)} 条关系")
+    return graph
+
 def calculate_association_degree(G, target_node):
+    """
+    计算目标节点与其他节点的关联度（双向边权重之和）
+
+    只有目标节点的直接邻居才可能有非零关联度，因此只遍历目标节点的入边和出边，
+    耗时与目标节点的度数成正比，与整个图的大小无关。
+    G 可以是 MultiDiGraph，也可以是 project_user_graph(compact=True) 返回的 DiGraph。
+    """
     if target_node not in G:
         raise ValueError(f"目标节点 {target_node} 不在图中")
 
     association_degrees = {}
-    for node in G.nodes():
-        if node != target_node:
-            # 计算从其他节点指向目标节点的边的权重总和
-            incoming_edges = G.get_edge_data(node, target_node, default={})
-            incoming_weight = sum(edge_data['weight'] for edge_data in incoming_edges.values())
+    # 从其他节点指向目标节点的边，以及从目标节点指向其他节点的边
+    for neighbors in (G.pred[target_node], G.succ[target_node]):
+        for node, edges in neighbors.items():
+            if node == target_node:
+                continue
+            if G.is_multigraph():
+                weight = sum(edge_data.get('weight', 0) for edge_data in edges.values())
+            else:
+                weight = edges.get('weight', 0)
+            association_degrees[node] = association_degrees.get(node, 0) + weight
 
-            # 计算从目标节点指向其他节点的边的权重总和
-            outgoing_edges = G.get_edge_data(target_node, node, default={})
-            outgoing_weight = sum(edge_data['weight'] for edge_data in outgoing_edges.values())
+    return association_degrees
 
-            # 总关联度为双向权重之和
-            total_weight = incoming_weight + outgoing_weight
-            association_degrees[node] = total_weight
 
-    return association_degrees
+def rank_association_degree(association_degrees, k=None):
+    """
+    按关联度从高到低排序
+
+    :param k: 只返回前k个，为 None 时返回全部
+    :return: [(节点, 关联度), ...]
+    """
+    if k is None:
+        return sorted(association_degrees.items(), key=lambda item: item[1], reverse=True)
+    return heapq.nlargest(k, association_degrees.items(), key=lambda item: item[1])
+
+
+LAYOUT_WARM_RATIO = 0.5  # 已缓存坐标的节点占比不低于该值时热启动
+
+_layout_cache = OrderedDict()  # 目标用户 -> {节点: 坐标}
+_layout_lock = threading.Lock()
+
+
+def clear_layout_cache():
+    """清空布局缓存"""
+    with _layout_lock:
+        _layout_cache.clear()
+
+
+def _initial_positions(subgraph, previous, seed):
+    """
+    用上一次的坐标作为初始位置，新节点放在已知邻居的重心附近，没有已知邻居时放在原点附近
+    """
+    import networkx as nx
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    pos = {node: np.asarray(previous[node], dtype=float) for node in subgraph if node in previous}
+    for node in subgraph:
+        if node in pos:
+            continue
+        neighbors = [pos[n] for n in nx.all_neighbors(subgraph, node) if n in pos]
+        center = np.mean(neighbors, axis=0) if neighbors else np.zeros(2)
+        pos[node] = center + rng.normal(scale=0.05, size=2)
+    return pos
+
+
+def compute_layout(subgraph, target_node, method="auto", iterations=20, seed=0, use_cache=True):
+    """
+    计算子图的节点坐标，按目标用户缓存，下次绘制同一用户时从缓存的坐标热启动
+
+    :param method: "spring" 为力导向布局；"spectral" 先用谱布局（大图时使用 SciPy 稀疏特征值求解）
+        得到初始坐标，再做少量力导向迭代；"auto" 按 LAYOUT_LARGE_GRAPH 选择
+    :param iterations: 从头布局时的力导向迭代次数，热启动时减为四分之一
+    :return: {节点: 坐标}
+    """
+    import networkx as nx
+
+    if method == "auto":
+        method = "spectral" if len(subgraph) > get_setting("LAYOUT_LARGE_GRAPH") else "spring"
+    if method not in ("spring", "spectral"):
+        raise ValueError(f"未知的布局方式：{method}")
+    if len(subgraph) == 0:
+        return {}
+
+    with _layout_lock:
+        previous = _layout_cache.get(target_node) if use_cache else None
+
+    known = sum(1 for node in subgraph if node in previous) if previous else 0
+    if known and known >= LAYOUT_WARM_RATIO * len(subgraph):
+        # 邻域变化不大，从上次的坐标出发只做少量迭代，图不会整体跳动
+        initial = _initial_positions(subgraph, previous, seed)
+        iterations = max(1, iterations // 4)
+    elif method == "spectral" and len(subgraph) > 2:
+        initial = nx.spectral_layout(subgraph, weight='weight')
+        iterations = max(1, iterations // 4)
+    else:
+        initial = None
+
+    pos = nx.spring_layout(subgraph, pos=initial, weight='weight', k=1, iterations=iterations, seed=seed)
+
+    if use_cache:
+        with _layout_lock:
+            cached = dict(previous or {})
+            cached.update(pos)
+            _layout_cache[target_node] = cached
+            _layout_cache.move_to_end(target_node)
+            cache_size = get_setting("LAYOUT_CACHE_SIZE")
+            while len(_layout_cache) > cache_size:
+                _layout_cache.popitem(last=False)
+    return pos
+
+
+def draw_tight_graph(G, target_node, association_degrees, threshold=5, max_labels=None, layout="auto"):
+    """
+    绘制与目标节点关联度不低于 threshold 的节点构成的子图
 
+    :param max_labels: 只为权重最大的前 max_labels 对节点标注关系标签，为 None 时全部标注
+    :param layout: 布局方式，见 compute_layout
+    :return: Figure 对象
+    """
+    import networkx as nx
+    import numpy as np
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
 
-def draw_tight_graph(G, target_node, association_degrees):
     # 筛选出与目标节点关联度大的节点
-    threshold = 5  # 根据需要调整这个阈值
     relevant_nodes = [node for node, degree in association_degrees.items() if degree >= threshold]
     relevant_nodes.append(target_node)  # 确保目标节点也在子图中
 
@@ -445,11 +1406,12 @@ def draw_tight_graph(G, target_node, association_degrees):
     # 获取子图中的边
     subgraph_edges = list(subgraph.edges(keys=True, data=True))
 
-    # 创建一个 Figure 对象
-    fig, ax = plt.subplots(figsize=(6, 6))
+    # 创建一个 Figure 对象，不经过 pyplot，避免每次调用都在全局状态中留下一个 Figure
+    fig = Figure(figsize=(6, 6))
+    ax = fig.add_subplot()
 
     # 绘制子图
-    pos = nx.spring_layout(subgraph, weight='weight', k=1, iterations=20)
+    pos = compute_layout(subgraph, target_node, method=layout)
     node_labels = {node: data.get('properties', {}).get('screen_name', node) for node, data in subgraph.nodes(data=True)}
 
     # 绘制节点
@@ -472,29 +1434,27 @@ def draw_tight_graph(G, target_node, association_degrees):
             edge_weights[edge_key] += weight  # 累加权重
             edge_labels[edge_key] += f" + {label}"  # 将标签相连接
 
-    # 绘制边
-    for (u, v), weight in edge_weights.items():
-        edge_color = 'black'  # 默认边的颜色
-        alpha = 0.5  # 边的透明度
-
-        # 绘制边，使用不同的颜色或透明度来区分多重边
-        nx.draw_networkx_edges(subgraph, pos, edgelist=[(u, v)], arrows=True, edge_color=edge_color, alpha=alpha, ax=ax)
-
-        # 获取边的方向向量
-        source = pos[u]
-        target = pos[v]
-        edge_vector = np.array(target) - np.array(source)
-        edge_length = np.linalg.norm(edge_vector)
-        edge_direction = edge_vector / edge_length
-
-        # 计算标签的位置
-        label_position = source + edge_direction * edge_length * 0.5  # 标签放在边的中间位置
-        label_offset = edge_direction * 0.05  # 标签的偏移量，可以根据需要调整
-
-        # 沿着边的方向显示标签
-        label = edge_labels[(u, v)]
-        ax.annotate(label, xy=label_position, xytext=label_offset, textcoords='offset points',
-                     fontsize=5, color='red', ha='center', va='center', rotation=np.degrees(np.arctan2(edge_direction[1], edge_direction[0])))
+    # 所有边放入一个 LineCollection 一次绘制
+    pairs = list(edge_weights)
+    if pairs:
+        sources = np.array([pos[u] for u, _ in pairs], dtype=float)
+        targets = np.array([pos[v] for _, v in pairs], dtype=float)
+        ax.add_collection(LineCollection(np.stack([sources, targets], axis=1), colors='black', alpha=0.5, zorder=1))
+        ax.autoscale_view()
+
+        # 标签放在边的中间位置，沿着边的方向旋转
+        vectors = targets - sources
+        midpoints = sources + vectors * 0.5
+        rotations = np.degrees(np.arctan2(vectors[:, 1], vectors[:, 0]))
+
+        # 只标注权重最大的前 max_labels 对节点
+        weights = np.array([edge_weights[pair] for pair in pairs], dtype=float)
+        order = np.argsort(-weights, kind='stable')
+        if max_labels is not None:
+            order = order[:max_labels]
+        for i in order:
+            ax.text(midpoints[i, 0], midpoints[i, 1], edge_labels[pairs[i]], fontsize=5, color='red',
+                    ha='center', va='center', rotation=rotations[i], rotation_mode='anchor')
 
     # 标注目标节点
     nx.draw_networkx_nodes(subgraph, pos, nodelist=[target_node], node_color='red', node_size=500, ax=ax)
@@ -502,31 +1462,80 @@ def draw_tight_graph(G, target_node, association_degrees):
     ax.axis('off')  # 关闭坐标轴
     return fig  # 返回 Figure 对象
 
-def get_social_network(target_node):
+# 读取目标用户的 INTERACTS 邻域，以及邻居之间的 INTERACTS 关系
+INTERACTS_NEIGHBORHOOD_QUERY = """
+MATCH (t:User {id: $id})
+OPTIONAL MATCH (t)-[:INTERACTS]-(u:User)
+WITH t, collect(DISTINCT u) AS neighbors
+WITH neighbors + t AS nodes
+UNWIND nodes AS a
+MATCH (a)-[i:INTERACTS]->(b:User)
+WHERE b IN nodes
+RETURN a.id AS s_id, b.id AS e_id, i.liked AS liked, i.commented AS commented, i.reposted AS reposted
+"""
+
+# INTERACTS 上的计数字段对应的原始关系类型
+INTERACTS_LABELS = {"liked": "LIKED", "commented": "COMMENTS", "reposted": "REPOST_OF"}
+
+
+def load_interaction_graph(driver, target_id):
+    """
+    从 INTERACTS 聚合关系读取目标用户的社交圈，一次邻域查询即可，无需展开原始的点赞、评论、转发路径
+
+    :return: SparseInteractionGraph，边按原始关系类型拆分，权重为计数乘以 RELATION_WEIGHTS
+    """
+    from sparse_graph import SparseInteractionGraph
+
+    def to_edges(records):
+        for record in records:
+            for field, label in INTERACTS_LABELS.items():
+                count = record[field] or 0
+                if count:
+                    yield record["s_id"], record["e_id"], label, count * RELATION_WEIGHTS[label]
+
+    with driver.session() as session:
+        records = session.run(INTERACTS_NEIGHBORHOOD_QUERY, id=target_id)
+        graph = SparseInteractionGraph.from_edges(to_edges(records), make_user_property_loader(driver))
+    print(f"已读取用户 {target_id} 的互动邻域：{len(graph)} 个用户")
+    return graph
+
+
+def get_social_network(target_node, backend="networkx"):
+    """
+    绘制目标用户的社交圈
+
+    :param backend: "networkx" 在 NetworkX 图上计算；"sparse" 使用 SparseInteractionGraph，
+                    不在内存中保存节点属性，适合大规模的社交圈；"interacts" 直接读取入库时
+                    维护的 INTERACTS 聚合关系
+    """
+    import matplotlib
+    import networkx as nx
+    from neo4j import GraphDatabase
+
     # 设置matplotlib支持中文
     matplotlib.rcParams['font.sans-serif'] = ['SimHei']  # 使用黑体
     matplotlib.rcParams['font.family'] = 'sans-serif'
     matplotlib.rcParams['axes.unicode_minus'] = False  # 正确显示负号
 
     # 配置Neo4j连接
-    load_dotenv()
-    NEO4J_URI = getenv("NEO4J_URI")
-    NEO4J_USER = getenv("NEO4J_USER")
-    NEO4J_PASSWORD = getenv("NEO4J_PASSWORD")
-
+    NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD = get_neo4j_config()
     driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
 
+    if backend in ("sparse", "interacts"):
+        loader = load_sparse_ego_graph if backend == "sparse" else load_interaction_graph
+        try:
+            return get_social_network_sparse(driver, target_node, get_cookie_pool(), loader)
+        finally:
+            driver.close()
+
     # 创建NetworkX多重有向图
     G = nx.MultiDiGraph()
 
-    convert_to_nx_graph(driver,G)
+    convert_ego_to_nx_graph(driver, G, target_node)
     driver.close()
     G = merge_user_and_post(G)
 
-    with open("cookies.json", "r") as f:
-        cookies = json.load(f)
-
-    follow_relations, user_info = follow_network(target_node, cookies)
+    follow_relations, user_info = follow_network(target_node, get_cookie_pool())
 
     # 将用户节点添加到图中
     for user_id, user_data in user_info.items():
@@ -547,9 +1556,52 @@ def get_social_network(target_node):
     association_degrees = calculate_association_degree(G, target_node)
 
     # 输出关联度
-    for node, degree in association_degrees.items():
+    for node, degree in rank_association_degree(association_degrees):
         print(f"节点 {node} 与节点 {target_node} 的关联度为: {degree}")
 
 
     TG=draw_tight_graph(G, target_node, association_degrees)
     return TG
+
+
+def get_social_network_sparse(driver, target_node, cookies, loader=load_sparse_ego_graph):
+    """
+    get_social_network 的稀疏矩阵版本，只为最终绘制的节点加载用户名
+
+    :param loader: 读取 SparseInteractionGraph 的函数，load_sparse_ego_graph 或 load_interaction_graph
+    """
+    graph = loader(driver, target_node)
+
+    follow_relations, user_info = follow_network(target_node, cookies)
+    graph.add_edges((int(user_id), int(follow_id), "FOLLOWS", 5) for user_id, follow_id in follow_relations)
+    graph.set_properties({int(user_id): user_data for user_id, user_data in user_info.items()})
+    graph.add_node(target_node)
+
+    # 计算与目标节点的关联度
+    association_degrees = graph.association_degree(target_node)
+
+    # 输出关联度
+    for node, degree in rank_association_degree(association_degrees):
+        print(f"节点 {node} 与节点 {target_node} 的关联度为: {degree}")
+
+    # 只把需要绘制的节点导出为 NetworkX 子图
+    threshold = 5
+    relevant_nodes = [node for node, degree in association_degrees.items() if degree >= threshold]
+    relevant_nodes.append(target_node)
+    subgraph = graph.to_networkx(relevant_nodes)
+    return draw_tight_graph(subgraph, target_node, association_degrees)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="爬取微博用户的互动关系并写入Neo4j")
+    parser.add_argument("user_id", nargs="?", type=int, help="目标用户ID")
+    parser.add_argument("--rebuild-interactions", action="store_true", help="根据已有数据重新计算 INTERACTS 关系")
+    parser.add_argument("--resume", action="store_true", help="从上次中断的位置继续爬取")
+    args = parser.parse_args()
+
+    configure()
+    with Runner() as runner:
+        if args.rebuild_interactions:
+            runner.run(rebuild_interactions())
+        if args.user_id is not None:
+            print(runner.run(process_user(args.user_id, resume=args.resume)))
@@ -0,0 +1,205 @@
+"""
+爬虫请求限速
+
+RateLimiter 是线程安全的令牌桶：每秒补充 rate 个令牌，最多积攒 burst 个，
+每次请求前调用 acquire()（协程中用 acquire_async()）取一个令牌，令牌不足时等待。
+多个线程或协程共用一个 RateLimiter 时，总请求速率不会超过 rate。
+
+AdaptiveRateLimiter 在此基础上按服务器的响应调整速率（AIMD）：请求成功且延迟正常时
+速率加 increase，遇到 418/429、空数据等被限流的迹象时速率乘以 decrease，并暂停一段
+随连续限流次数指数增长的时间。get_limiter(endpoint) 为每个接口维护一个共用的实例。
+限速参数在创建限速器时才读取（rate_setting），.env 中的设置同样生效。
+"""
+import asyncio
+import threading
+import time
+
+from settings import get_setting
+
+# 可在 .env 中设置的限速参数：名称 -> (默认值, 类型转换)
+RATE_SETTINGS = {
+    "RATE_INITIAL": ("1", float),  # 每个接口的初始速率（请求/秒）
+    "RATE_MIN": ("0.1", float),  # 速率下限
+    "RATE_MAX": ("5", float),  # 速率上限
+    "RATE_INCREASE": ("0.1", float),  # 每次成功后增加的速率
+    "RATE_DECREASE": ("0.5", float),  # 每次被限流后速率乘以该系数
+    "RATE_COOLDOWN": ("5", float),  # 被限流后的暂停时间（秒），连续限流时翻倍
+    "RATE_MAX_COOLDOWN": ("120", float),  # 暂停时间上限（秒）
+    "RATE_LATENCY_TARGET": ("3", float),  # 延迟超过该值（秒）时不再提速
+    "RATE_MAX_RETRIES": ("3", int),  # 被限流或网络错误时的重试次数
+}
+
+THROTTLE_STATUS = {418, 429}  # 微博限流时返回的状态码
+RETRY_STATUS = THROTTLE_STATUS | {500, 502, 503, 504}  # 需要重试的状态码
+
+
+def rate_setting(name):
+    """RATE_SETTINGS 中参数的当前值"""
+    return get_setting(name, *RATE_SETTINGS[name])
+
+
+class RateLimiter:
+    def __init__(self, rate, burst=1):
+        """
+        :param rate: 每秒允许的请求数，小于等于0表示不限速
+        :param burst: 空闲后允许连续发出的最大请求数
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self):
+        """取一个令牌，返回需要等待的秒数"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """阻塞直到可以发出下一个请求"""
+        if self.rate <= 0:
+            return
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """acquire 的协程版本，等待时不阻塞事件循环"""
+        if self.rate <= 0:
+            return
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    def __init__(self, rate=None, burst=1, min_rate=None, max_rate=None, increase=None, decrease=None,
+                 cooldown=None, max_cooldown=None, latency_target=None):
+        """
+        未指定的参数使用 RATE_SETTINGS 中对应的值
+
+        :param rate: 初始速率（请求/秒）
+        :param min_rate: 速率下限，必须大于0
+        :param max_rate: 速率上限
+        :param increase: 每次成功后增加的速率
+        :param decrease: 每次被限流后速率乘以该系数
+        :param cooldown: 被限流后的暂停时间（秒），连续限流时翻倍，最多 max_cooldown
+        :param latency_target: 响应延迟（指数移动平均）超过该值时不再提速
+        """
+        def setting(value, name):
+            return rate_setting(name) if value is None else value
+
+        rate = setting(rate, "RATE_INITIAL")
+        min_rate = setting(min_rate, "RATE_MIN")
+        max_rate = setting(max_rate, "RATE_MAX")
+        increase = setting(increase, "RATE_INCREASE")
+        decrease = setting(decrease, "RATE_DECREASE")
+        cooldown = setting(cooldown, "RATE_COOLDOWN")
+        max_cooldown = setting(max_cooldown, "RATE_MAX_COOLDOWN")
+        latency_target = setting(latency_target, "RATE_LATENCY_TARGET")
+        super().__init__(min(max(rate, min_rate), max_rate), burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.latency_target = latency_target
+        self.latency = None  # 响应延迟的指数移动平均
+        self.blocked_until = 0.0
+        self.consecutive_throttles = 0
+        self.requests = 0
+        self.throttled = 0
+
+    def _reserve(self):
+        delay = super()._reserve()
+        with self.lock:
+            return max(delay, self.blocked_until - time.monotonic())
+
+    def record(self, throttled=False, latency=None):
+        """
+        记录一次请求的结果并调整速率
+
+        :param throttled: 是否被限流（418/429、空数据、网络错误等）
+        :param latency: 请求耗时（秒）
+        """
+        with self.lock:
+            self.requests += 1
+            if throttled:
+                self.throttled += 1
+                self.consecutive_throttles += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                pause = min(self.max_cooldown, self.cooldown * 2 ** (self.consecutive_throttles - 1))
+                self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+                self.tokens = min(self.tokens, 0.0)
+                return
+            self.consecutive_throttles = 0
+            if latency is not None:
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            if self.latency is None or self.latency <= self.latency_target:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def stats(self):
+        """当前速率和请求计数"""
+        with self.lock:
+            return {
+                "rate": self.rate,
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "latency": self.latency,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(endpoint):
+    """获取接口对应的 AdaptiveRateLimiter，同一进程中同一接口共用一个实例"""
+    with _limiters_lock:
+        if endpoint not in _limiters:
+            _limiters[endpoint] = AdaptiveRateLimiter()
+        return _limiters[endpoint]
+
+
+def limiter_stats():
+    """所有接口的当前速率和请求计数，{接口: stats}"""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {endpoint: limiter.stats() for endpoint, limiter in limiters.items()}
+
+
+def request(session, limiter, url, max_retries=None, **kwargs):
+    """
+    通过限速器发出GET请求，遇到 RETRY_STATUS 或网络错误时降速并重试
+
+    :param session: requests.Session 或 requests 模块
+    :param limiter: AdaptiveRateLimiter
+    :param max_retries: 重试次数，默认为 RATE_MAX_RETRIES
+    :return: requests.Response，重试次数用完后抛出 requests.RequestException
+    """
+    import requests
+
+    if max_retries is None:
+        max_retries = rate_setting("RATE_MAX_RETRIES")
+
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        start = time.monotonic()
+        try:
+            response = session.get(url, **kwargs)
+            if response.status_code in RETRY_STATUS:
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+        except requests.RequestException:
+            limiter.record(throttled=True)
+            if attempt == max_retries:
+                raise
+            continue
+        limiter.record(latency=time.monotonic() - start)
+        return response
@@ -0,0 +1,34 @@
+"""
+读取 .env 中的参数
+
+各模块不在导入时读取环境变量，而是在创建限速器、cookie池、断点等对象时调用 get_setting，
+此时 .env 已经加载，其中的参数才会生效。已经存在的环境变量优先于 .env。
+"""
+import os
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env():
+    """读取 .env，只在第一次调用时执行"""
+    global _loaded
+    with _lock:
+        if _loaded:
+            return
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _loaded = True
+
+
+def get_setting(name, default, convert=str):
+    """
+    读取 .env 后返回参数的值
+
+    :param default: 未设置时的默认值（字符串）
+    :param convert: 类型转换函数，如 int、float
+    """
+    load_env()
+    return convert(os.getenv(name, default))
@@ -0,0 +1,205 @@
+from collections import defaultdict
+
+import networkx as nx
+import numpy as np
+from scipy import sparse
+
+
+class SparseInteractionGraph:
+    """
+    用户互动图的紧凑表示
+
+    节点用连续的整数下标表示，ids/index 维护用户ID与下标的双向映射；每种关系类型的边权重
+    保存为一个 CSR 稀疏矩阵（行为起点，列为终点，重复的边权重累加）。节点属性不随图保存，
+    需要时通过 property_loader 按批次加载并缓存，内存占用只与边数成正比。
+    """
+
+    def __init__(self, ids, matrices, property_loader=None, properties=None):
+        """
+        :param ids: 下标到用户ID的列表
+        :param matrices: 关系类型到 n×n CSR 权重矩阵的映射
+        :param property_loader: 可选，传入用户ID列表、返回 {用户ID: 属性字典} 的函数
+        :param properties: 可选，已知的节点属性
+        """
+        self.ids = list(ids)
+        self.index = {node: i for i, node in enumerate(self.ids)}
+        self.matrices = matrices
+        self.property_loader = property_loader
+        self._properties = dict(properties or {})
+        self._weights = None
+        self._weights_csc = None
+
+    @classmethod
+    def from_edges(cls, edges, property_loader=None, properties=None):
+        """
+        由边列表构建
+
+        :param edges: 可迭代的 (起点ID, 终点ID, 关系类型, 权重)，只遍历一次
+        """
+        index = {}
+        ids = []
+        rows = defaultdict(list)
+        cols = defaultdict(list)
+        weights = defaultdict(list)
+        for source, target, label, weight in edges:
+            for node in (source, target):
+                if node not in index:
+                    index[node] = len(ids)
+                    ids.append(node)
+            rows[label].append(index[source])
+            cols[label].append(index[target])
+            weights[label].append(weight)
+
+        n = len(ids)
+        matrices = {}
+        for label in rows:
+            matrices[label] = sparse.csr_matrix(
+                (np.asarray(weights[label], dtype=np.float32),
+                 (np.asarray(rows[label], dtype=np.int32), np.asarray(cols[label], dtype=np.int32))),
+                shape=(n, n),
+            )
+        return cls(ids, matrices, property_loader, properties)
+
+    @classmethod
+    def from_networkx(cls, G, property_loader=None):
+        """由 NetworkX 图构建，节点的 properties 属性作为已知属性保留"""
+        edges = ((u, v, data.get('label'), data.get('weight', 0)) for u, v, data in G.edges(data=True))
+        graph = cls.from_edges(edges, property_loader)
+        for node in G.nodes():
+            graph._register(node)
+        graph._resize()
+        graph.set_properties({
+            node: data['properties'] for node, data in G.nodes(data=True) if data.get('properties') is not None
+        })
+        return graph
+
+    def __contains__(self, node):
+        return node in self.index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _register(self, node):
+        """登记节点并返回其下标，不调整矩阵大小"""
+        if node not in self.index:
+            self.index[node] = len(self.ids)
+            self.ids.append(node)
+        return self.index[node]
+
+    def _resize(self):
+        """把所有矩阵扩展到当前节点数"""
+        n = len(self.ids)
+        for matrix in self.matrices.values():
+            if matrix.shape != (n, n):
+                matrix.resize((n, n))
+        self._weights = self._weights_csc = None
+
+    def add_node(self, node):
+        """添加孤立节点，所有矩阵扩展一行一列"""
+        if node not in self.index:
+            self._register(node)
+            self._resize()
+        return self.index[node]
+
+    def add_edges(self, edges):
+        """
+        追加边，新出现的节点会加入图中
+
+        :param edges: 可迭代的 (起点ID, 终点ID, 关系类型, 权重)
+        """
+        rows = defaultdict(list)
+        cols = defaultdict(list)
+        weights = defaultdict(list)
+        for source, target, label, weight in edges:
+            rows[label].append(self._register(source))
+            cols[label].append(self._register(target))
+            weights[label].append(weight)
+        self._resize()
+
+        n = len(self.ids)
+        for label in rows:
+            matrix = sparse.csr_matrix(
+                (np.asarray(weights[label], dtype=np.float32),
+                 (np.asarray(rows[label], dtype=np.int32), np.asarray(cols[label], dtype=np.int32))),
+                shape=(n, n),
+            )
+            if label in self.matrices:
+                matrix = (self.matrices[label] + matrix).tocsr()
+            self.matrices[label] = matrix
+
+    def set_properties(self, properties):
+        """设置已知的节点属性，{节点ID: 属性字典}"""
+        self._properties.update(properties)
+
+    @property
+    def weights(self):
+        """所有关系类型权重之和的 CSR 矩阵"""
+        if self._weights is None:
+            n = len(self.ids)
+            total = sparse.csr_matrix((n, n), dtype=np.float32)
+            for matrix in self.matrices.values():
+                total = total + matrix
+            self._weights = total.tocsr()
+            self._weights_csc = self._weights.tocsc()
+        return self._weights
+
+    @property
+    def nbytes(self):
+        """稀疏矩阵数组占用的字节数"""
+        total = 0
+        for matrix in self.matrices.values():
+            total += matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        return total
+
+    def association_degree(self, target_node):
+        """
+        计算目标节点与其直接邻居的关联度（双向边权重之和），与 calculate_association_degree 结果一致
+        """
+        if target_node not in self.index:
+            raise ValueError(f"目标节点 {target_node} 不在图中")
+        i = self.index[target_node]
+        weights = self.weights
+
+        # 出边为第i行，入边为第i列
+        out_start, out_end = weights.indptr[i], weights.indptr[i + 1]
+        in_start, in_end = self._weights_csc.indptr[i], self._weights_csc.indptr[i + 1]
+        neighbors = np.concatenate([weights.indices[out_start:out_end], self._weights_csc.indices[in_start:in_end]])
+        values = np.concatenate([weights.data[out_start:out_end], self._weights_csc.data[in_start:in_end]])
+
+        mask = neighbors != i
+        neighbors, values = neighbors[mask], values[mask]
+        unique, inverse = np.unique(neighbors, return_inverse=True)
+        totals = np.bincount(inverse, weights=values, minlength=len(unique))
+        return {self.ids[j]: int(w) if float(w).is_integer() else float(w) for j, w in zip(unique, totals)}
+
+    def get_properties(self, nodes):
+        """
+        获取节点属性，未缓存的节点通过 property_loader 一次性批量加载
+
+        :return: {节点ID: 属性字典}
+        """
+        missing = [node for node in nodes if node not in self._properties]
+        if missing and self.property_loader is not None:
+            loaded = self.property_loader(missing)
+            for node in missing:
+                self._properties[node] = loaded.get(node, {})
+        return {node: self._properties.get(node, {}) for node in nodes}
+
+    def to_networkx(self, nodes):
+        """
+        导出 nodes 之间的子图供绘图使用
+
+        每对节点之间每种关系类型一条边（key 为关系类型），weight 为该类型的权重之和，
+        节点的 properties 属性只为子图中的节点加载。
+        """
+        nodes = [node for node in nodes if node in self.index]
+        idx = np.asarray([self.index[node] for node in nodes], dtype=np.int32)
+        H = nx.MultiDiGraph()
+        for node, properties in self.get_properties(nodes).items():
+            H.add_node(node, properties=properties)
+
+        for label, matrix in self.matrices.items():
+            sub = matrix[idx][:, idx].tocoo()
+            for r, c, w in zip(sub.row, sub.col, sub.data):
+                H.add_edge(nodes[r], nodes[c], key=label, label=label, weight=float(w))
+        return H
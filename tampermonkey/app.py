@@ -1,38 +1,44 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file, abort, url_for, g
 from flask_cors import CORS
 import time
+import logging
+import random
 import csv
-from utils import Weibo, get_str_with_id, generate_topic_pic
+import tempfile
+from utils import Weibo, get_str_with_id, generate_topic_pic, get_latest_weibo_id
 import os
-import openai
-from openai import OpenAI
+from llm_client import stream_chat
+from response_cache import ResponseCache
 app = Flask(__name__)
-import base64
 import json
 # 配置CORS，允许所有来源的请求
 CORS(app, resources={r"/*": {"origins": "*", "methods": ["GET", "POST", "OPTIONS"]}})
 
+PIC_DIR = "./pic"
+PIC_FORMATS = {"png": "image/png", "webp": "image/webp"}
+PIC_FORMAT = os.getenv("PIC_FORMAT", "png")  # 回复中图片链接的默认格式
+PIC_SCALES = (0.25, 0.5, 0.75, 1.0)  # 允许的缩放比例，限制每张图的变体文件数
+PIC_SCALE = float(os.getenv("PIC_SCALE", "1"))  # 回复中图片链接的默认缩放比例，原图为dpi=300
+if PIC_SCALE not in PIC_SCALES:
+    raise ValueError(f"PIC_SCALE 应为 {PIC_SCALES} 之一")
+PIC_MAX_AGE = int(os.getenv("PIC_MAX_AGE", "3600"))  # 浏览器缓存时间（秒）
+CACHE_DIR = os.getenv("CACHE_DIR", "./cache")  # 结果缓存目录
+CACHE_MAX_AGE = int(os.getenv("CACHE_MAX_AGE", "1800"))  # 结果缓存有效期（秒），过期后按最新微博id校验
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))  # 内存中缓存的用户数
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))  # 正常请求日志的采样比例，出错的请求总是记录
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+response_cache = ResponseCache(CACHE_DIR, CACHE_MAX_ENTRIES, CACHE_MAX_AGE)
+
 def generate_model_output(target_str):
-    client = OpenAI(
-        api_key="",
-        base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-    )
-    completion = client.chat.completions.create(
-        model="qwen-long",
-        messages=[
-            {'role': 'system', 'content': 'You are a helpful assistant.'},
-            {'role': 'user', 'content': '这是一个微博账号的主页里提取到的微博内容，请总结这个账号的行为特点，做情感分析，结果用普通文本格式而非markdown格式。' + target_str}
-        ],
-        stream=True,
-        stream_options={"include_usage": True}
-    )
-
-    full_content = ""
-    for chunk in completion:
-        if chunk.choices and chunk.choices[0].delta.content:
-            full_content += chunk.choices[0].delta.content
-    
-    return full_content
+    return stream_chat([
+        {'role': 'system', 'content': 'You are a helpful assistant.'},
+        {'role': 'user', 'content': '这是一个微博账号的主页里提取到的微博内容，请总结这个账号的行为特点，做情感分析，结果用普通文本格式而非markdown格式。' + target_str}
+    ])
 
 def find_specific_csv(target_filename, search_dir="./weibo"):
     """
@@ -78,6 +84,66 @@ def concatenate_text_from_csv(csv_file_path, output_file_path=None):
     
     return result
 
+def get_pic_path(id, fmt="png", scale=1.0):
+    """
+    获取词云图文件路径，原图为 ./pic/{id}.png，其他格式或缩放比例的变体文件名带后缀
+    scale 必须是 PIC_SCALES 中的值，文件名中的百分比与缩放比例一一对应
+    """
+    if fmt == "png" and scale == 1.0:
+        return os.path.join(PIC_DIR, f"{id}.png")
+    return os.path.join(PIC_DIR, f"{id}_{int(scale * 100)}.{fmt}")
+
+
+def ensure_pic_variant(id, fmt="png", scale=1.0):
+    """
+    生成并缓存词云图的格式/缩放变体，原图更新后变体会重新生成
+
+    :return: 变体文件路径，原图不存在时返回 None
+    """
+    source_path = get_pic_path(id)
+    if not os.path.exists(source_path):
+        return None
+    variant_path = get_pic_path(id, fmt, scale)
+    if variant_path == source_path:
+        return source_path
+    if os.path.exists(variant_path) and os.path.getmtime(variant_path) >= os.path.getmtime(source_path):
+        return variant_path
+
+    from PIL import Image
+
+    with Image.open(source_path) as img:
+        if scale != 1.0:
+            size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+            img = img.resize(size, Image.LANCZOS)
+        # 每次写入唯一的临时文件再替换，多个进程/线程同时生成同一变体时互不覆盖
+        fd, tmp_path = tempfile.mkstemp(dir=PIC_DIR, suffix=".tmp")
+        os.close(fd)
+        try:
+            img.save(tmp_path, format=fmt.upper(), optimize=True)
+            os.replace(tmp_path, variant_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    return variant_path
+
+
+def build_pic_url(id, fmt="png", scale=1.0):
+    """构造词云图链接，带上原图修改时间作为版本号，使图片更新后浏览器缓存失效"""
+    version = int(os.path.getmtime(get_pic_path(id)))
+    params = {"v": version}
+    if scale != 1.0:
+        params["scale"] = scale
+    return url_for("get_pic", id=id, fmt=fmt, _external=True, **params)
+
+
+def with_image_url(id, text):
+    """为回复文本附上词云图链接"""
+    image_url = None
+    if os.path.exists(get_pic_path(id)):
+        image_url = build_pic_url(id, PIC_FORMAT, PIC_SCALE)
+    return {"text": text, "image": image_url}
+
+
 def get_response(message):
     try:
         id = int(message)
@@ -85,36 +151,57 @@ def get_response(message):
         return {"text": "无效的微博ID，请输入数字。", "image": None}
     
     try:
-        get_str_with_id(id)
-        csv_file_path = find_specific_csv(f"{id}.csv")
-        if not csv_file_path:
-            return {"text": "未找到相关微博数据，请检查微博ID。", "image": None}
-        
-        string_to_concatenate = concatenate_text_from_csv(csv_file_path[0])
-        if not string_to_concatenate:
-            return {"text": "微博数据为空，请检查微博ID。", "image": None}
-        
-        final_ans = generate_model_output(string_to_concatenate)
-        generate_topic_pic(id)
-        # 检查并读取图片
-        image_path = f"./pic/{id}.png"
-        image_data = None
-        if os.path.exists(image_path):
-            with open(image_path, 'rb') as img_file:
-                image_bytes = img_file.read()
-                image_data = base64.b64encode(image_bytes).decode('utf-8')
-        print({"text": final_ans, "image": image_data})
-        return {"text": final_ans, "image": image_data}
+        # 同一用户同时只有一个请求在爬取和总结，其余请求等待后直接读取缓存
+        with response_cache.lock_for(id):
+            cached = response_cache.get(id)
+            if cached is not None and response_cache.is_fresh(cached):
+                return with_image_url(id, cached["response"])
+
+            # 缓存过期后，最新微博未变化则无需重新计算
+            latest_id = get_latest_weibo_id(id)
+            if cached is not None and response_cache.is_valid(cached, latest_id):
+                response_cache.touch(id)
+                return with_image_url(id, cached["response"])
+
+            get_str_with_id(id)
+            csv_file_path = find_specific_csv(f"{id}.csv")
+            if not csv_file_path:
+                return {"text": "未找到相关微博数据，请检查微博ID。", "image": None}
+            
+            string_to_concatenate = concatenate_text_from_csv(csv_file_path[0])
+            if not string_to_concatenate:
+                return {"text": "微博数据为空，请检查微博ID。", "image": None}
+            
+            final_ans = generate_model_output(string_to_concatenate)
+            generate_topic_pic(id)
+            response_cache.set(id, latest_id, final_ans)
+            return with_image_url(id, final_ans)
         
     except Exception as e:
+        logger.exception("获取微博内容失败: %s", id)
         return {"text": f"获取微博内容失败: {str(e)}", "image": None}
 
 
-# 添加日志记录，帮助调试
+# 按采样比例记录请求日志，每条日志为一行JSON
 @app.before_request
-def log_request_info():
-    print('Headers:', dict(request.headers))
-    print('Body:', request.get_data().decode())
+def start_request_timer():
+    g.start_time = time.perf_counter()
+
+@app.after_request
+def log_request_info(response):
+    if response.status_code < 400 and random.random() >= LOG_SAMPLE_RATE:
+        return response
+    record = {
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "duration_ms": round((time.perf_counter() - g.get("start_time", time.perf_counter())) * 1000, 1),
+        "remote_addr": request.remote_addr,
+        "content_length": response.calculate_content_length(),
+    }
+    level = logging.WARNING if response.status_code >= 400 else logging.INFO
+    logger.log(level, json.dumps(record, ensure_ascii=False))
+    return response
 
 @app.route('/message', methods=['POST', 'OPTIONS'])
 def handle_message():
@@ -125,14 +212,14 @@ def handle_message():
         return response
 
     try:
-        print("收到请求:", request.json)  # 调试日志
         data = request.json
         message = data.get('message', '')
+        logger.debug("收到请求: %s", message)
         
         # 生成回复
         # response = f"服务器收到消息: {message}"
         response = get_response(message)
-        print("发送回复:", response)  # 调试日志
+        logger.debug("发送回复: %s", response["text"][:200])
         
         return jsonify({
             "status": "success",
@@ -141,12 +228,33 @@ def handle_message():
         })
         
     except Exception as e:
-        print("错误:", str(e))  # 调试日志
+        logger.exception("处理请求失败")
         return jsonify({
             "status": "error",
             "message": str(e)
         }), 500
 
+@app.route('/pic/<int:id>.<fmt>', methods=['GET'])
+def get_pic(id, fmt):
+    """
+    返回词云图，支持 ETag/Last-Modified 条件请求
+    可选参数 scale 为缩放比例，取值见 PIC_SCALES，fmt 为 png 或 webp
+    """
+    if fmt not in PIC_FORMATS:
+        abort(404)
+    try:
+        scale = float(request.args.get("scale", 1))
+    except ValueError:
+        abort(400)
+    if scale not in PIC_SCALES:
+        abort(400)
+
+    path = ensure_pic_variant(id, fmt, scale)
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype=PIC_FORMATS[fmt], conditional=True, etag=True, max_age=PIC_MAX_AGE)
+
 if __name__ == '__main__':
+    # 开发模式，生产环境请使用 gunicorn -c gunicorn.conf.py wsgi:app
     # 确保监听所有网络接口
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=os.getenv("FLASK_DEBUG", "1") == "1", host='0.0.0.0', port=5000)
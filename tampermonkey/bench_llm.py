@@ -0,0 +1,68 @@
+"""
+大模型后端延迟与吞吐量测试
+
+配合 mock_llm_server.py 使用，可离线对比共享连接池客户端与每次新建客户端的差异。
+使用示例:
+    python mock_llm_server.py --port 8001 &
+    python bench_llm.py --base-url http://127.0.0.1:8001/v1 --requests 200 --concurrency 8
+    python bench_llm.py --base-url http://127.0.0.1:8001/v1 --fresh-client
+"""
+import statistics
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_client import create_client, stream_chat
+
+MESSAGES = [
+    {'role': 'system', 'content': 'You are a helpful assistant.'},
+    {'role': 'user', 'content': '请总结这个账号的行为特点。'},
+]
+
+
+def run_benchmark(base_url, total, concurrency, fresh_client=False):
+    """
+    并发发送 total 个请求并统计延迟
+
+    :param fresh_client: 为True时每个请求新建客户端，模拟优化前的行为
+    :return: (每个请求的耗时列表, 总耗时)
+    """
+    shared = None if fresh_client else create_client(api_key="mock", base_url=base_url)
+
+    def one_request(_):
+        client = shared or create_client(api_key="mock", base_url=base_url)
+        start = time.perf_counter()
+        stream_chat(MESSAGES, client=client)
+        elapsed = time.perf_counter() - start
+        if fresh_client:
+            client.close()
+        return elapsed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(one_request, range(total)))
+    wall = time.perf_counter() - start
+
+    if shared is not None:
+        shared.close()
+    return latencies, wall
+
+
+def main():
+    parser = ArgumentParser(description="大模型后端延迟与吞吐量测试")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8001/v1")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--fresh-client", action="store_true", help="每个请求新建客户端")
+    args = parser.parse_args()
+
+    latencies, wall = run_benchmark(args.base_url, args.requests, args.concurrency, args.fresh_client)
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"请求数：{len(latencies)}，并发：{args.concurrency}，新建客户端：{args.fresh_client}")
+    print(f"总耗时：{wall:.2f}s，吞吐量：{len(latencies) / wall:.1f} req/s")
+    print(f"延迟 p50：{statistics.median(latencies) * 1000:.1f}ms，p95：{p95 * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+import multiprocessing
+import os
+
+# gunicorn 配置，均可通过环境变量覆盖
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = "gthread"  # 请求大部分时间在等待爬虫和大模型，使用线程worker
+threads = int(os.getenv("WEB_THREADS", "4"))
+timeout = int(os.getenv("WEB_TIMEOUT", "300"))  # 爬取和大模型总结可能耗时较长
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "1000"))  # 定期重启worker，避免内存缓慢增长
+max_requests_jitter = 100
+chdir = os.path.dirname(os.path.abspath(__file__))  # app.py 使用相对路径 ./pic、./weibo
+accesslog = None  # 请求日志由 app.py 按采样比例输出
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
@@ -0,0 +1,87 @@
+"""
+服务端爬虫的请求限速
+
+与项目根目录 rate_limit.py 的 AdaptiveRateLimiter 行为一致的精简版本，服务单独部署时不依赖上级目录：
+线程安全的令牌桶，请求成功时速率加 RATE_INCREASE，遇到 418/429 或网络错误时速率乘以
+RATE_DECREASE 并暂停一段随连续限流次数翻倍的时间。同一进程中同一接口共用一个限速器。
+"""
+import os
+import threading
+import time
+
+import requests
+
+RATE_INITIAL = float(os.getenv("RATE_INITIAL", "1"))  # 每个接口的初始速率（请求/秒）
+RATE_MIN = float(os.getenv("RATE_MIN", "0.1"))  # 速率下限
+RATE_MAX = float(os.getenv("RATE_MAX", "5"))  # 速率上限
+RATE_INCREASE = float(os.getenv("RATE_INCREASE", "0.1"))  # 每次成功后增加的速率
+RATE_DECREASE = float(os.getenv("RATE_DECREASE", "0.5"))  # 每次被限流后速率乘以该系数
+RATE_COOLDOWN = float(os.getenv("RATE_COOLDOWN", "5"))  # 被限流后的暂停时间（秒），连续限流时翻倍
+RATE_MAX_COOLDOWN = float(os.getenv("RATE_MAX_COOLDOWN", "120"))  # 暂停时间上限（秒）
+RATE_MAX_RETRIES = int(os.getenv("RATE_MAX_RETRIES", "3"))  # 被限流或网络错误时的重试次数
+
+RETRY_STATUS = {418, 429, 500, 502, 503, 504}  # 需要降速重试的状态码
+
+
+class Limiter:
+    def __init__(self, rate=RATE_INITIAL, min_rate=RATE_MIN, max_rate=RATE_MAX):
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.next_time = time.monotonic()  # 下一个请求最早的发出时间
+        self.consecutive_throttles = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """阻塞直到可以发出下一个请求"""
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + 1.0 / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+    def record(self, throttled=False):
+        """记录一次请求的结果并调整速率"""
+        with self.lock:
+            if not throttled:
+                self.consecutive_throttles = 0
+                self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+                return
+            self.consecutive_throttles += 1
+            self.rate = max(self.min_rate, self.rate * RATE_DECREASE)
+            pause = min(RATE_MAX_COOLDOWN, RATE_COOLDOWN * 2 ** (self.consecutive_throttles - 1))
+            self.next_time = max(self.next_time, time.monotonic() + pause)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(endpoint):
+    """获取接口对应的限速器，同一进程中同一接口共用一个实例"""
+    with _limiters_lock:
+        if endpoint not in _limiters:
+            _limiters[endpoint] = Limiter()
+        return _limiters[endpoint]
+
+
+def request(session, limiter, url, max_retries=RATE_MAX_RETRIES, **kwargs):
+    """
+    通过限速器发出GET请求，遇到 RETRY_STATUS 或网络错误时降速并重试
+
+    :return: requests.Response，重试次数用完后抛出 requests.RequestException
+    """
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            response = session.get(url, **kwargs)
+            if response.status_code in RETRY_STATUS:
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+        except requests.RequestException:
+            limiter.record(throttled=True)
+            if attempt == max_retries:
+                raise
+            continue
+        limiter.record()
+        return response
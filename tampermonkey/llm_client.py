@@ -0,0 +1,90 @@
+import threading
+from os import getenv
+
+# 大模型服务配置，可通过环境变量覆盖
+LLM_API_KEY = getenv("LLM_API_KEY", "")
+LLM_BASE_URL = getenv("LLM_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
+LLM_MODEL = getenv("LLM_MODEL", "qwen-long")
+LLM_CONNECT_TIMEOUT = float(getenv("LLM_CONNECT_TIMEOUT", "5"))  # 建立连接超时（秒）
+LLM_READ_TIMEOUT = float(getenv("LLM_READ_TIMEOUT", "120"))  # 流式读取超时（秒）
+LLM_MAX_RETRIES = int(getenv("LLM_MAX_RETRIES", "3"))  # 失败重试次数，openai库内部使用指数退避
+LLM_MAX_CONNECTIONS = int(getenv("LLM_MAX_CONNECTIONS", "20"))  # 连接池大小
+LLM_MAX_CONCURRENCY = int(getenv("LLM_MAX_CONCURRENCY", "8"))  # 同时进行的请求上限
+
+_client = None
+_client_lock = threading.Lock()
+_semaphore = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+
+def create_client(api_key=None, base_url=None):
+    """
+    创建带连接池和keep-alive的OpenAI客户端
+
+    :param api_key: API Key，默认读取 LLM_API_KEY
+    :param base_url: 服务地址，默认读取 LLM_BASE_URL
+    :return: OpenAI 客户端
+    """
+    import httpx
+    from openai import OpenAI
+
+    http_client = httpx.Client(
+        timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            keepalive_expiry=60,
+        ),
+    )
+    return OpenAI(
+        api_key=api_key if api_key is not None else LLM_API_KEY,
+        base_url=base_url or LLM_BASE_URL,
+        max_retries=LLM_MAX_RETRIES,
+        http_client=http_client,
+    )
+
+
+def get_client():
+    """获取进程内共享的客户端，首次调用时创建"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_client()
+    return _client
+
+
+def close_client():
+    """关闭共享客户端并释放连接池"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def stream_chat(messages, client=None, model=None):
+    """
+    以流式方式请求对话补全，并拼接为完整文本
+
+    同一进程内的并发请求数受 LLM_MAX_CONCURRENCY 限制，超出的请求会排队等待。
+
+    :param messages: 对话消息列表
+    :param client: 可选，指定客户端，默认使用共享客户端
+    :param model: 可选，模型名称，默认读取 LLM_MODEL
+    :return: 模型输出的完整文本
+    """
+    client = client or get_client()
+    with _semaphore:
+        completion = client.chat.completions.create(
+            model=model or LLM_MODEL,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+        chunks = []
+        for chunk in completion:
+            if chunk.choices and chunk.choices[0].delta.content:
+                chunks.append(chunk.choices[0].delta.content)
+
+    return "".join(chunks)
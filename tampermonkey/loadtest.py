@@ -0,0 +1,128 @@
+"""
+/message 接口压测脚本，爬虫、大模型和词云生成均替换为模拟实现
+
+使用示例:
+    # 在本进程内启动模拟后端并压测
+    python loadtest.py --requests 500 --concurrency 16 --llm-latency 0.5
+    # 压测用 gunicorn 启动的模拟后端
+    gunicorn -c gunicorn.conf.py "loadtest:create_mock_app()"
+    python loadtest.py --url http://127.0.0.1:5000/message --requests 500 --concurrency 16
+"""
+import os
+import statistics
+import threading
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+SAMPLE_USER_ID = 1669879400  # ./weibo 和 ./pic 中自带的示例数据
+
+
+def create_mock_app(llm_latency=None, scrape_latency=None, use_cache=None):
+    """
+    返回替换了爬虫、大模型和词云生成的 app，其余处理流程（CSV读取、拼接、图片链接）保持不变
+    延迟默认读取环境变量 MOCK_LLM_LATENCY、MOCK_SCRAPE_LATENCY（秒）
+    use_cache 为 False 时（默认，环境变量 MOCK_USE_CACHE=1 开启）关闭结果缓存，每个请求都完整计算
+    """
+    import app as app_module
+    from response_cache import ResponseCache
+
+    if llm_latency is None:
+        llm_latency = float(os.getenv("MOCK_LLM_LATENCY", "0.5"))
+    if scrape_latency is None:
+        scrape_latency = float(os.getenv("MOCK_SCRAPE_LATENCY", "0"))
+    if use_cache is None:
+        use_cache = os.getenv("MOCK_USE_CACHE", "0") == "1"
+
+    def mock_get_latest_weibo_id(id):
+        return SAMPLE_USER_ID
+
+    def mock_get_str_with_id(id):
+        time.sleep(scrape_latency)
+
+    def mock_generate_model_output(target_str):
+        time.sleep(llm_latency)
+        return f"模拟总结，输入长度 {len(target_str)}"
+
+    def mock_generate_topic_pic(id):
+        pass
+
+    app_module.get_str_with_id = mock_get_str_with_id
+    app_module.generate_model_output = mock_generate_model_output
+    app_module.generate_topic_pic = mock_generate_topic_pic
+    app_module.get_latest_weibo_id = mock_get_latest_weibo_id
+    if not use_cache:
+        app_module.response_cache = ResponseCache(None, max_age=0)
+    return app_module.app
+
+
+def start_local_server(app, port):
+    """在后台线程中启动多线程的werkzeug服务"""
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def run_load(url, total, concurrency, user_id):
+    """并发发送 total 个请求，返回 (延迟列表, 失败数, 总耗时)"""
+    local = threading.local()
+
+    def one_request(_):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            resp = local.session.post(url, json={"message": str(user_id)}, timeout=60)
+            ok = resp.status_code == 200 and resp.json().get("status") == "success"
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one_request, range(total)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    failures = sum(1 for _, ok in results if not ok)
+    return latencies, failures, wall
+
+
+def main():
+    parser = ArgumentParser(description="/message 接口压测")
+    parser.add_argument("--url", help="压测已启动的服务，不指定时在本进程内启动模拟后端")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--user-id", type=int, default=SAMPLE_USER_ID)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--scrape-latency", type=float, default=0.0)
+    parser.add_argument("--use-cache", action="store_true", help="开启结果缓存")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        app = create_mock_app(args.llm_latency, args.scrape_latency, args.use_cache)
+        server = start_local_server(app, args.port)
+        url = f"http://127.0.0.1:{args.port}/message"
+
+    try:
+        latencies, failures, wall = run_load(url, args.requests, args.concurrency, args.user_id)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"请求数：{len(latencies)}，并发：{args.concurrency}，失败：{failures}")
+    print(f"总耗时：{wall:.2f}s，吞吐量：{len(latencies) / wall:.1f} req/s")
+    print(f"延迟 p50：{statistics.median(latencies) * 1000:.1f}ms，p95：{p95 * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+本地大模型替身服务，兼容 OpenAI 的 /v1/chat/completions 流式接口
+
+按预设文本回放流式补全，用于在离线环境下测试 generate_model_output 的延迟和吞吐量。
+使用示例:
+    python mock_llm_server.py --port 8001 --first-token-delay 0.3 --chunk-delay 0.02
+    LLM_BASE_URL=http://127.0.0.1:8001/v1 python app.py
+"""
+import json
+import time
+import uuid
+from argparse import ArgumentParser
+from itertools import cycle
+
+from flask import Flask, Response, jsonify, request
+
+DEFAULT_RESPONSES = [
+    "该账号以分享日常生活和工作动态为主，发布频率稳定，语气积极友好。"
+    "整体情感倾向偏正面，偶有对社会热点的评论，态度较为理性。",
+    "该账号主要转发和评论娱乐资讯，互动较多，表达直接。"
+    "情感分析显示正面与中性内容占多数，负面情绪较少。",
+]
+
+app = Flask(__name__)
+app.config["FIRST_TOKEN_DELAY"] = 0.0  # 首个分片前的等待时间（秒）
+app.config["CHUNK_DELAY"] = 0.0  # 相邻分片之间的等待时间（秒）
+app.config["CHUNK_SIZE"] = 8  # 每个分片包含的字符数
+app.config["RESPONSES"] = cycle(DEFAULT_RESPONSES)
+
+
+def build_chunk(completion_id, model, content=None, finish_reason=None, usage=None):
+    """构造一个 chat.completion.chunk 对象"""
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [],
+    }
+    if usage is not None:
+        chunk["usage"] = usage
+    else:
+        delta = {"content": content} if content is not None else {}
+        chunk["choices"].append({"index": 0, "delta": delta, "finish_reason": finish_reason})
+    return chunk
+
+
+def replay_stream(text, model, include_usage):
+    """把预设文本按分片回放为SSE事件流"""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    chunk_size = app.config["CHUNK_SIZE"]
+    chunk_delay = app.config["CHUNK_DELAY"]
+
+    time.sleep(app.config["FIRST_TOKEN_DELAY"])
+    yield f"data: {json.dumps(build_chunk(completion_id, model, content=''), ensure_ascii=False)}\n\n"
+    for start in range(0, len(text), chunk_size):
+        piece = text[start:start + chunk_size]
+        yield f"data: {json.dumps(build_chunk(completion_id, model, content=piece), ensure_ascii=False)}\n\n"
+        if chunk_delay:
+            time.sleep(chunk_delay)
+    yield f"data: {json.dumps(build_chunk(completion_id, model, finish_reason='stop'))}\n\n"
+    if include_usage:
+        usage = {"prompt_tokens": 0, "completion_tokens": len(text), "total_tokens": len(text)}
+        yield f"data: {json.dumps(build_chunk(completion_id, model, usage=usage))}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    data = request.get_json(force=True)
+    model = data.get("model", "mock")
+    text = next(app.config["RESPONSES"])
+
+    if not data.get("stream"):
+        time.sleep(app.config["FIRST_TOKEN_DELAY"])
+        return jsonify({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        })
+
+    include_usage = bool((data.get("stream_options") or {}).get("include_usage"))
+    return Response(replay_stream(text, model, include_usage), mimetype="text/event-stream")
+
+
+def load_responses(file_path):
+    """从JSON文件加载预设回复，文件内容为字符串列表"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        responses = json.load(f)
+    if not responses:
+        raise ValueError("预设回复列表不能为空")
+    return responses
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="本地大模型替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--first-token-delay", type=float, default=0.0)
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--chunk-size", type=int, default=8)
+    parser.add_argument("--responses", help="预设回复JSON文件路径")
+    args = parser.parse_args()
+
+    app.config["FIRST_TOKEN_DELAY"] = args.first_token_delay
+    app.config["CHUNK_DELAY"] = args.chunk_delay
+    app.config["CHUNK_SIZE"] = args.chunk_size
+    if args.responses:
+        app.config["RESPONSES"] = cycle(load_responses(args.responses))
+
+    app.run(host=args.host, port=args.port, threaded=True)
@@ -227,9 +227,9 @@
     }
 
     // 添加图片消息到聊天框
-    function addImage(imageBase64, type) {
+    function addImage(imageUrl, type) {
         const img = document.createElement('img');
-        img.src = 'data:image/png;base64,' + imageBase64;
+        img.src = imageUrl;
         img.classList.add('message', type);
         messagesContainer.appendChild(img);
         messagesContainer.scrollTop = messagesContainer.scrollHeight;
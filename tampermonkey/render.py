@@ -0,0 +1,136 @@
+"""
+词云图渲染服务
+
+使用 Agg 后端和显式创建的 Figure 对象渲染，不经过 pyplot 的全局状态，渲染完成后立即释放，
+长时间运行的服务不会累积 Figure，也可以安全地在多线程或进程池中并发渲染。
+使用示例:
+    python render.py --renders 1000  # 连续渲染1000次并输出内存占用变化
+"""
+import os
+import sys
+import tempfile
+import tracemalloc
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from wordcloud import WordCloud
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0"))  # 渲染进程数，0表示在当前线程渲染
+FONT_PATH = "simhei.ttf"  # 支持中文的字体路径
+
+_pool = None
+
+
+def render_wordcloud(text, title, output_path, dpi=300):
+    """
+    生成词云图并保存为图片
+
+    :param text: 以空格分隔的词语
+    :param title: 图片标题
+    :param output_path: 输出文件路径
+    :param dpi: 输出分辨率
+    :return: 输出文件路径
+    """
+    wordcloud = WordCloud(font_path=FONT_PATH,  # 设置字体路径，支持中文
+                          width=800, height=400,  # 设置图片大小
+                          background_color='white',  # 背景颜色
+                          max_words=100,  # 显示的最大单词数量
+                          contour_width=3, contour_color='steelblue').generate(text)
+
+    fig = Figure(figsize=(10, 5))
+    FigureCanvasAgg(fig)
+    try:
+        ax = fig.add_subplot()
+        ax.imshow(wordcloud.to_array(), interpolation='bilinear')
+        ax.axis('off')  # 不显示坐标轴
+        ax.set_title(f"{title}")
+        # 先写入唯一的临时文件再替换，避免并发请求读取到写了一半的图片，
+        # 同一进程的多个线程同时渲染同一张图时也不会互相覆盖
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(output_path) or ".", suffix=".tmp")
+        os.close(fd)
+        try:
+            fig.savefig(tmp_path, dpi=dpi, bbox_inches='tight',
+                        format=os.path.splitext(output_path)[1][1:] or 'png')
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    finally:
+        fig.clear()
+    return output_path
+
+
+def get_render_pool():
+    """获取渲染进程池，首次调用时创建"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+    return _pool
+
+
+def submit_wordcloud(text, title, output_path, dpi=300):
+    """在进程池中渲染词云图，返回 Future"""
+    return get_render_pool().submit(render_wordcloud, text, title, output_path, dpi)
+
+
+def render_wordcloud_pooled(text, title, output_path, dpi=300):
+    """按 RENDER_WORKERS 配置选择在进程池或当前线程中渲染，并等待渲染完成"""
+    if RENDER_WORKERS > 0:
+        return submit_wordcloud(text, title, output_path, dpi).result()
+    return render_wordcloud(text, title, output_path, dpi)
+
+
+def get_rss():
+    """
+    当前进程的常驻内存（字节），包括 Agg、numpy 等 C 扩展的分配
+
+    安装了 psutil 时返回当前RSS，否则返回 resource 记录的峰值RSS（Linux单位为KB，macOS为字节）
+    """
+    try:
+        import psutil
+    except ImportError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    return psutil.Process().memory_info().rss
+
+
+def measure_memory(renders, output_path, report_every=100):
+    """
+    连续渲染 renders 次，按间隔输出 Python 内存分配量和进程RSS
+    tracemalloc 只统计 Python 对象的分配，Figure 的像素缓冲区等 C 扩展分配的内存需要看RSS
+
+    :return: 每次采样的 (渲染次数, Python 内存分配字节数, RSS字节数) 列表
+    """
+    text = "微博 用户 画像 分析 词云 渲染 内存 测试 " * 20
+    samples = []
+    tracemalloc.start()
+    try:
+        for i in range(1, renders + 1):
+            render_wordcloud(text, "memory", output_path, dpi=72)
+            if i % report_every == 0 or i == 1:
+                current, _ = tracemalloc.get_traced_memory()
+                rss = get_rss()
+                samples.append((i, current, rss))
+                print(f"第 {i} 次渲染后 Python 内存分配：{current / 1024 / 1024:.2f} MB，"
+                      f"RSS：{rss / 1024 / 1024:.2f} MB")
+    finally:
+        tracemalloc.stop()
+    return samples
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="词云图渲染内存测试")
+    parser.add_argument("--renders", type=int, default=1000)
+    parser.add_argument("--output", default="./pic/_render_bench.png")
+    args = parser.parse_args()
+
+    samples = measure_memory(args.renders, args.output)
+    python_growth = samples[-1][1] - samples[0][1]
+    rss_growth = samples[-1][2] - samples[0][2]
+    print(f"首次与最后一次采样相差：Python 内存分配 {python_growth / 1024 / 1024:.2f} MB，"
+          f"RSS {rss_growth / 1024 / 1024:.2f} MB")
@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    get_response 的结果缓存，内存LRU + 磁盘持久化
+
+    每条缓存记录用户最新一条微博的id（latest_id），未超过 max_age 的记录直接返回；
+    超过 max_age 后由调用方获取最新微博id，与缓存一致时刷新时间戳，不一致时重新计算。
+    """
+
+    def __init__(self, cache_dir="./cache", max_entries=256, max_age=3600, lock_stripes=64):
+        """
+        :param cache_dir: 磁盘缓存目录，为 None 时只使用内存缓存
+        :param max_entries: 内存中最多保留的记录数
+        :param max_age: 记录的有效期（秒），过期后需要重新校验
+        :param lock_stripes: 用户锁的个数，用户按id散列到固定数量的锁上，锁的数量不随用户数增长
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(lock_stripes)]
+        if cache_dir and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def _path(self, user_id):
+        return os.path.join(self.cache_dir, f"{user_id}.json")
+
+    def _load(self, user_id):
+        """从磁盘读取记录，文件不存在或损坏时返回 None"""
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(user_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, user_id, entry):
+        """原子地写入磁盘，避免并发读取到写了一半的文件"""
+        if not self.cache_dir:
+            return
+        path = self._path(user_id)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _remember(self, user_id, entry):
+        self._entries[user_id] = entry
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, user_id):
+        """获取记录，内存未命中时从磁盘加载，不存在时返回 None"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+                return entry
+        entry = self._load(user_id)
+        if entry is not None:
+            with self._lock:
+                self._remember(user_id, entry)
+        return entry
+
+    def set(self, user_id, latest_id, response):
+        """写入记录，response 为可JSON序列化的结果"""
+        entry = {"latest_id": latest_id, "updated_at": time.time(), "response": response}
+        with self._lock:
+            self._remember(user_id, entry)
+        self._save(user_id, entry)
+        return entry
+
+    def touch(self, user_id):
+        """最新微博id未变化时刷新记录的时间戳"""
+        entry = self.get(user_id)
+        if entry is None:
+            return None
+        return self.set(user_id, entry["latest_id"], entry["response"])
+
+    def is_fresh(self, entry):
+        """记录是否仍在有效期内"""
+        return time.time() - entry["updated_at"] < self.max_age
+
+    def is_valid(self, entry, latest_id):
+        """记录对应的最新微博id是否与当前一致"""
+        return latest_id is not None and entry["latest_id"] == latest_id
+
+    def lock_for(self, user_id):
+        """获取某个用户的锁，保证同一用户同时只有一个请求在重新计算，不同用户偶尔会共用一把锁"""
+        return self._key_locks[hash(user_id) % len(self._key_locks)]
@@ -6,27 +6,19 @@ import csv
 import json
 import math
 import os
-import random
 import sys
 import traceback
 from collections import OrderedDict
 from datetime import datetime, timedelta
-from time import sleep
 
 import requests
 from lxml import etree
 from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
-import nltk
-from nltk.corpus import stopwords
-from gensim import corpora
-from gensim.models import LdaModel
 import string
-import jieba
-import pandas as pd
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
+
+from limiter import get_limiter, request
 
 
 class Weibo(object):
@@ -63,6 +55,8 @@ class Weibo(object):
         self.weibo_id_list = []  # 存储爬取到的所有微博id
         self.mysql_config = {
         }  # MySQL数据库连接配置，可以不填，当使用者的mysql用户名、密码等与本程序默认值不同时，需要通过mysql_config来自定义
+        self.session = requests.Session()  # 请求共用的连接池
+        self.limiter = get_limiter('m.weibo.cn/getIndex')  # 微博列表接口的自适应限速器，所有实例共用
 
     def is_date(self, since_date):
         """判断日期格式是否正确"""
@@ -75,7 +69,7 @@ class Weibo(object):
     def get_json(self, params):
         """获取网页中json数据"""
         url = 'https://m.weibo.cn/api/container/getIndex?'
-        r = requests.get(url, params=params)
+        r = request(self.session, self.limiter, url, params=params)
         return r.json()
 
     def get_weibo_json(self, page):
@@ -132,7 +126,7 @@ class Weibo(object):
     def get_long_weibo(self, id):
         """获取长微博"""
         url = 'https://m.weibo.cn/detail/%s' % id
-        html = requests.get(url).text
+        html = request(self.session, get_limiter('m.weibo.cn/detail'), url).text
         html = html[html.find('"status":'):]
         html = html[:html.rfind('"hotScheme"')]
         html = html[:html.rfind(',')]
@@ -495,8 +489,6 @@ class Weibo(object):
         page_count = self.get_page_count()
         wrote_count = 0
         self.print_user_info()
-        page1 = 0
-        random_pages = random.randint(1, 5)
         for page in tqdm(range(1, page_count + 1), desc='Progress'):
             print(u'第%d页' % page)
             is_end = self.get_one_page(page)
@@ -507,13 +499,8 @@ class Weibo(object):
                 self.write_data(wrote_count)
                 wrote_count = self.got_count
 
-            # 通过加入随机等待避免被限制。爬虫速度过快容易被系统限制(一段时间后限
-            # 制会自动解除)，加入随机等待模拟人的操作，可降低被系统限制的风险。默
-            # 认是每爬取1到5页随机等待6到10秒，如果仍然被限，可适当增加sleep时间
-            if page - page1 == random_pages and page < page_count:
-                sleep(random.randint(6, 10))
-                page1 = page
-                random_pages = random.randint(1, 5)
+            # 请求速度由 self.limiter 根据服务器的响应自动调整，被限流(418/429)时
+            # 降低速率并暂停，请求正常时逐渐提速，不再固定随机等待
 
         self.write_data(wrote_count)  # 将剩余不足20页的微博写入文件
         print(u'微博爬取完成，共爬取%d条微博' % self.got_count)
@@ -604,7 +591,33 @@ def get_str_with_id(id):
         print('Error: ', e)
         traceback.print_exc()
 
+def get_latest_weibo_id(id):
+    """
+    获取用户最新一条微博的id，只请求第一页，用于判断缓存的结果是否过期
+    获取失败时返回 None
+    """
+    try:
+        wb = Weibo()
+        wb.user_id = str(id)
+        js = wb.get_weibo_json(1)
+        if js['ok']:
+            weibo_ids = [int(w['mblog']['id']) for w in js['data']['cards'] if w['card_type'] == 9]
+            if weibo_ids:
+                return max(weibo_ids)  # 置顶微博可能排在最前，取最大的id
+    except Exception as e:
+        print('Error: ', e)
+        traceback.print_exc()
+    return None
+
 def generate_topic_pic(id):
+    # 主题模型和词云相关的库较大，只在生成图片时导入，不拖慢服务启动
+    import nltk
+    from gensim import corpora
+    from gensim.models import LdaModel
+    import jieba
+    import pandas as pd
+    from render import render_wordcloud_pooled
+
     def find_specific_csv(target_filename, search_dir="./weibo"):
         """
         在指定目录及其子目录中查找特定名称的CSV文件
@@ -705,19 +718,8 @@ def generate_topic_pic(id):
     # 将所有词语组合成一个大字符串
     text = ' '.join(all_tokens)
 
-    # 生成词云图
-    wordcloud = WordCloud(font_path='simhei.ttf',  # 设置字体路径，支持中文
-                        width=800, height=400,  # 设置图片大小
-                        background_color='white',  # 背景颜色
-                        max_words=100,  # 显示的最大单词数量
-                        contour_width=3, contour_color='steelblue').generate(text)
-
-    # 显示词云图
-    plt.figure(figsize=(10, 5))
-    plt.imshow(wordcloud, interpolation='bilinear')
-    plt.axis('off')  # 不显示坐标轴
-    plt.title(f"{id}")
-    plt.savefig(f"./pic/{id}.png", dpi=300, bbox_inches='tight')  # 保存词云图
+    # 生成词云图，使用独立的 Figure 渲染，避免 pyplot 全局状态累积
+    render_wordcloud_pooled(text, id, f"./pic/{id}.png", dpi=300)
 
 
 if __name__ == '__main__':
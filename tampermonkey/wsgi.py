@@ -0,0 +1,9 @@
+"""
+生产环境入口
+使用示例:
+    cd ./tampermonkey
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import app
+
+__all__ = ["app"]
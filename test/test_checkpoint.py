@@ -0,0 +1,219 @@
+import asyncio
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# 设置项目根目录路径
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.insert(0, PROJECT_ROOT)
+
+import net_utils
+from checkpoint import Checkpoint
+from model import Comment, Post, User
+from weibo import Weibo
+
+
+def make_user(id):
+    return User(id=id, location="", screen_name=f"u{id}", followers_count=0, friends_count=0,
+                description="", gender="m")
+
+
+def make_comment(id):
+    return Comment(id=id, text_raw="", source="", created_at="")
+
+
+class TestCheckpoint(unittest.TestCase):
+    def test_save_load_clear(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = Checkpoint("crawl_1", directory)
+            self.assertIsNone(checkpoint.load())
+            checkpoint.save({"pending": ["a", "b"]})
+            self.assertEqual(checkpoint.load(), {"pending": ["a", "b"]})
+            self.assertEqual(list(Path(directory).iterdir()), [Path(checkpoint.path)])  # 没有残留的临时文件
+            checkpoint.clear()
+            self.assertIsNone(checkpoint.load())
+            checkpoint.clear()
+
+
+class TestCrawlResume(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint = Checkpoint("crawl_1", self.directory.name)
+        self.graph = AsyncMock()
+        self.comment_cursors = []
+        self.fail_on_cursor = "c2"
+
+        self.posts_fetched = []
+
+        async def get_post(session, id):
+            self.posts_fetched.append(id)
+            return make_user(1), Post(id=int(id[1:]), text_raw="", created_at="")
+
+        async def stream_comments(session, id, max_id="", **kwargs):
+            pages = {"": ([make_comment(1)], "c2"), "c2": ([make_comment(2)], None)}
+            while True:
+                self.comment_cursors.append((id, max_id))
+                if max_id == self.fail_on_cursor:
+                    raise ConnectionError("cookie expired")
+                page, max_id = pages[max_id]
+                yield [(make_user(2), comment) for comment in page], max_id
+                if max_id is None:
+                    break
+
+        async def no_pages(session, id):
+            return
+            yield
+
+        self.patches = [
+            patch.object(net_utils, "get_post", get_post),
+            patch.object(net_utils, "stream_reposts", no_pages),
+            patch.object(net_utils, "stream_attitudes", no_pages),
+            patch.object(net_utils, "stream_comments", stream_comments),
+            patch.object(net_utils, "stream_weibo_ids", self.stream_weibo_ids),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def stream_weibo_ids(self, session, user_id):
+        yield ["p10"]
+        yield ["p20"]
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.directory.cleanup()
+
+    def run_crawl(self, resume):
+        asyncio.run(net_utils.run(MagicMock(), self.graph, "1", checkpoint=self.checkpoint, resume=resume))
+
+    def test_resume_from_comment_cursor(self):
+        with self.assertRaises(ConnectionError):
+            self.run_crawl(resume=False)
+        state = self.checkpoint.load()
+        self.assertEqual(state["pending"], ["p20"])
+        self.assertEqual(state["current"]["id"], "p10")
+        self.assertEqual(state["current"]["done"], ["post", "reposts", "attitudes"])
+        self.assertEqual(state["current"]["comments_max_id"], "c2")
+        self.assertTrue(state["discovered"])
+
+        self.fail_on_cursor = None
+        self.comment_cursors.clear()
+        self.posts_fetched.clear()
+        self.run_crawl(resume=True)
+        self.assertEqual(self.posts_fetched, ["p20"])  # 第一条微博的 post 阶段已完成，不再请求
+        self.assertEqual(self.comment_cursors, [(10, "c2"), (20, ""), (20, "c2")])
+        self.assertIsNone(self.checkpoint.load())  # 完成后删除断点
+
+
+    def test_resume_rediscovers_unfinished_post_list(self):
+        self.checkpoint.save({"user_id": "1", "pending": ["p20"], "current": None, "discovered": False})
+        self.fail_on_cursor = None
+        self.run_crawl(resume=True)
+        self.assertEqual(self.posts_fetched, ["p20", "p10"])  # 已在队列中的 p20 不重复加入
+
+
+    def test_resume_skips_completed_posts_when_rediscovering(self):
+        self.checkpoint.save({"user_id": "1", "pending": ["p20"], "current": None, "discovered": False,
+                              "completed": ["p10"]})
+        self.fail_on_cursor = None
+        self.run_crawl(resume=True)
+        self.assertEqual(self.posts_fetched, ["p20"])  # 断点前已完成的 p10 不再爬取
+
+
+class TestWeiboResume(unittest.TestCase):
+    def test_resume_from_last_written_page(self):
+        with tempfile.TemporaryDirectory() as directory, patch("weibo.Checkpoint") as checkpoint_class:
+            checkpoint_class.side_effect = lambda name: Checkpoint(name, directory)
+            pages = []
+            failures = [25]
+
+            def get_one_page(self, page):
+                pages.append(page)
+                if page in failures:
+                    failures.remove(page)
+                    raise ConnectionError("418")
+                self.weibo.append({"id": page})
+                self.weibo_id_list.append(page)
+                self.got_count += 1
+
+            def get_user_info(self):
+                self.user = {"statuses_count": 300}
+
+            with patch.multiple(Weibo, get_one_page=get_one_page, get_user_info=get_user_info,
+                                print_user_info=MagicMock(), write_data=MagicMock()):
+                wb = Weibo(resume=True)
+                wb.initialize_info("1")
+                with self.assertRaises(ConnectionError):
+                    wb.get_pages()
+
+                pages.clear()
+                wb = Weibo(resume=True)
+                wb.initialize_info("1")
+                wb.get_pages()
+
+            self.assertEqual(pages[0], 21)
+            self.assertEqual(wb.got_count, 30)
+            self.assertIsNone(Checkpoint("weibo_1", directory).load())
+
+    def test_failed_page_holds_back_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory, patch("weibo.Checkpoint") as checkpoint_class:
+            checkpoint_class.side_effect = lambda name: Checkpoint(name, directory)
+            pages = []
+            written = []
+            failures = {5: 3}  # 第5页前三次爬取都出错
+            crash = [25]
+
+            def get_one_page(self, page):
+                pages.append(page)
+                if page in crash:
+                    crash.remove(page)
+                    raise ConnectionError("418")
+                if failures.get(page):
+                    failures[page] -= 1
+                    self.failed_pages.append(page)
+                    return
+                if page in self.weibo_id_list:
+                    return
+                self.weibo.append({"id": page})
+                self.weibo_id_list.append(page)
+                self.got_count += 1
+
+            def write_data(self, wrote_count):
+                written.extend(w["id"] for w in self.get_unwritten(wrote_count))
+
+            def get_user_info(self):
+                self.user = {"statuses_count": 300}
+
+            with patch.multiple(Weibo, get_one_page=get_one_page, get_user_info=get_user_info,
+                                print_user_info=MagicMock(), write_data=write_data):
+                wb = Weibo(resume=True)
+                wb.initialize_info("1")
+                with self.assertRaises(ConnectionError):
+                    wb.get_pages()
+                state = Checkpoint("weibo_1", directory).load()
+                self.assertEqual(state["page"], 4)
+                self.assertEqual(state["wrote_count"], 19)
+                self.assertEqual([p for p, _ in state["pending"]], list(range(6, 21)))
+                self.assertNotIn("weibo", state)
+
+                # 恢复后第5页的重试仍然出错，断点保留在第4页之后
+                pages.clear()
+                wb = Weibo(resume=True)
+                wb.initialize_info("1")
+                wb.get_pages()
+                self.assertEqual(pages[0], 5)
+                self.assertEqual(Checkpoint("weibo_1", directory).load()["page"], 4)
+
+                wb = Weibo(resume=True)
+                wb.initialize_info("1")
+                wb.get_pages()
+
+            self.assertEqual(sorted(written), list(range(1, 31)))
+            self.assertEqual(wb.got_count, 30)
+            self.assertIsNone(Checkpoint("weibo_1", directory).load())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import requests
+
+# 设置项目根目录路径
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.insert(0, PROJECT_ROOT)
+
+from cookie_pool import CookiePool, as_pool, pooled_request
+from rate_limit import AdaptiveRateLimiter
+
+
+def make_response(status):
+    response = MagicMock()
+    response.status_code = status
+    return response
+
+
+class TestCookiePool(unittest.TestCase):
+    def test_load_single_cookie_or_list(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "cookies.json"
+            path.write_text(json.dumps({"SUB": "a"}))
+            self.assertEqual(len(CookiePool.load(path)), 1)
+            path.write_text(json.dumps([{"SUB": "a"}, {"SUB": "b"}]))
+            self.assertEqual(len(CookiePool.load(path)), 2)
+
+    def test_round_robin(self):
+        pool = CookiePool([{"SUB": "a"}, {"SUB": "b"}, {"SUB": "c"}], strategy="round_robin")
+        names = [pool.acquire().name for _ in range(4)]
+        self.assertEqual(names, ["cookie0", "cookie1", "cookie2", "cookie0"])
+
+    def test_least_throttled_avoids_recently_throttled_cookie(self):
+        pool = CookiePool([{"SUB": "a"}, {"SUB": "b"}], strategy="least_throttled")
+        first = pool.acquire()
+        pool.record(first, throttled=True)
+        self.assertEqual([pool.acquire().name for _ in range(3)], ["cookie1"] * 3)
+
+    def test_retire_after_consecutive_failures(self):
+        pool = CookiePool([{"SUB": "a"}, {"SUB": "b"}], strategy="round_robin", max_failures=2)
+        bad = pool.slots[0]
+        pool.record(bad, failed=True)
+        pool.record(bad)  # 成功后重新计数
+        pool.record(bad, failed=True)
+        self.assertFalse(bad.retired)
+        pool.record(bad, throttled=True)
+        self.assertTrue(bad.retired)
+        self.assertEqual({pool.acquire().name for _ in range(3)}, {"cookie1"})
+        pool.record(pool.slots[1], failed=True)
+        pool.record(pool.slots[1], failed=True)
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            CookiePool([{}], strategy="random")
+
+    def test_as_pool(self):
+        pool = CookiePool([{}])
+        self.assertIs(as_pool(pool), pool)
+        self.assertEqual(len(as_pool({"SUB": "a"})), 1)
+
+
+class TestPooledRequest(unittest.TestCase):
+    def test_rotates_cookie_after_throttle(self):
+        pool = CookiePool([{"SUB": "a"}, {"SUB": "b"}], strategy="round_robin")
+        limiter = AdaptiveRateLimiter(rate=1000, max_rate=1000, cooldown=0)
+        session = MagicMock()
+        session.get.side_effect = [make_response(429), make_response(200)]
+        response = pooled_request(session, pool, "test", "http://x", limiter=limiter)
+        self.assertEqual(response.status_code, 200)
+        used = [call.kwargs["cookies"]["SUB"] for call in session.get.call_args_list]
+        self.assertEqual(used, ["a", "b"])
+        self.assertEqual([stats["throttled"] for stats in pool.stats()], [1, 0])
+        self.assertEqual(limiter.stats()["throttled"], 1)
+
+    def test_network_error_not_counted_against_cookie(self):
+        pool = CookiePool([{"SUB": "a"}])
+        limiter = AdaptiveRateLimiter(rate=1000, max_rate=1000, cooldown=0)
+        session = MagicMock()
+        session.get.side_effect = requests.ConnectionError("reset")
+        with self.assertRaises(requests.ConnectionError):
+            pooled_request(session, pool, "test", "http://x", limiter=limiter, max_retries=2)
+        self.assertEqual(session.get.call_count, 3)
+        self.assertEqual(pool.stats()[0]["failures"], 0)
+
+
+class TestDotenvSettings(unittest.TestCase):
+    def run_with_dotenv(self, dotenv, code):
+        with tempfile.TemporaryDirectory() as directory:
+            Path(directory, ".env").write_text(dotenv)
+            result = subprocess.run([sys.executable, "-c", code], cwd=directory, capture_output=True, text=True,
+                                    env={"PYTHONPATH": PROJECT_ROOT, "PATH": ""})
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout.strip()
+
+    def test_rate_settings_read_from_dotenv(self):
+        # 限速参数在创建限速器时读取，.env 中的设置生效
+        code = "import rate_limit; print(rate_limit.get_limiter('test').max_rate)"
+        self.assertEqual(self.run_with_dotenv("RATE_MAX=7\n", code), "7.0")
+
+    def test_pool_and_checkpoint_settings_read_from_dotenv(self):
+        code = ("import cookie_pool, checkpoint; pool = cookie_pool.CookiePool([{}]); "
+                "print(pool.strategy, pool.max_failures, checkpoint.Checkpoint('x').directory)")
+        dotenv = "COOKIE_STRATEGY=round_robin\nCOOKIE_MAX_FAILURES=2\nCHECKPOINT_DIR=./state\n"
+        self.assertEqual(self.run_with_dotenv(dotenv, code), "round_robin 2 ./state")
+
+
+if __name__ == '__main__':
+    unittest.main()
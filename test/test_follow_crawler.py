@@ -0,0 +1,87 @@
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# 设置项目根目录路径
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.insert(0, PROJECT_ROOT)
+
+from follow_crawler import FollowGraphCrawler, scrape_timeline
+from weibo import Weibo
+
+# 关注关系：1 -> 2, 3, 4；2 -> 1, 5；3 -> 6；5 -> 7
+FOLLOWS = {
+    "1": [("2", "b"), ("3", "c"), ("4", "d")],
+    "2": [("1", "a"), ("5", "e")],
+    "3": [("6", "f")],
+    "4": [],
+    "5": [("7", "g")],
+}
+
+
+class FakeCrawler(FollowGraphCrawler):
+    def __init__(self, *args, **kwargs):
+        super().__init__({}, *args, **kwargs)
+        self.expanded = []
+
+    def get_follows(self, user_id):
+        self.expanded.append(user_id)
+        return FOLLOWS.get(user_id, [])
+
+
+class TestFollowGraphCrawler(unittest.TestCase):
+    def test_depth_and_visited(self):
+        crawler = FakeCrawler(depth=2)
+        edges = crawler.crawl(1)
+        self.assertEqual(crawler.expanded, ["1", "2", "3", "4"])  # 第2跳发现的用户不再展开
+        self.assertIn(("2", "1"), edges)  # 指向已访问用户的关注关系仍然保留
+        self.assertEqual(crawler.visited, {"1", "2", "3", "4", "5", "6"})
+
+    def test_priority_and_fan_out(self):
+        weights = {3: 10, 4: 5}
+        crawler = FakeCrawler(depth=2, fan_out=2, weights=lambda ids: {i: weights.get(i, 0) for i in ids})
+        edges = crawler.crawl(1)
+        self.assertEqual(edges[:2], [("1", "3"), ("1", "4")])
+        self.assertEqual(crawler.expanded, ["1", "3", "4"])
+
+    def test_bulk_write_and_scrape(self):
+        driver = MagicMock()
+        session = driver.session.return_value.__enter__.return_value
+        scraped = []
+        crawler = FakeCrawler(driver=driver, depth=1, weights=lambda ids: {}, scrape=scraped.append, batch_size=100)
+        crawler.crawl(1)
+
+        self.assertEqual(session.execute_write.call_count, 1)  # 所有关系一次写入
+        tx = MagicMock()
+        session.execute_write.call_args.args[0](tx)
+        rows = tx.run.call_args.kwargs["rows"]
+        self.assertEqual([(row["source"], row["target"]) for row in rows], [(1, 2), (1, 3), (1, 4)])
+        self.assertEqual(sorted(scraped), ["1", "2", "3", "4"])
+
+    def test_scrape_failure_is_isolated(self):
+        def scrape(user_id):
+            if user_id == "3":
+                raise RuntimeError("blocked")
+
+        crawler = FakeCrawler(depth=1, scrape=scrape)
+        crawler.crawl(1)
+        self.assertEqual(list(crawler.scrape_failures), ["3"])
+
+    def test_scrape_timeline_failure_recorded(self):
+        def scrape_user(self, user_id):
+            self.initialize_info(user_id)
+            if user_id == "3":
+                raise ConnectionError("418")
+            if user_id == "4":
+                self.failed_pages.append(2)
+
+        crawler = FakeCrawler(depth=1, scrape=scrape_timeline)
+        with patch.object(Weibo, "scrape_user", scrape_user):
+            crawler.crawl(1)
+        self.assertEqual(sorted(crawler.scrape_failures), ["3", "4"])
+        self.assertIsInstance(crawler.scrape_failures["3"], ConnectionError)
+
+
+if __name__ == '__main__':
+    unittest.main()
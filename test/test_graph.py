@@ -0,0 +1,55 @@
+import sys
+import unittest
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+# 设置项目根目录路径
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.insert(0, PROJECT_ROOT)
+
+from graph import WeiboGraph
+
+
+class TestWriteBatch(IsolatedAsyncioTestCase):
+    async def test_batch_counts_new_interactions_once(self):
+        from model import Comment, User
+        user = User(id=2, location="", screen_name="", followers_count=0, friends_count=0, gender="m", description="")
+        comments = [
+            (Comment(id=1, text_raw="", source="", created_at=""), 2, 10),
+            (Comment(id=1, text_raw="", source="", created_at=""), 2, 10),  # 同一批中重复的评论
+            (Comment(id=3, text_raw="", source="", created_at="", root_id=1), 2, 10),
+        ]
+        results = {}
+
+        async def run(query, **parameters):
+            result = MagicMock()
+            rows = parameters.get("rows", [])
+            result.data = AsyncMock(return_value=[
+                {"actor_id": row["user_id"], "post_id": row["post_id"], "created": True} for row in rows
+            ] if "RETURN" in query else [])
+            results[query] = parameters
+            return result
+
+        tx = MagicMock()
+        tx.run = AsyncMock(side_effect=run)
+        await WeiboGraph._write_batch(tx, [user, user], [], comments, [], [])
+
+        queries = [call.args[0] for call in tx.run.await_args_list]
+        self.assertEqual(len(queries), 4)  # 用户、评论、回复关系、INTERACTS
+        self.assertEqual(len(results[queries[0]]["rows"]), 1)
+        self.assertEqual([row["id"] for row in results[queries[1]]["rows"]], [1, 3])
+        self.assertEqual(results[queries[2]]["rows"][0]["root_id"], 1)
+        self.assertIn("i.commented = i.commented + row.n", queries[3])
+        self.assertEqual(results[queries[3]]["rows"], [{"actor_id": 2, "post_id": 10, "n": 2}])
+
+
+    async def test_single_writes_use_batch_path(self):
+        graph = WeiboGraph.__new__(WeiboGraph)
+        graph.write_batch = AsyncMock()
+        await graph.create_like_relationship(2, 10)
+        await graph.create_repost_relationship(2, 11, 10)
+        graph.write_batch.assert_has_awaits([call(likes=[(2, 10)]), call(reposts=[(2, 11, 10)])])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import requests
+
+# 设置tampermonkey目录路径
+TAMPERMONKEY_ROOT = str(Path(__file__).parent.parent / "tampermonkey")
+sys.path.insert(0, TAMPERMONKEY_ROOT)
+
+from limiter import Limiter, request
+
+
+def make_response(status):
+    response = MagicMock()
+    response.status_code = status
+    return response
+
+
+class TestLimiter(unittest.TestCase):
+    def test_throttle_slows_down_and_retries(self):
+        limiter = Limiter(rate=1000, min_rate=1, max_rate=1000)
+        session = MagicMock()
+        session.get.side_effect = [make_response(418), make_response(200)]
+        with patch("limiter.RATE_COOLDOWN", 0):
+            response = request(session, limiter, "http://x")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session.get.call_count, 2)
+        self.assertAlmostEqual(limiter.rate, 1000 * 0.5 + 0.1)  # 被限流后减半，成功后增加
+
+    def test_gives_up_after_retries(self):
+        limiter = Limiter(rate=1000, max_rate=1000)
+        session = MagicMock()
+        session.get.side_effect = requests.ConnectionError("reset")
+        with patch("limiter.RATE_COOLDOWN", 0), self.assertRaises(requests.ConnectionError):
+            request(session, limiter, "http://x", max_retries=2)
+        self.assertEqual(session.get.call_count, 3)
+
+    def test_utils_imports_without_project_root(self):
+        # 服务单独部署时只有 tampermonkey 目录
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("utils.py", "limiter.py"):
+                shutil.copy(Path(TAMPERMONKEY_ROOT, name), directory)
+            result = subprocess.run([sys.executable, "-c", "import utils"], cwd=directory,
+                                    capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import sys
+import unittest
+from itertools import cycle
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# 设置tampermonkey目录路径
+TAMPERMONKEY_ROOT = str(Path(__file__).parent.parent / "tampermonkey")
+sys.path.insert(0, TAMPERMONKEY_ROOT)
+
+import llm_client
+import mock_llm_server
+
+
+class TestMockLLMServer(unittest.TestCase):
+    def setUp(self):
+        mock_llm_server.app.config["RESPONSES"] = cycle(["你好，世界！这是一条测试回复。"])
+        mock_llm_server.app.config["CHUNK_SIZE"] = 4
+        self.client = mock_llm_server.app.test_client()
+
+    def test_stream_replays_canned_text(self):
+        resp = self.client.post('/v1/chat/completions', json={
+            "model": "qwen-long",
+            "messages": [],
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        })
+        self.assertEqual(resp.mimetype, "text/event-stream")
+
+        events = [line[len("data: "):] for line in resp.get_data(as_text=True).split("\n\n") if line]
+        self.assertEqual(events[-1], "[DONE]")
+        chunks = [json.loads(e) for e in events[:-1]]
+        text = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"])
+        self.assertEqual(text, "你好，世界！这是一条测试回复。")
+        self.assertIn("usage", chunks[-1])
+
+    def test_non_stream_response(self):
+        resp = self.client.post('/v1/chat/completions', json={"model": "m", "messages": []})
+        data = resp.get_json()
+        self.assertEqual(data["choices"][0]["message"]["content"], "你好，世界！这是一条测试回复。")
+
+
+class TestStreamChat(unittest.TestCase):
+    def test_concatenates_stream_chunks(self):
+        def make_chunk(content):
+            chunk = MagicMock()
+            chunk.choices = [MagicMock()]
+            chunk.choices[0].delta.content = content
+            return chunk
+
+        usage_chunk = MagicMock()
+        usage_chunk.choices = []
+        client = MagicMock()
+        client.chat.completions.create.return_value = [make_chunk("你好"), make_chunk(None), make_chunk("世界"), usage_chunk]
+
+        self.assertEqual(llm_client.stream_chat([], client=client), "你好世界")
+        self.assertTrue(client.chat.completions.create.call_args.kwargs["stream"])
+
+    @patch('llm_client.create_client')
+    def test_shared_client_created_once(self, mock_create_client):
+        llm_client._client = None
+        first = llm_client.get_client()
+        second = llm_client.get_client()
+        self.assertIs(first, second)
+        mock_create_client.assert_called_once()
+        llm_client._client = None
+
+
+if __name__ == '__main__':
+    unittest.main()
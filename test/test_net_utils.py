@@ -0,0 +1,568 @@
+import asyncio
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import networkx as nx
+import numpy as np
+
+# 设置项目根目录路径
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.insert(0, PROJECT_ROOT)
+
+import net_utils
+
+
+def make_node(id, label=None, **properties):
+    node = MagicMock()
+    props = {"id": id, **properties}
+    if label:
+        props["label"] = label
+    node.__getitem__.side_effect = lambda name: props.get(name)
+    node._properties = props
+    return node
+
+
+def make_relation(element_id, type):
+    relation = MagicMock()
+    relation.element_id = element_id
+    relation.type = type
+    relation._properties = {}
+    return relation
+
+
+class TestEgoNetwork(unittest.TestCase):
+    def test_expand_ego_hop_streams_records_into_graph(self):
+        user = make_node(1, screen_name="target")
+        post = make_node(10)
+        liker = make_node(2, screen_name="liker")
+        records = {
+            "POSTED": [{"s": user, "r": make_relation("r1", "POSTED"), "e": post, "m_id": "post"}],
+            "LIKED": [{"s": liker, "r": make_relation("r2", "LIKED"), "e": post, "m_id": "liker"}],
+        }
+        tx = MagicMock()
+        tx.run.side_effect = lambda query, frontier, limit: iter(
+            next(v for k, v in records.items() if f"[r:{k}]" in query)
+        )
+
+        G = nx.MultiDiGraph()
+        discovered = net_utils.expand_ego_hop(
+            tx, ["target"], {"POSTED": 10, "LIKED": 5},
+            lambda record: net_utils.add_relationship(G, record["s"], record["r"], record["e"]),
+        )
+
+        self.assertEqual(discovered, {"post", "liker"})
+        self.assertTrue(G.has_edge(1, 10))
+        self.assertEqual(G.get_edge_data(2, 10)["r2"]["weight"], 1)
+        self.assertEqual(tx.run.call_args.kwargs["limit"], 5)
+        query = tx.run.call_args.args[0]
+        self.assertLess(query.index("LIMIT $limit"), query.index("}"))  # 在子查询中按起点分别限制
+
+    def test_sparse_and_networkx_backends_agree(self):
+        nodes = {
+            "u1": make_node(1, "User"), "u2": make_node(2, "User"), "u3": make_node(3, "User"),
+            "p10": make_node(10, "Post"), "p11": make_node(11, "Post"), "c20": make_node(20, "Comment"),
+        }
+        relations = [
+            ("r1", "POSTED", "u1", "p10"),
+            ("r2", "LIKED", "u2", "p10"),
+            ("r3", "COMMENTED", "u3", "c20"),
+            ("r4", "COMMENTS", "c20", "p10"),
+            ("r5", "POSTED", "u2", "p11"),
+            ("r6", "REPOST_OF", "p11", "p10"),
+            ("r7", "LIKED", "u1", "p11"),
+        ]
+        driver = make_ego_driver(nodes, relations, "u1")
+
+        G = nx.MultiDiGraph()
+        net_utils.convert_ego_to_nx_graph(driver, G, 1)
+        expected = net_utils.calculate_association_degree(net_utils.project_user_graph(G), 1)
+        graph = net_utils.load_sparse_ego_graph(driver, 1)
+
+        self.assertEqual(expected, {2: 5, 3: 2})
+        self.assertEqual(graph.association_degree(1), expected)
+
+    def test_expand_ego_hop_rejects_unknown_type(self):
+        with self.assertRaises(ValueError):
+            net_utils.expand_ego_hop(MagicMock(), [], {"FOO) DETACH DELETE (x": 1}, print)
+
+
+def make_ego_driver(nodes, relations, target):
+    """
+    模拟 walk_ego_network 使用的Neo4j会话：与 expand_ego_hop 的查询一样不区分方向，
+    关系的两端都在 frontier 中时从两端各返回一次
+
+    :param nodes: {elementId: 节点}
+    :param relations: [(elementId, 关系类型, 起点elementId, 终点elementId)]
+    """
+    def run(query, frontier, limit):
+        rel_type = query.split("[r:")[1].split("]")[0]
+        for rid, type, s, e in relations:
+            if type != rel_type:
+                continue
+            for n, m in ((s, e), (e, s)):
+                if n in frontier:
+                    yield {"s": nodes[s], "r": make_relation(rid, type), "e": nodes[e],
+                           "s_id": nodes[s]["id"], "type": type, "e_id": nodes[e]["id"], "rid": rid, "m_id": m}
+
+    tx = MagicMock()
+    tx.run.side_effect = run
+    session = MagicMock()
+    session.run.return_value.single.return_value = {"element_id": target}
+    session.execute_read.side_effect = lambda func, *args: func(tx, *args)
+    driver = MagicMock()
+    driver.session.return_value.__enter__.return_value = session
+    return driver
+
+
+class TestAssociationDegree(unittest.TestCase):
+    def setUp(self):
+        self.G = nx.MultiDiGraph()
+        self.G.add_edge(2, 1, key="a", label="LIKED", weight=1)
+        self.G.add_edge(2, 1, key="b", label="COMMENTS", weight=2)
+        self.G.add_edge(1, 2, key="c", label="FOLLOWS", weight=5)
+        self.G.add_edge(1, 3, key="d", label="REPOST_OF", weight=3)
+        self.G.add_edge(1, 1, key="e", label="LIKED", weight=1)
+        self.G.add_edge(3, 4, key="f", label="LIKED", weight=1)
+
+    def test_only_neighbours_are_scored(self):
+        degrees = net_utils.calculate_association_degree(self.G, 1)
+        self.assertEqual(degrees, {2: 8, 3: 3})
+
+    def test_missing_target(self):
+        with self.assertRaises(ValueError):
+            net_utils.calculate_association_degree(self.G, 99)
+
+    def test_rank_top_k(self):
+        degrees = {2: 8, 3: 3, 4: 10}
+        self.assertEqual(net_utils.rank_association_degree(degrees, 2), [(4, 10), (2, 8)])
+        self.assertEqual(net_utils.rank_association_degree(degrees), [(4, 10), (2, 8), (3, 3)])
+
+
+class TestProjectUserGraph(unittest.TestCase):
+    def setUp(self):
+        # 用户1发帖101，用户2点赞并评论（评论201），用户3转发（帖子102）
+        self.G = nx.MultiDiGraph()
+        for user in (1, 2, 3):
+            self.G.add_node(user, label="User")
+        self.G.add_edge(1, 101, key="p1", label="POSTED", weight=0)
+        self.G.add_edge(2, 101, key="l1", label="LIKED", weight=1)
+        self.G.add_edge(2, 201, key="c1", label="COMMENTED", weight=0)
+        self.G.add_edge(201, 101, key="c2", label="COMMENTS", weight=2)
+        self.G.add_edge(3, 102, key="p2", label="POSTED", weight=0)
+        self.G.add_edge(3, 102, key="r1", label="REPOSTED", weight=0)
+        self.G.add_edge(102, 101, key="r2", label="REPOST_OF", weight=3)
+        self.G.add_edge(1, 101, key="l2", label="LIKED", weight=1)  # 给自己点赞
+
+    def test_multigraph_projection(self):
+        H = net_utils.project_user_graph(self.G)
+        self.assertEqual(set(H.nodes()), {1, 2, 3})
+        self.assertEqual(
+            sorted((u, v, d["label"]) for u, v, d in H.edges(data=True)),
+            [(2, 1, "COMMENTS"), (2, 1, "LIKED"), (3, 1, "REPOST_OF")],
+        )
+        self.assertIn(101, self.G)  # 原图不变
+
+    def test_compact_projection(self):
+        H = net_utils.project_user_graph(self.G, compact=True)
+        self.assertIsInstance(H, nx.DiGraph)
+        self.assertEqual(H[2][1]["weight"], 3)
+        self.assertEqual(H[2][1]["labels"], {"LIKED": 1, "COMMENTS": 1})
+        self.assertEqual(net_utils.calculate_association_degree(H, 1), {2: 3, 3: 3})
+
+    def test_project_edges_matches_graph_projection(self):
+        edges = [(u, v, d["label"], d["weight"]) for u, v, d in self.G.edges(data=True)]
+        projected = sorted(net_utils.project_edges(edges))
+        expected = sorted((u, v, d["label"], d["weight"]) for u, v, d in net_utils.project_user_graph(self.G).edges(data=True))
+        self.assertEqual(projected, expected)
+
+    def test_non_owner_commented_edge_is_kept(self):
+        G = nx.MultiDiGraph()
+        G.add_edge(1, 101, key="edge1", label="POSTED", weight=3)
+        G.add_edge(2, 1, key="edge2", label="FOLLOWS", weight=5)
+        G.add_edge(2, 101, key="edge3", label="COMMENTED", weight=2)
+        merged = net_utils.merge_user_and_post(G)
+        self.assertNotIn(101, merged)
+        self.assertEqual(merged.number_of_edges(), 2)
+
+
+class TestInteractionGraph(unittest.TestCase):
+    def test_load_interaction_graph(self):
+        records = [
+            {"s_id": 2, "e_id": 1, "liked": 2, "commented": 1, "reposted": 0},
+            {"s_id": 1, "e_id": 3, "liked": 0, "commented": 0, "reposted": 1},
+            {"s_id": 3, "e_id": 2, "liked": None, "commented": 1, "reposted": 0},
+        ]
+        driver = MagicMock()
+        session = driver.session.return_value.__enter__.return_value
+        session.run.return_value = iter(records)
+
+        graph = net_utils.load_interaction_graph(driver, 1)
+        self.assertEqual(graph.association_degree(1), {2: 4, 3: 3})
+        self.assertEqual(graph.matrices["COMMENTS"].sum(), 4)
+
+
+class TestDrawTightGraph(unittest.TestCase):
+    def setUp(self):
+        self.G = nx.MultiDiGraph()
+        for user in range(1, 6):
+            self.G.add_node(user, properties={"screen_name": f"user{user}"})
+        self.G.add_edge(2, 1, key="a", label="LIKED", weight=6)
+        self.G.add_edge(1, 2, key="b", label="FOLLOWS", weight=5)
+        self.G.add_edge(3, 1, key="c", label="REPOST_OF", weight=9)
+        self.G.add_edge(4, 1, key="d", label="COMMENTS", weight=7)
+        self.G.add_edge(5, 1, key="e", label="LIKED", weight=1)
+        self.degrees = net_utils.calculate_association_degree(self.G, 1)
+
+    def edge_labels(self, fig):
+        ax = fig.axes[0]
+        return [text.get_text() for text in ax.texts if text.get_color() == 'red']
+
+    def test_edges_in_single_collection(self):
+        from matplotlib.collections import LineCollection
+        fig = net_utils.draw_tight_graph(self.G, 1, self.degrees)
+        collections = [c for c in fig.axes[0].collections if isinstance(c, LineCollection)]
+        self.assertEqual(len(collections), 1)
+        self.assertEqual(len(collections[0].get_segments()), 3)  # 用户5关联度低于阈值
+        self.assertEqual(sorted(self.edge_labels(fig)), ["COMMENTS", "FOLLOWS + LIKED", "REPOST_OF"])
+
+    def test_max_labels(self):
+        fig = net_utils.draw_tight_graph(self.G, 1, self.degrees, max_labels=2)
+        self.assertEqual(self.edge_labels(fig), ["FOLLOWS + LIKED", "REPOST_OF"])
+
+
+class TestComputeLayout(unittest.TestCase):
+    def setUp(self):
+        net_utils.clear_layout_cache()
+        self.G = nx.star_graph(20)
+        nx.set_edge_attributes(self.G, 1, "weight")
+
+    def tearDown(self):
+        net_utils.clear_layout_cache()
+
+    def test_warm_start_keeps_positions(self):
+        first = net_utils.compute_layout(self.G, 0)
+        self.G.add_edge(0, 21, weight=1)
+        second = net_utils.compute_layout(self.G, 0)
+        self.assertIn(21, second)
+        moved = max(float(np.linalg.norm(second[n] - first[n])) for n in first)
+        self.assertLess(moved, 0.5)
+
+    def test_cache_is_per_target(self):
+        net_utils.compute_layout(self.G, 0)
+        self.assertIn(0, net_utils._layout_cache)
+        net_utils.compute_layout(self.G, 5, use_cache=False)
+        self.assertNotIn(5, net_utils._layout_cache)
+
+    def test_spectral_layout(self):
+        pos = net_utils.compute_layout(self.G, 0, method="spectral")
+        self.assertEqual(set(pos), set(self.G))
+        with self.assertRaises(ValueError):
+            net_utils.compute_layout(self.G, 0, method="circle")
+
+
+class TestCrawlProgress(unittest.TestCase):
+    def test_counters_and_eta(self):
+        events = []
+        tracker = net_utils.CrawlProgress(1, events.append)
+        tracker.emit("queued", count=4)
+        tracker.emit("reposts", "a", 3)
+        tracker.emit("written", "a", 7)
+        tracker.requests = 10
+        event = tracker.emit("post_done", "a")
+
+        self.assertEqual([e.kind for e in events], ["queued", "reposts", "written", "post_done"])
+        self.assertEqual((event.posts_queued, event.posts_done, event.nodes_written), (4, 1, 7))
+        self.assertEqual(event.fetched["reposts"], 3)
+        self.assertAlmostEqual(event.eta, event.elapsed * 3)
+        self.assertGreater(event.requests_per_second, 0)
+
+    def test_stream_process_user(self):
+        async def fake_process_user(user_id, progress=None):
+            tracker = net_utils.CrawlProgress(user_id, progress)
+            tracker.emit("queued", count=1)
+            await asyncio.sleep(0)
+            tracker.emit("post_done", "a")
+            tracker.emit("done", message="ok")
+            return "ok"
+
+        async def collect():
+            return [event async for event in net_utils.stream_process_user(1)]
+
+        with patch.object(net_utils, "process_user", fake_process_user):
+            events = asyncio.run(collect())
+        self.assertEqual([e.kind for e in events], ["queued", "post_done", "done"])
+        self.assertEqual(events[-1].message, "ok")
+
+    def test_stream_stops_when_process_user_fails(self):
+        async def failing_process_user(user_id, progress=None):
+            net_utils.CrawlProgress(user_id, progress).emit("queued", count=1)
+            raise RuntimeError("boom")
+
+        async def collect(events):
+            async for event in net_utils.stream_process_user(1):
+                events.append(event)
+
+        events = []
+        with patch.object(net_utils, "process_user", failing_process_user):
+            with self.assertRaises(RuntimeError):
+                asyncio.run(collect(events))
+        self.assertEqual([e.kind for e in events], ["queued"])
+
+
+class TestFetchers(unittest.TestCase):
+    def make_session(self, responses):
+        session = MagicMock()
+
+        async def get(url, **kwargs):
+            status, data = responses.pop(0)
+            resp = MagicMock()
+            resp.status = status
+
+            async def json():
+                return data
+            resp.json = json
+            return resp
+
+        session.get.side_effect = get
+        return session
+
+    def test_attitudes_retry_throttled_and_empty_pages(self):
+        from rate_limit import AdaptiveRateLimiter
+        from cookie_pool import CookiePool
+        limiter = AdaptiveRateLimiter(rate=1000, max_rate=1000, cooldown=0)
+        pool = CookiePool([{"SUB": "a"}, {"SUB": "b"}], strategy="round_robin")
+        user = {"id": 2, "location": "", "screen_name": "u", "followers_count": 0, "friends_count": 0,
+                "gender": "m", "description": ""}
+        responses = [
+            (200, {"data": [{"user": user}], "total_number": 2}),
+            (418, None),
+            (200, {"data": [], "total_number": 2}),  # 还没取完却返回空数据，视为被限流
+            (200, {"data": [{"user": {**user, "id": 3}}], "total_number": 2}),
+        ]
+        session = self.make_session(responses)
+        with patch.object(net_utils, "_cookie_pool", pool), patch("cookie_pool.get_limiter", return_value=limiter):
+            users = asyncio.run(net_utils.get_attitudes(session, "1"))
+        self.assertEqual([u.id for u in users], [2, 3])
+        self.assertEqual(limiter.stats()["throttled"], 2)
+        self.assertEqual(responses, [])
+        # 每次请求轮换cookie
+        used = [call.kwargs["cookies"]["SUB"] for call in session.get.call_args_list]
+        self.assertEqual(used, ["a", "b", "a", "b"])
+        self.assertEqual([stats["throttled"] for stats in pool.stats()], [1, 1])
+
+    def test_stream_comments_with_replies(self):
+        from rate_limit import AdaptiveRateLimiter
+        from cookie_pool import CookiePool
+        limiter = AdaptiveRateLimiter(rate=1000, max_rate=1000, cooldown=0)
+        user = {"id": 2, "location": "", "screen_name": "u", "followers_count": 0, "friends_count": 0,
+                "gender": "m", "description": ""}
+
+        def comment(id, **extra):
+            return {"id": id, "text_raw": "", "created_at": "", "user": user, **extra}
+
+        responses = [
+            # 根评论1的预览已包含全部回复，根评论2需要单独请求
+            (200, {"data": [comment(1, total_number=1, comments=[comment(11)]),
+                            comment(2, total_number=2, comments=[comment(21)])],
+                   "total_number": 3, "max_id": "c2"}),
+            (200, {"data": [comment(21), comment(22)], "total_number": 2, "max_id": 0}),
+            (200, {"data": [comment(3)], "total_number": 3, "max_id": 0}),
+        ]
+        session = self.make_session(responses)
+
+        async def collect():
+            return [(page, cursor) async for page, cursor in
+                    net_utils.stream_comments(session, "1", count=20, replies=True)]
+
+        with patch.object(net_utils, "_cookie_pool", CookiePool([{}])), \
+                patch("cookie_pool.get_limiter", return_value=limiter):
+            pages = asyncio.run(collect())
+        self.assertEqual([[(c.id, c.root_id) for _, c in page] for page, _ in pages],
+                         [[(1, None), (2, None), (11, 1), (21, 2), (22, 2)], [(3, None)]])
+        self.assertEqual([cursor for _, cursor in pages], ["c2", None])
+        urls = [call.args[0] for call in session.get.call_args_list]
+        self.assertIn("count=20", urls[0])
+        self.assertIn("id=2&", urls[1])
+        self.assertIn("fetch_level=1", urls[1])
+        self.assertIn("max_id=c2", urls[2])
+        self.assertEqual(responses, [])
+
+    def test_reposts_parsed_from_timeline(self):
+        from rate_limit import AdaptiveRateLimiter
+        from cookie_pool import CookiePool
+        limiter = AdaptiveRateLimiter(rate=1000, max_rate=1000, cooldown=0)
+        user = {"id": 2, "screen_name": "u", "followers_count": 0, "friends_count": 0, "gender": "f"}
+        full_user = {**user, "location": "北京", "description": ""}
+        responses = [
+            (200, {"data": [
+                {"id": 21, "mblogid": "A", "text_raw": "转发", "created_at": "t", "user": user},
+                {"id": 22, "mblogid": "B", "text_raw": "截断", "created_at": "t", "user": user, "isLongText": True},
+                {"id": 23, "mblogid": "C", "text_raw": "缺字段", "created_at": "t", "user": {"id": 3}},
+            ], "total_number": 3}),
+            # 只有正文被截断和用户数据不完整的转发需要额外请求
+            (200, {"id": 22, "text_raw": "完整正文", "created_at": "t", "user": {"id": 2}}),
+            (200, {"data": {"user": full_user}}),
+            (200, {"data": {"user": {**full_user, "id": 3}}}),
+        ]
+        session = self.make_session(responses)
+        with patch.object(net_utils, "_cookie_pool", CookiePool([{}])), \
+                patch("cookie_pool.get_limiter", return_value=limiter):
+            reposts = asyncio.run(net_utils.get_reposts(session, "1"))
+        self.assertEqual([(mblogid, user.id, post.text_raw) for mblogid, user, post in reposts],
+                         [("A", 2, "转发"), ("B", 2, "完整正文"), ("C", 3, "缺字段")])
+        self.assertIsNone(reposts[0][1].location)  # 缺失的字段不覆盖数据库中已有的值
+        self.assertEqual(session.get.call_count, 4)
+        self.assertEqual(responses, [])
+
+    def test_stream_weibo_ids_pages_concurrently(self):
+        from rate_limit import AdaptiveRateLimiter
+        from cookie_pool import CookiePool
+        limiter = AdaptiveRateLimiter(rate=1000, max_rate=1000, cooldown=0)
+
+        def page(ids, mp=None):
+            links = "".join(f'<div class="c"><div><a href="https://weibo.cn/comment/{i}?uid=1">评论</a></div></div>'
+                            for i in ids)
+            form = f'<input name="mp" value="{mp}"/>' if mp else ""
+            return f"<html><body>{links}{form}</body></html>".encode()
+
+        pages = {1: page(["A", "B"], mp=3), 2: page(["B", "C"]), 3: page(["D"])}
+        requested = []
+
+        async def get(url, **kwargs):
+            number = int(url.split("page=")[1])
+            requested.append(number)
+            resp = MagicMock()
+            resp.status = 200
+            resp.url = url
+
+            async def read():
+                return pages[number]
+            resp.read = read
+            return resp
+
+        session = MagicMock()
+        session.get.side_effect = get
+
+        async def collect():
+            return [ids async for ids in net_utils.stream_weibo_ids(session, 1)]
+
+        with patch.object(net_utils, "_cookie_pool", CookiePool([{}])), \
+                patch("cookie_pool.get_limiter", return_value=limiter):
+            batches = asyncio.run(collect())
+        self.assertEqual(batches[0], ["A", "B"])  # 第1页先产出
+        self.assertEqual(sorted(sum(batches[1:], [])), ["C", "D"])  # 重复的ID只产出一次
+        self.assertEqual(sorted(requested), [1, 2, 3])
+
+    def test_stream_weibo_ids_cancels_pending_pages_on_close(self):
+        first = b'<html><body><div class="c"><div><a href="/comment/A">c</a></div></div>' \
+                b'<input name="mp" value="5"/></body></html>'
+        cancelled = []
+
+        async def fetch_json(session, endpoint, url, **kwargs):
+            from lxml import etree
+            if url.endswith("page=1") or url.endswith("page=2"):
+                return etree.HTML(first)
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(url)
+                raise
+
+        async def main():
+            ids = net_utils.stream_weibo_ids(MagicMock(), 1)
+            self.assertEqual(await ids.__anext__(), ["A"])
+            self.assertEqual(await ids.__anext__(), [])  # 第2页，其余各页的请求仍在进行
+            await ids.aclose()
+
+        with patch.object(net_utils, "fetch_json", fetch_json):
+            asyncio.run(main())
+        self.assertEqual(len(cancelled), 3)
+
+    def test_page_truncated(self):
+        self.assertTrue(net_utils.page_truncated(1, 2)({"data": []}))
+        self.assertFalse(net_utils.page_truncated(2, 2)({"data": []}))
+        self.assertFalse(net_utils.page_truncated(0, None)({"data": []}))
+        self.assertFalse(net_utils.page_truncated(1, 2)({"data": [{}]}))
+
+
+class TestGraphWriter(unittest.TestCase):
+    def make_user(self, id):
+        from model import User
+        return User(id=id, location="", screen_name="", followers_count=0, friends_count=0,
+                    gender="m", description="")
+
+    def test_batches_and_callbacks_in_order(self):
+        graph = MagicMock()
+        log = []
+
+        async def write_batch(**batch):
+            log.append(("write", {kind: len(rows) for kind, rows in batch.items() if rows}))
+        graph.write_batch.side_effect = write_batch
+
+        async def main():
+            async with net_utils.GraphWriter(graph, batch_size=2) as writer:
+                for i in range(3):
+                    await writer.put("users", self.make_user(i))
+                await writer.after(lambda: log.append(("saved",)))
+                await writer.put("likes", 1, 10)
+
+        asyncio.run(main())
+        self.assertEqual(log, [("write", {"users": 2}), ("write", {"users": 1}), ("saved",),
+                               ("write", {"likes": 1})])
+
+    def test_write_error_is_raised_and_skips_callbacks(self):
+        graph = MagicMock()
+        graph.write_batch = AsyncMock(side_effect=RuntimeError("neo4j down"))
+        saved = []
+
+        async def main():
+            async with net_utils.GraphWriter(graph) as writer:
+                await writer.put("users", self.make_user(1))
+                await writer.after(lambda: saved.append(1))
+                with self.assertRaises(RuntimeError):
+                    await writer.sync()
+                with self.assertRaises(RuntimeError):
+                    await writer.put("users", self.make_user(2))
+
+        asyncio.run(main())
+        self.assertEqual(saved, [])
+
+
+class TestLazyImport(unittest.TestCase):
+    def test_import_has_no_side_effects(self):
+        # 在没有 cookies.json 的目录中导入，较重的依赖不应被加载
+        code = ("import sys, net_utils; "
+                "print(','.join(m for m in ('aiohttp', 'neo4j', 'networkx', 'matplotlib', 'requests') "
+                "if m in sys.modules))")
+        with tempfile.TemporaryDirectory() as directory:
+            result = subprocess.run([sys.executable, "-c", code], cwd=directory, capture_output=True, text=True,
+                                    env={"PYTHONPATH": PROJECT_ROOT, "PATH": ""})
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_settings_read_from_dotenv(self):
+        # .env 在导入之后才读取，其中的参数仍然生效
+        code = ("import net_utils; "
+                "print(net_utils.GraphWriter(None).batch_size, net_utils.get_setting('COMMENT_REPLIES'))")
+        with tempfile.TemporaryDirectory() as directory:
+            Path(directory, ".env").write_text("WRITE_BATCH_SIZE=5\nCOMMENT_REPLIES=1\n")
+            result = subprocess.run([sys.executable, "-c", code], cwd=directory, capture_output=True, text=True,
+                                    env={"PYTHONPATH": PROJECT_ROOT, "PATH": ""})
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "5 True")
+
+    def test_cookie_pool_loaded_once(self):
+        pool = MagicMock()
+        with patch.object(net_utils, "_cookie_pool", None), \
+                patch.object(net_utils.CookiePool, "load", return_value=pool) as load:
+            self.assertIs(net_utils.get_cookie_pool(), pool)
+            self.assertIs(net_utils.get_cookie_pool(), pool)
+        load.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
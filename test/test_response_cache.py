@@ -0,0 +1,76 @@
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+# 设置tampermonkey目录路径
+TAMPERMONKEY_ROOT = str(Path(__file__).parent.parent / "tampermonkey")
+sys.path.insert(0, TAMPERMONKEY_ROOT)
+
+from response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_set_and_get(self):
+        cache = ResponseCache(self.cache_dir)
+        cache.set(123, 456, "总结")
+        entry = cache.get(123)
+        self.assertEqual(entry["latest_id"], 456)
+        self.assertEqual(entry["response"], "总结")
+        self.assertTrue(cache.is_fresh(entry))
+
+    def test_get_missing(self):
+        cache = ResponseCache(self.cache_dir)
+        self.assertIsNone(cache.get(123))
+
+    def test_loaded_from_disk(self):
+        ResponseCache(self.cache_dir).set(123, 456, "总结")
+        entry = ResponseCache(self.cache_dir).get(123)
+        self.assertEqual(entry["response"], "总结")
+
+    def test_lru_eviction_falls_back_to_disk(self):
+        cache = ResponseCache(self.cache_dir, max_entries=2)
+        for user_id in (1, 2, 3):
+            cache.set(user_id, user_id, str(user_id))
+        self.assertNotIn(1, cache._entries)
+        self.assertEqual(cache.get(1)["response"], "1")
+
+    def test_memory_only(self):
+        cache = ResponseCache(None, max_entries=1)
+        cache.set(1, 1, "1")
+        cache.set(2, 2, "2")
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.get(2)["response"], "2")
+
+    def test_expired_entry_revalidated_by_latest_id(self):
+        cache = ResponseCache(self.cache_dir, max_age=10)
+        entry = cache.set(123, 456, "总结")
+        entry["updated_at"] = time.time() - 60
+        self.assertFalse(cache.is_fresh(entry))
+        self.assertTrue(cache.is_valid(entry, 456))
+        self.assertFalse(cache.is_valid(entry, 789))
+        self.assertFalse(cache.is_valid(entry, None))
+
+        cache.touch(123)
+        self.assertTrue(cache.is_fresh(cache.get(123)))
+
+    def test_lock_per_user(self):
+        cache = ResponseCache(None)
+        self.assertIs(cache.lock_for(1), cache.lock_for(1))
+        self.assertIsNot(cache.lock_for(1), cache.lock_for(2))
+
+    def test_lock_count_bounded(self):
+        cache = ResponseCache(None, lock_stripes=8)
+        self.assertEqual(len({id(cache.lock_for(user_id)) for user_id in range(1000)}), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
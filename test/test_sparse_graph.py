@@ -0,0 +1,67 @@
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import networkx as nx
+
+# 设置项目根目录路径
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.insert(0, PROJECT_ROOT)
+
+from sparse_graph import SparseInteractionGraph
+
+
+class TestSparseInteractionGraph(unittest.TestCase):
+    def setUp(self):
+        self.edges = [
+            (2, 1, "LIKED", 1),
+            (2, 1, "LIKED", 1),
+            (2, 1, "COMMENTS", 2),
+            (1, 3, "FOLLOWS", 5),
+            (3, 4, "REPOST_OF", 3),
+            (1, 1, "LIKED", 1),
+        ]
+
+    def test_association_degree_matches_networkx(self):
+        graph = SparseInteractionGraph.from_edges(self.edges)
+        G = nx.MultiDiGraph()
+        for key, (u, v, label, weight) in enumerate(self.edges):
+            G.add_edge(u, v, key=key, label=label, weight=weight)
+
+        self.assertEqual(graph.association_degree(1), {2: 4, 3: 5})
+        self.assertEqual(SparseInteractionGraph.from_networkx(G).association_degree(1), {2: 4, 3: 5})
+
+    def test_missing_target(self):
+        graph = SparseInteractionGraph.from_edges(self.edges)
+        with self.assertRaises(ValueError):
+            graph.association_degree(99)
+
+    def test_add_edges_and_nodes(self):
+        graph = SparseInteractionGraph.from_edges(self.edges)
+        graph.association_degree(1)  # 生成缓存的权重矩阵
+        graph.add_edges([(1, 5, "FOLLOWS", 5), (1, 2, "FOLLOWS", 5)])
+        graph.add_node(6)
+        self.assertIn(6, graph)
+        self.assertEqual(len(graph), 6)
+        self.assertEqual(graph.association_degree(1), {2: 9, 3: 5, 5: 5})
+        self.assertEqual(graph.association_degree(6), {})
+
+    def test_properties_loaded_lazily_in_one_batch(self):
+        loader = MagicMock(return_value={1: {"screen_name": "a"}, 2: {"screen_name": "b"}})
+        graph = SparseInteractionGraph.from_edges(self.edges, property_loader=loader)
+        graph.set_properties({3: {"screen_name": "c"}})
+        loader.assert_not_called()
+
+        H = graph.to_networkx([1, 2, 3])
+        loader.assert_called_once_with([1, 2])
+        self.assertEqual(H.nodes[3]["properties"]["screen_name"], "c")
+        self.assertEqual(H.get_edge_data(2, 1)["LIKED"]["weight"], 2)
+        self.assertNotIn(4, H)
+
+        graph.to_networkx([1, 2])
+        loader.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import requests
+
+# 设置项目根目录路径
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.insert(0, PROJECT_ROOT)
+
+from rate_limit import AdaptiveRateLimiter, RateLimiter
+from weibo_follow import Follow
+
+
+def follow_page(page, page_num, users):
+    rows = "".join(
+        f'<table><tr><td><a href="/u/{uid}">name{uid}</a></td><td>粉丝{fans}人</td></tr></table>'
+        for uid, fans in users
+    )
+    return (f'<html><head><meta charset="utf-8"/></head><body><div class="ut">测试用户关注</div>{rows}'
+            f'<input name="mp" value="{page_num}"/></body></html>').encode()
+
+
+def make_response(content, status=200):
+    response = MagicMock()
+    response.status_code = status
+    response.content = content
+    return response
+
+
+class TestFollow(unittest.TestCase):
+    def setUp(self):
+        self.pages = {
+            1: follow_page(1, 3, [(101, 10), (102, 20000)]),
+            2: follow_page(2, 3, [(201, 30)]),
+            3: follow_page(3, 3, [(301, 40)]),
+        }
+        self.calls = []
+
+        def get(url, **kwargs):
+            page = int(url.split("page=")[1]) if "page=" in url else 1
+            self.calls.append(page)
+            return make_response(self.pages[page])
+
+        self.session = MagicMock()
+        self.session.get.side_effect = get
+
+    def make_follow(self, **kwargs):
+        limiter = AdaptiveRateLimiter(rate=1000, max_rate=1000, cooldown=0)
+        return Follow(1, {}, session=self.session, limiter=limiter, workers=3, **kwargs)
+
+    def test_pages_collected_in_order(self):
+        fw = self.make_follow()
+        fw.get_follow_list()
+        self.assertEqual(fw.follow_list, ["1", "101", "201", "301"])  # 粉丝数过万的用户被过滤
+        self.assertEqual(fw.follow_name_list, ["测试用户", "name101", "name201", "name301"])
+        self.assertEqual(sorted(self.calls), [1, 2, 3])  # 第1页只请求一次
+
+    def test_retry_transient_failure(self):
+        failures = {2: 2}
+        ok = self.session.get.side_effect
+
+        def flaky(url, **kwargs):
+            page = int(url.split("page=")[1]) if "page=" in url else 1
+            if failures.get(page):
+                failures[page] -= 1
+                return make_response(b"", status=429)
+            return ok(url, **kwargs)
+
+        self.session.get.side_effect = flaky
+        fw = self.make_follow()
+        fw.get_follow_list()
+        self.assertEqual(fw.limiter.stats()["throttled"], 2)
+        self.assertIn("201", fw.follow_list)
+        self.assertEqual(fw.failed_pages, [])
+
+    def test_failed_page_is_recorded(self):
+        ok = self.session.get.side_effect
+
+        def broken(url, **kwargs):
+            if "page=3" in url:
+                raise requests.ConnectionError("reset")
+            return ok(url, **kwargs)
+
+        self.session.get.side_effect = broken
+        fw = self.make_follow(max_retries=1)
+        fw.get_follow_list()
+        self.assertEqual(fw.failed_pages, [3])
+        self.assertEqual(fw.follow_list, ["1", "101", "201"])
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_rate_is_bounded(self):
+        import time
+        limiter = RateLimiter(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 5 / 50 * 0.9)
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    def test_additive_increase(self):
+        limiter = AdaptiveRateLimiter(rate=1, max_rate=1.25, increase=0.1)
+        for _ in range(5):
+            limiter.record(latency=0.1)
+        self.assertAlmostEqual(limiter.rate, 1.25)
+
+    def test_multiplicative_decrease_and_cooldown(self):
+        import time
+        limiter = AdaptiveRateLimiter(rate=4, min_rate=0.5, decrease=0.5, cooldown=10)
+        limiter.record(throttled=True)
+        self.assertAlmostEqual(limiter.rate, 2)
+        self.assertGreater(limiter._reserve(), 9)  # 被限流后暂停
+        limiter.record(throttled=True)
+        limiter.record(throttled=True)
+        self.assertAlmostEqual(limiter.rate, 0.5)
+        self.assertGreater(limiter.blocked_until - time.monotonic(), 39)  # 连续限流时暂停时间翻倍
+        self.assertEqual(limiter.stats()["throttled"], 3)
+
+    def test_slow_responses_stop_increase(self):
+        limiter = AdaptiveRateLimiter(rate=1, increase=0.5, latency_target=1)
+        limiter.record(latency=5)
+        self.assertAlmostEqual(limiter.rate, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
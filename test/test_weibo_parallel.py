@@ -0,0 +1,74 @@
+import sys
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# 设置项目根目录路径
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.insert(0, PROJECT_ROOT)
+
+from weibo import Weibo
+
+
+class TestStartParallel(unittest.TestCase):
+    def test_isolated_state_and_failures(self):
+        instances = []
+        lock = threading.Lock()
+
+        def fake_scrape_user(self, user_id):
+            with lock:
+                instances.append(self)
+            self.initialize_info(user_id)
+            if user_id == "2":
+                raise RuntimeError("418")
+            self.got_count = int(user_id) * 10
+
+        wb = Weibo(filter=1, since_date='2023-01-01')
+        with patch.object(Weibo, "scrape_user", fake_scrape_user):
+            summary = wb.start_parallel(["1", "2", "3"], workers=3, rate=0)
+
+        self.assertEqual([item['user_id'] for item in summary], ["1", "2", "3"])
+        self.assertEqual([item['weibo_count'] for item in summary], [10, 0, 30])
+        self.assertEqual(summary[1]['error'], "418")
+        self.assertIsNone(summary[2]['error'])
+        # 每个用户一个独立实例，共用连接池和限速器
+        self.assertEqual(len({id(instance) for instance in instances}), 3)
+        self.assertTrue(all(instance.session is wb.session for instance in instances))
+        self.assertTrue(all(instance.limiter is wb.limiter for instance in instances))
+        self.assertEqual(wb.got_count, 0)
+
+    def test_sys_exit_recorded_as_failure(self):
+        def fake_scrape_user(self, user_id):
+            self.initialize_info(user_id)
+            if user_id == "1":
+                sys.exit(u'系统中可能没有安装或启动MongoDB数据库')
+            self.got_count = 10
+
+        wb = Weibo()
+        with patch.object(Weibo, "scrape_user", fake_scrape_user):
+            summary = wb.start_parallel(["1", "2"], workers=2, rate=0)
+
+        self.assertEqual(summary[0]['error'], u'系统中可能没有安装或启动MongoDB数据库')
+        self.assertEqual(summary[1]['weibo_count'], 10)
+
+    def test_long_weibo_requests_share_rate_budget(self):
+        limiters = []
+
+        def fake_scrape_user(self, user_id):
+            self.initialize_info(user_id)
+            with patch("weibo.request") as request:
+                request.return_value.text = '{"status": null, "hotScheme": 1}'
+                self.get_long_weibo("123")
+            limiters.append(request.call_args.args[1])
+
+        wb = Weibo()
+        with patch.object(Weibo, "scrape_user", fake_scrape_user):
+            wb.start_parallel(["1", "2"], workers=2, rate=3)
+
+        self.assertEqual(len(limiters), 2)
+        self.assertTrue(all(limiter is wb.limiter for limiter in limiters))
+
+
+if __name__ == '__main__':
+    unittest.main()
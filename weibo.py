@@ -6,18 +6,24 @@ import csv
 import json
 import math
 import os
-import random
 import sys
 import traceback
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from time import sleep
+from time import monotonic
 
 import requests
 from lxml import etree
 from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
+from checkpoint import Checkpoint
+from rate_limit import AdaptiveRateLimiter, get_limiter, rate_setting, request
+
+WEIBO_WORKERS = int(os.getenv("WEIBO_WORKERS", "4"))  # start_parallel 同时爬取的用户数
+WEIBO_RATE = float(os.getenv("WEIBO_RATE", "0"))  # start_parallel 所有用户合计每秒最多请求数，0表示使用 RATE_MAX
+
 
 class Weibo(object):
     def __init__(self,
@@ -26,7 +32,8 @@ class Weibo(object):
                  mongodb_write=0,
                  mysql_write=0,
                  pic_download=0,
-                 video_download=0):
+                 video_download=0,
+                 resume=False):
         """Weibo类初始化"""
         if filter != 0 and filter != 1:
             sys.exit(u'filter值应为数字0或1,请重新输入')
@@ -51,8 +58,13 @@ class Weibo(object):
         self.user = {}  # 存储目标微博用户信息
         self.got_count = 0  # 爬取到的微博数
         self.weibo_id_list = []  # 存储爬取到的所有微博id
+        self.failed_pages = []  # 出错的页，断点不会越过这些页
         self.mysql_config = {
         }  # MySQL数据库连接配置，可以不填，当使用者的mysql用户名、密码等与本程序默认值不同时，需要通过mysql_config来自定义
+        self.session = requests.Session()  # 请求共用的连接池，start_parallel 中所有用户共用一个
+        self.limiter = get_limiter('m.weibo.cn/getIndex')  # 微博列表接口的自适应限速器，所有实例共用
+        self.detail_limiter = get_limiter('m.weibo.cn/detail')  # 长微博接口的限速器，start_parallel 中与 limiter 相同
+        self.resume = resume  # 为True时从上次中断的页继续爬取
 
     def is_date(self, since_date):
         """判断日期格式是否正确"""
@@ -65,7 +77,7 @@ class Weibo(object):
     def get_json(self, params):
         """获取网页中json数据"""
         url = 'https://m.weibo.cn/api/container/getIndex?'
-        r = requests.get(url, params=params)
+        r = request(self.session, self.limiter, url, params=params)
         return r.json()
 
     def get_weibo_json(self, page):
@@ -172,7 +184,7 @@ class Weibo(object):
     def get_long_weibo(self, id):
         """获取长微博"""
         url = 'https://m.weibo.cn/detail/%s' % id
-        html = requests.get(url).text
+        html = request(self.session, self.detail_limiter, url).text
         html = html[html.find('"status":'):]
         html = html[:html.rfind('"hotScheme"')]
         html = html[:html.rfind(',')]
@@ -495,6 +507,7 @@ class Weibo(object):
         except Exception as e:
             print("Error: ", e)
             traceback.print_exc()
+            self.failed_pages.append(page)
 
     def get_page_count(self):
         """获取微博页数"""
@@ -502,10 +515,14 @@ class Weibo(object):
         page_count = int(math.ceil(weibo_count / 10.0))
         return page_count
 
+    def get_unwritten(self, wrote_count):
+        """获取尚未写入的微博，wrote_count 为已写入的总数（包括断点恢复前写入的）"""
+        return self.weibo[len(self.weibo) - (self.got_count - wrote_count):]
+
     def get_write_info(self, wrote_count):
         """获取要写入的微博信息"""
         write_info = []
-        for w in self.weibo[wrote_count:]:
+        for w in self.get_unwritten(wrote_count):
             wb = OrderedDict()
             for k, v in w.items():
                 if k not in ['user_id', 'screen_name', 'retweet']:
@@ -600,7 +617,7 @@ class Weibo(object):
 
     def weibo_to_mongodb(self, wrote_count):
         """将爬取的微博信息写入MongoDB数据库"""
-        self.info_to_mongodb('weibo', self.weibo[wrote_count:])
+        self.info_to_mongodb('weibo', self.get_unwritten(wrote_count))
         print(u'%d条微博写入MongoDB数据库完毕' % self.got_count)
 
     def change_mysql_config(self, mysql_config):
@@ -704,7 +721,7 @@ class Weibo(object):
         self.mysql_create_table(mysql_config, create_table)
         weibo_list = []
         retweet_list = []
-        for w in self.weibo[wrote_count:]:
+        for w in self.get_unwritten(wrote_count):
             if 'retweet' in w:
                 w['retweet']['retweet_id'] = ''
                 retweet_list.append(w['retweet'])
@@ -727,33 +744,83 @@ class Weibo(object):
             if self.mongodb_write:
                 self.weibo_to_mongodb(wrote_count)
 
+    def get_checkpoint(self):
+        """当前用户的断点，每次写入文件后保存"""
+        return Checkpoint('weibo_%s' % self.user_id)
+
+    def save_checkpoint(self, page, wrote_count, pending):
+        """
+        保存断点：page 及之前的页都已爬取并写入文件，pending 为 page 之后的页中已写入的微博id（按页存放），
+        恢复后重新爬取这些页时用来去重。断点只保存这些id，不保存全部微博
+        """
+        self.get_checkpoint().save({
+            'user_id': self.user_id,
+            'page': page,
+            'wrote_count': wrote_count,
+            'pending': [[p, pending[p]] for p in sorted(pending) if p > page],
+        })
+
+    def load_checkpoint(self):
+        """
+        恢复断点，返回下一页的页码、已写入的微博数和断点之后已写入的微博id，没有断点时返回 (1, 0, {})
+        恢复后 self.weibo 只包含之后爬到的微博，图片/视频下载也只覆盖这些微博
+        """
+        state = self.get_checkpoint().load() if self.resume else None
+        if not state:
+            return 1, 0, {}
+        pending = {p: ids for p, ids in state['pending']}
+        self.weibo_id_list = [i for ids in pending.values() for i in ids]
+        self.got_count = state['wrote_count']
+        print(u'从第%d页继续爬取，已爬取%d条微博' % (state['page'] + 1, self.got_count))
+        return state['page'] + 1, state['wrote_count'], pending
+
+    def add_pending(self, pending, page, fetched):
+        """记录 page 新爬到的微博id，fetched 为爬取该页前 weibo_id_list 的长度"""
+        if len(self.weibo_id_list) > fetched:
+            pending.setdefault(page, []).extend(self.weibo_id_list[fetched:])
+
     def get_pages(self):
         """获取全部微博"""
         self.get_user_info()
         page_count = self.get_page_count()
-        wrote_count = 0
+        start_page, wrote_count, pending = self.load_checkpoint()
+        cursor = start_page - 1  # cursor 及之前的页都已爬取成功，有页出错后不再前移
+        self.failed_pages = []
         self.print_user_info()
-        page1 = 0
-        random_pages = random.randint(1, 5)
-        for page in tqdm(range(1, page_count + 1), desc='Progress'):
+        for page in tqdm(range(start_page, page_count + 1), desc='Progress'):
             print(u'第%d页' % page)
+            fetched = len(self.weibo_id_list)
             is_end = self.get_one_page(page)
+            if self.failed_pages:
+                self.add_pending(pending, page, fetched)
+            else:
+                cursor = page
             if is_end:
                 break
 
             if page % 20 == 0:  # 每爬20页写入一次文件
                 self.write_data(wrote_count)
                 wrote_count = self.got_count
+                self.save_checkpoint(cursor, wrote_count, pending)
+
+            # 请求速度由 self.limiter 根据服务器的响应自动调整，被限流(418/429)时
+            # 降低速率并暂停，请求正常时逐渐提速，不再固定随机等待
 
-            # 通过加入随机等待避免被限制。爬虫速度过快容易被系统限制(一段时间后限
-            # 制会自动解除)，加入随机等待模拟人的操作，可降低被系统限制的风险。默
-            # 认是每爬取1到5页随机等待6到10秒，如果仍然被限，可适当增加sleep时间
-            if page - page1 == random_pages and page < page_count:
-                sleep(random.randint(6, 10))
-                page1 = page
-                random_pages = random.randint(1, 5)
+        failed, self.failed_pages = self.failed_pages, []
+        for page in failed:  # 出错的页重新爬取一次
+            print(u'重新爬取第%d页' % page)
+            fetched = len(self.weibo_id_list)
+            self.get_one_page(page)
+            self.add_pending(pending, page, fetched)
 
         self.write_data(wrote_count)  # 将剩余不足20页的微博写入文件
+        wrote_count = self.got_count
+        if self.failed_pages:
+            self.save_checkpoint(min(self.failed_pages) - 1, wrote_count, pending)
+            print(u'第%s页爬取失败，已保存断点，开启 resume 后重新运行可继续爬取' %
+                  ','.join(str(p) for p in self.failed_pages))
+        else:
+            self.get_checkpoint().clear()
         print(u'微博爬取完成，共爬取%d条微博' % self.got_count)
 
     def get_user_list(self, file_name):
@@ -774,23 +841,92 @@ class Weibo(object):
         self.got_count = 0
         self.user_id = user_id
         self.weibo_id_list = []
+        self.failed_pages = []
+
+    def scrape_user(self, user_id):
+        """爬取单个用户的微博"""
+        self.initialize_info(user_id)
+        self.get_pages()
+        print(u'信息抓取完毕')
+        print('*' * 100)
+        if self.pic_download == 1:
+            self.download_files('img')
+        if self.video_download == 1:
+            self.download_files('video')
 
     def start(self, user_id_list):
         """运行爬虫"""
         try:
             for user_id in user_id_list:
-                self.initialize_info(user_id)
-                self.get_pages()
-                print(u'信息抓取完毕')
-                print('*' * 100)
-                if self.pic_download == 1:
-                    self.download_files('img')
-                if self.video_download == 1:
-                    self.download_files('video')
+                self.scrape_user(user_id)
         except Exception as e:
             print('Error: ', e)
             traceback.print_exc()
 
+    def clone(self):
+        """创建配置相同、爬取状态独立的实例，与当前实例共用连接池和限速器"""
+        wb = Weibo(self.filter, self.since_date, self.mongodb_write,
+                   self.mysql_write, self.pic_download, self.video_download, self.resume)
+        wb.mysql_config = self.mysql_config
+        wb.session = self.session
+        wb.limiter = self.limiter
+        wb.detail_limiter = self.detail_limiter
+        return wb
+
+    def scrape_isolated(self, user_id):
+        """在独立的实例中爬取一个用户，失败不影响其他用户，返回该用户的爬取统计"""
+        wb = self.clone()
+        start = monotonic()
+        error = None
+        try:
+            wb.scrape_user(user_id)
+        except (Exception, SystemExit) as e:  # MongoDB/MySQL 不可用时写入函数会调用 sys.exit
+            error = str(e)
+            print('Error: ', e)
+            traceback.print_exc()
+        elapsed = monotonic() - start
+        return {
+            'user_id': user_id,
+            'weibo_count': wb.got_count,
+            'elapsed': elapsed,
+            'weibo_per_second': wb.got_count / elapsed if elapsed > 0 else 0.0,
+            'error': error,
+        }
+
+    def start_parallel(self, user_id_list, workers=WEIBO_WORKERS, rate=WEIBO_RATE):
+        """
+        同时爬取多个用户
+
+        每个用户使用 clone() 得到的独立实例，所有用户共用一个连接池和一个全局限速器。
+
+        :param workers: 同时爬取的用户数
+        :param rate: 所有用户合计每秒最多请求数，速率在此范围内按服务器的响应自动调整；0表示使用共用的限速器
+        :return: 每个用户的爬取统计列表，顺序与 user_id_list 相同
+        """
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if rate > 0:
+            # 微博列表和长微博请求共用同一个限速器，合计速率不超过 rate
+            self.limiter = AdaptiveRateLimiter(min(rate_setting("RATE_INITIAL"), rate), burst=workers, max_rate=rate)
+            self.detail_limiter = self.limiter
+        start = monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            summary = list(executor.map(self.scrape_isolated, user_id_list))
+        self.print_summary(summary, monotonic() - start)
+        return summary
+
+    def print_summary(self, summary, elapsed):
+        """输出每个用户的爬取数量和速度"""
+        print(u'%-12s %8s %10s %10s  %s' % (u'用户id', u'微博数', u'耗时(秒)', u'微博/秒', u'状态'))
+        for item in summary:
+            print(u'%-12s %8d %10.1f %10.2f  %s' % (
+                item['user_id'], item['weibo_count'], item['elapsed'],
+                item['weibo_per_second'], item['error'] or u'完成'))
+        total = sum(item['weibo_count'] for item in summary)
+        failed = sum(1 for item in summary if item['error'])
+        print(u'共爬取%d个用户（失败%d个），%d条微博，总耗时%.1f秒' % (len(summary), failed, total, elapsed))
+
 
 def main():
     try:
@@ -1,34 +1,68 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 
-import random
+import os
 import sys
 import traceback
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from lxml import etree
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
+from cookie_pool import as_pool, pooled_request
 from weibo import Weibo
 
+FOLLOW_WORKERS = int(os.getenv("FOLLOW_WORKERS", "4"))  # 并发请求的线程数
+FOLLOW_MAX_RETRIES = int(os.getenv("FOLLOW_MAX_RETRIES", "3"))  # 单页失败后的重试次数
+FOLLOW_TIMEOUT = float(os.getenv("FOLLOW_TIMEOUT", "10"))  # 单次请求超时（秒）
+
+
+def create_session(pool_size=FOLLOW_WORKERS):
+    """创建连接池大小与并发线程数一致的 Session"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
 
 class Follow(object):
-    def __init__(self, user_id, cookie):
-        """Follow类初始化"""
+    def __init__(self, user_id, cookie, session=None, limiter=None, workers=FOLLOW_WORKERS,
+                 max_retries=FOLLOW_MAX_RETRIES):
+        """
+        Follow类初始化
+
+        :param session: 可选，共用的 requests.Session，默认新建一个
+        :param limiter: 可选，共用的 AdaptiveRateLimiter，默认每组cookie在关注列表接口上各有一个限速器
+        :param workers: 并发请求的线程数
+        :param max_retries: 单页遇到网络错误或 418/429/5xx 时的重试次数
+        """
         if not isinstance(user_id, int):
             sys.exit(u'user_id值应为一串数字形式,请重新输入')
         self.user_id = user_id
         self.cookie = cookie
+        self.session = session or create_session(workers)
+        self.pool = as_pool(cookie)  # cookie 可以是单个cookie字典或 CookiePool
+        self.limiter = limiter
+        self.workers = workers
+        self.max_retries = max_retries
         self.follow_list = [str(user_id)]   # 存储爬取到的所有关注微博的user_id
         self.follow_name_list = []          # 存储爬取到的所有关注微博的用户名
+        self.failed_pages = []              # 重试后仍然失败的页码
+        self._first_page = None             # 第1页，获取页数时顺带取得，不再重复请求
+
+    def fetch_html(self, url):
+        """请求页面并解析，被限流或网络错误时由限速器降速后重试，重试次数用完后抛出异常"""
+        response = pooled_request(self.session, self.pool, 'weibo.cn/follow', url, limiter=self.limiter,
+                                  max_retries=self.max_retries, timeout=FOLLOW_TIMEOUT)
+        return etree.HTML(response.content)
 
     def deal_html(self, url):
         """处理html"""
         try:
-            html = requests.get(url, cookies=self.cookie).content
-            selector = etree.HTML(html)
-            return selector
+            return self.fetch_html(url)
         except Exception as e:
             print('Error: ', e)
             traceback.print_exc()
@@ -37,6 +71,7 @@ class Follow(object):
         """获取关注列表页数"""
         url = "https://weibo.cn/%d/follow" % self.user_id
         selector = self.deal_html(url)
+        self._first_page = selector
         user_name = selector.xpath('//div[@class="ut"]/text()')[0]
         user_name = user_name[:user_name.find('关注')]  # 获取user_name
         self.follow_name_list.append(user_name)
@@ -47,11 +82,10 @@ class Follow(object):
                 selector.xpath("//input[@name='mp']")[0].attrib['value'])
         return page_num
 
-    def get_one_page(self, page):
-        """获取第page页的user_id"""
-        url = 'https://weibo.cn/%d/follow?page=%d' % (self.user_id, page)
-        selector = self.deal_html(url)
-
+    @staticmethod
+    def parse_page(selector):
+        """从关注列表页中解析 (user_id, 用户名)，跳过大V和粉丝数大于10000的用户"""
+        follows = []
         table_list = selector.xpath('//table')
         for t in table_list:
             # im = t.xpath('.//a/@href')[-1]
@@ -67,23 +101,40 @@ class Follow(object):
                         num_people = float(num_people[:-1])*10000
                     break
             if user_id.isdigit() and len(img) <= 1 and int(num_people) < 10000:  # 删除大V和粉丝数大于10000的用户
-                self.follow_list.append(user_id)
-                self.follow_name_list.append(name)
+                follows.append((user_id, name))
+        return follows
+
+    def fetch_page(self, page):
+        """获取第page页的 (user_id, 用户名) 列表，重试后仍失败时记录页码并返回空列表"""
+        if page == 1 and self._first_page is not None:
+            return self.parse_page(self._first_page)
+        url = 'https://weibo.cn/%d/follow?page=%d' % (self.user_id, page)
+        try:
+            return self.parse_page(self.fetch_html(url))
+        except Exception as e:
+            print(u'第%d页关注列表爬取失败: %s' % (page, e))
+            self.failed_pages.append(page)
+            return []
+
+    def get_one_page(self, page):
+        """获取第page页的user_id"""
+        for user_id, name in self.fetch_page(page):
+            self.follow_list.append(user_id)
+            self.follow_name_list.append(name)
 
     def get_follow_list(self):
-        """获取关注用户主页地址"""
+        """获取关注用户主页地址，各页并发请求，总速率由 limiter 根据服务器的响应调整，结果按页码顺序保存"""
         page_num = self.get_page_num()
         print(u'用户关注页数：' + str(page_num))
-        page1 = 0
-        random_pages = random.randint(1, 5)
-        for page in tqdm(range(1, page_num + 1), desc=u'关注列表爬取进度'):
-            self.get_one_page(page)
-
-            if page - page1 == random_pages and page < page_num:
-                sleep(random.randint(6, 10))
-                page1 = page
-                random_pages = random.randint(1, 5)
-
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pages = executor.map(self.fetch_page, range(1, page_num + 1))
+            for follows in tqdm(pages, total=page_num, desc=u'关注列表爬取进度'):
+                for user_id, name in follows:
+                    self.follow_list.append(user_id)
+                    self.follow_name_list.append(name)
+
+        if self.failed_pages:
+            print(u'以下页码爬取失败：' + ', '.join(map(str, sorted(self.failed_pages))))
         print(u'用户关注列表爬取完毕')
 
 
@@ -108,11 +159,9 @@ def main():
         mysql_write = 0
         pic_download = 1  # 值为0代表不下载微博原始图片,1代表下载微博原始图片
         video_download = 0  # 值为0代表不下载微博视频,1代表下载微博视频
-        for user in fw.follow_list:
-            # 爬每个人的微博
-            new_list = [user]
-            wb = Weibo(filter, since_date, mongodb_write, mysql_write, pic_download, video_download)
-            wb.start(new_list)
+        # 同时爬取关注列表中每个人的微博，每个人的爬取状态相互独立
+        wb = Weibo(filter, since_date, mongodb_write, mysql_write, pic_download, video_download)
+        wb.start_parallel(fw.follow_list)
 
     except Exception as e:
         print('Error: ', e)